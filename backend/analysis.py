@@ -0,0 +1,288 @@
+import re
+import statistics
+from collections import deque
+from functools import lru_cache
+
+# Deterministic essay checks that don't need the model: cliches and generic
+# topics from a curated phrase list, readability, sentence variety and
+# paragraph structure. Serves POST /essay/analyze on its own and is handed to
+# the grader with the essay, so the model reads the counts instead of working
+# them out (and writing them back) itself.
+
+CLICHES = [
+    "ever since i was young", "ever since i was little", "ever since i was a child",
+    "ever since i can remember", "for as long as i can remember", "since i was a child",
+    "since the dawn of time", "throughout history", "in today's society", "in today's world",
+    "webster's dictionary defines", "the dictionary defines",
+    "comfort zone", "out of my comfort zone", "outside my comfort zone",
+    "make a difference", "make a positive impact", "make the world a better place",
+    "changed my life", "changed my life forever", "changed my perspective", "opened my eyes",
+    "eye opening", "eye-opening experience", "shaped who i am", "made me who i am",
+    "the person i am today", "who i am today", "i am who i am",
+    "hard work pays off", "hard work and dedication", "blood sweat and tears",
+    "never give up", "never giving up", "give it my all", "gave it my all", "push myself",
+    "at the end of the day", "everything happens for a reason", "the rest is history",
+    "follow my dreams", "follow my passion", "chase my dreams", "dream big",
+    "reach my full potential", "reach my potential", "believe in myself",
+    "it was then that i realized", "that's when i realized", "little did i know",
+    "i will never forget", "to this day", "a blessing in disguise", "a turning point",
+    "through thick and thin", "against all odds", "hit rock bottom",
+    "light at the end of the tunnel", "in the blink of an eye", "time stood still",
+    "my heart was pounding", "butterflies in my stomach", "tears streamed down my face",
+    "roller coaster of emotions", "rollercoaster of emotions", "with every fiber of my being",
+    "think outside the box", "nothing is impossible", "anything is possible",
+    "learn from my mistakes", "stepping stone", "second family", "like a family",
+    "give back to my community", "give back to the community", "broaden my horizons",
+    "leave my mark", "i want to help people", "bigger than myself", "as the saying goes",
+    "my passion for", "i have always been passionate", "i have always wanted",
+]
+
+# The rubric's "Costco rotisserie chicken" topics. A phrase on its own means
+# little ("my dog"), so a topic only counts once TOPIC_MIN_SIGNALS different
+# phrases from its list turn up.
+GENERIC_TOPICS = {
+    "sports injury": [
+        "torn acl", "tore my acl", "acl", "injury", "injured", "sprained", "broke my",
+        "surgery", "physical therapy", "sidelined", "the season", "my team", "my coach",
+        "back on the field", "back on the court",
+    ],
+    "big game": [
+        "the big game", "the championship", "championship game", "state championship",
+        "final seconds", "buzzer", "scored the", "won the game", "lost the game",
+        "my teammates", "the crowd", "the scoreboard",
+    ],
+    "mission trip": [
+        "mission trip", "service trip", "volunteer trip", "orphanage", "village",
+        "less fortunate", "third world", "poverty", "how lucky i am", "how privileged",
+        "build houses", "building houses", "habitat for humanity", "the locals",
+    ],
+    "pet death": [
+        "my dog", "my cat", "my pet", "passed away", "put down", "put to sleep",
+        "the vet", "veterinarian", "died", "his leash", "her leash",
+    ],
+    "grandparent death": [
+        "my grandmother", "my grandfather", "my grandma", "my grandpa", "passed away",
+        "hospice", "funeral", "diagnosed with", "cancer", "died", "her last",
+        "his last",
+    ],
+    "divorce": [
+        "divorce", "divorced", "custody", "my parents split", "separated", "two homes",
+        "two houses", "my dad's house", "my mom's house", "every other weekend",
+    ],
+    "moving": [
+        "we moved", "moving to", "moved to", "a new school", "new town", "new city",
+        "packing boxes", "left behind", "the new kid", "make new friends", "new friends",
+        "moved across",
+    ],
+}
+TOPIC_MIN_SIGNALS = 3
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)*")
+_SENTENCE = re.compile(r"[^.!?]+(?:[.!?]+[\"')\]]*|$)")
+_BLANK_LINE = re.compile(r"\n\s*\n")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+
+
+def words_of(text):
+    """Lower-case word tokens, with curly apostrophes straightened"""
+    return _WORD.findall(text.lower().replace("’", "'"))
+
+
+class PhraseMatcher:
+    """Aho-Corasick over word tokens: every (phrase, label) in the list is found
+    in one left-to-right pass over the essay, however many phrases there are"""
+
+    def __init__(self, phrases):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for phrase, label in phrases:
+            node = 0
+            words = words_of(phrase)
+            for word in words:
+                if word not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[node][word] = len(self.goto) - 1
+                node = self.goto[node][word]
+            self.out[node].append((phrase, label, len(words)))
+
+        # failure links, breadth first so a node's fallback is always built before it
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, words):
+        """[(start index, end index, phrase, label)] for every match in a token list"""
+        hits, node = [], 0
+        for end, word in enumerate(words, 1):
+            while node and word not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(word, 0)
+            for phrase, label, length in self.out[node]:
+                hits.append((end - length, end, phrase, label))
+        return hits
+
+
+MATCHER = PhraseMatcher(
+    [(phrase, None) for phrase in CLICHES]
+    + [(phrase, topic) for topic, phrases in GENERIC_TOPICS.items() for phrase in phrases]
+)
+
+
+def paragraphs(text):
+    """The essay split into paragraphs: on blank lines, or on single line breaks if it has none"""
+    parts = _BLANK_LINE.split(text.strip())
+    if len(parts) == 1:
+        parts = text.strip().split("\n")
+    return [part.strip() for part in parts if part.strip()]
+
+
+@lru_cache(maxsize=20000)
+def syllables(word):
+    """Vowel-group estimate, which is what readability formulas are calibrated against anyway"""
+    count = len(_VOWEL_GROUPS.findall(word))
+    if count > 1 and word.endswith("e") and not word.endswith(("le", "ee")):
+        count -= 1
+    return max(count, 1)
+
+
+def outermost(hits):
+    """Drop matches inside a longer one ("comfort zone" within "out of my comfort zone")"""
+    hits = sorted(hits, key=lambda hit: (hit[0], -hit[1]))
+    kept, reach = [], -1
+    for hit in hits:
+        if hit[1] > reach:
+            kept.append(hit)
+            reach = hit[1]
+    return kept
+
+
+def sentences(paragraph):
+    """A paragraph's sentences (a rough split: "Mr. Smith" counts as a break)"""
+    return [sentence.strip() for sentence in _SENTENCE.findall(paragraph) if words_of(sentence)]
+
+
+@lru_cache(maxsize=4096)
+def analyze_paragraph(paragraph):
+    """Counts for one paragraph. Cached, so a resubmitted revision only re-reads the
+    paragraphs that changed; callers must not modify the result"""
+    lengths, openers, words = [], [], []
+    for sentence in _SENTENCE.findall(paragraph):
+        tokens = words_of(sentence)
+        if tokens:
+            lengths.append(len(tokens))
+            openers.append(tokens[0])
+            words.extend(tokens)
+    hits = MATCHER.find(words)
+    return {
+        "words": len(paragraph.split()),
+        "tokens": len(words),
+        "syllables": sum(syllables(word) for word in words),
+        "sentence_lengths": lengths,
+        "openers": openers,
+        "cliches": [hit[2] for hit in outermost([hit for hit in hits if hit[3] is None])],
+        "topics": {
+            topic: {hit[2] for hit in outermost([hit for hit in hits if hit[3] == topic])}
+            for topic in {hit[3] for hit in hits if hit[3] is not None}
+        },
+    }
+
+
+def analyze_essay(essay, word_limit=None):
+    """Everything we can say about an essay without the model, as a JSON-ready dict"""
+    sentence_lengths, openers, token_count, syllable_count = [], [], 0, 0
+    paragraph_stats, cliches, topics = [], {}, {}
+    for paragraph in paragraphs(essay):
+        stats = analyze_paragraph(paragraph)
+        sentence_lengths.extend(stats["sentence_lengths"])
+        openers.extend(stats["openers"])
+        token_count += stats["tokens"]
+        syllable_count += stats["syllables"]
+        for phrase in stats["cliches"]:
+            cliches[phrase] = cliches.get(phrase, 0) + 1
+        for topic, found in stats["topics"].items():
+            topics.setdefault(topic, set()).update(found)
+        paragraph_stats.append({"words": stats["words"], "sentences": len(stats["sentence_lengths"])})
+
+    word_count = len(essay.split())
+    try:
+        word_limit = int(word_limit) if word_limit else None
+    except (TypeError, ValueError):
+        word_limit = None
+
+    analysis = {
+        "word_count": word_count,
+        "word_limit": word_limit,
+        "over_limit": bool(word_limit) and word_count > word_limit,
+        "paragraph_count": len(paragraph_stats),
+        "paragraphs": paragraph_stats,
+        "sentences": None,
+        "readability": None,
+        "cliche_count": sum(cliches.values()),
+        "cliches": [{"phrase": phrase, "count": n} for phrase, n in cliches.items()],
+        "generic_topics": [
+            {"topic": topic, "signals": sorted(found)}
+            for topic, found in sorted(topics.items(), key=lambda item: -len(item[1]))
+            if len(found) >= TOPIC_MIN_SIGNALS
+        ],
+    }
+    if not token_count:
+        return analysis
+
+    per_sentence = token_count / len(sentence_lengths)
+    per_word = syllable_count / token_count
+    analysis["sentences"] = {
+        "count": len(sentence_lengths),
+        "mean_words": round(per_sentence, 1),
+        "stdev_words": round(statistics.pstdev(sentence_lengths), 1),
+        "shortest": min(sentence_lengths),
+        "longest": max(sentence_lengths),
+        "starting_with_i": openers.count("i"),
+        # 1.0 means no two sentences open with the same word
+        "distinct_openers": round(len(set(openers)) / len(openers), 2),
+    }
+    analysis["readability"] = {
+        "flesch_reading_ease": round(206.835 - 1.015 * per_sentence - 84.6 * per_word, 1),
+        "flesch_kincaid_grade": round(0.39 * per_sentence + 11.8 * per_word - 15.59, 1),
+        "syllables_per_word": round(per_word, 2),
+    }
+    return analysis
+
+
+def cliches_in(essay, phrases):
+    """The phrases (from the model) that actually appear in the essay, ignoring case and punctuation"""
+    text = " " + " ".join(words_of(essay)) + " "
+    found = []
+    for phrase in phrases:
+        key = " ".join(words_of(str(phrase)))
+        if key and f" {key} " in text:
+            found.append(str(phrase).strip())
+    return found
+
+
+def merge_into_feedback(feedback, analysis, essay):
+    """Fill pre_grading_analysis from the local analysis plus any extra cliches the model
+    spotted (and that really are in the essay), in the shape the frontend already reads"""
+    pre = feedback.setdefault("pre_grading_analysis", {})
+    found = [hit["phrase"] for hit in analysis["cliches"]]
+    seen = {" ".join(words_of(phrase)) for phrase in found}
+    count = analysis["cliche_count"]
+    extra = list(pre.pop("additional_cliches", None) or []) + list(pre.get("cliches_found") or [])
+    for phrase in cliches_in(essay, extra):
+        key = " ".join(words_of(phrase))
+        if key not in seen:
+            seen.add(key)
+            found.append(phrase)
+            count += 1
+    pre["cliches_found"] = found
+    pre["cliche_count"] = count
+    return feedback
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import os
+import time
+from types import SimpleNamespace
+
+import httpx
+import jwt
+from cachetools import TLRUCache
+
+# Supabase signs access tokens either with the project's JWT secret (HS256) or
+# with asymmetric keys published at the JWKS endpoint. We check whichever is
+# configured locally instead of asking Supabase about every request.
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (
+    f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None
+)
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "600"))
+# Unknown key ids trigger a refetch, but no more often than this
+JWKS_MIN_REFETCH_SECONDS = 30.0
+
+# Only ask supabase.auth.get_user() when local verification fails if this is on
+AUTH_REMOTE_FALLBACK = os.getenv("AUTH_REMOTE_FALLBACK") == "true"
+# What a JWKS endpoint that answered with garbage (not JSON, wrong shape) raises while we read it
+JWKS_BODY_ERRORS = (ValueError, TypeError, AttributeError, KeyError)
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "2048"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+
+
+class AuthError(Exception):
+    """Raised when a token can't be verified locally"""
+
+
+def _token_expiry(key, value, now):
+    # Entries die at the token's own exp, or after AUTH_CACHE_TTL, whichever is first
+    _, exp = value
+    return min(exp, now + AUTH_CACHE_TTL)
+
+
+# token hash -> (user, exp). Timer is wall clock so it lines up with `exp`.
+_validated = TLRUCache(maxsize=AUTH_CACHE_SIZE, ttu=_token_expiry, timer=time.time)
+
+_jwks = {"keys": {}, "fetched_at": 0.0}
+# one refetch at a time; made in the running loop (see llm._get_slots for why not at import)
+_jwks_lock = None
+_jwks_lock_loop = None
+
+
+def check_config():
+    """Called at startup: without the JWT secret (and with no remote fallback) every
+    HS256 token would be rejected, so refuse to start rather than 401 everyone"""
+    if not SUPABASE_JWT_SECRET and not AUTH_REMOTE_FALLBACK:
+        raise RuntimeError(
+            "SUPABASE_JWT_SECRET is not set (Project Settings > API > JWT Secret); "
+            "set it, or AUTH_REMOTE_FALLBACK=true to check tokens with Supabase instead"
+        )
+
+
+def _cache_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def cached_user(token):
+    entry = _validated.get(_cache_key(token))
+    return entry[0] if entry else None
+
+
+def remember(token, user, exp):
+    """Cache an already-validated token until its exp (capped at AUTH_CACHE_TTL)"""
+    if exp > time.time():
+        _validated[_cache_key(token)] = (user, exp)
+
+
+def _get_jwks_lock():
+    global _jwks_lock, _jwks_lock_loop
+    loop = asyncio.get_running_loop()
+    if _jwks_lock is None or _jwks_lock_loop is not loop:
+        _jwks_lock, _jwks_lock_loop = asyncio.Lock(), loop
+    return _jwks_lock
+
+
+async def _refresh_jwks(force=False):
+    async with _get_jwks_lock():
+        age = time.time() - _jwks["fetched_at"]
+        if age < JWKS_MIN_REFETCH_SECONDS or (not force and age < JWKS_REFRESH_SECONDS):
+            return
+        async with httpx.AsyncClient(timeout=5.0) as http:
+            response = await http.get(JWKS_URL)
+            response.raise_for_status()
+        keys = {}
+        for data in response.json().get("keys", []):
+            try:
+                key = jwt.PyJWK(data)
+            except jwt.PyJWKError:
+                continue  # key type we can't use
+            keys[data.get("kid")] = key
+        _jwks["keys"] = keys
+        _jwks["fetched_at"] = time.time()
+        print(f"🔑 Loaded {len(keys)} JWKS signing keys")
+
+
+async def _signing_key(token):
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+
+    if algorithm == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise AuthError("HS256 token but SUPABASE_JWT_SECRET is not set")
+        return SUPABASE_JWT_SECRET, ["HS256"]
+
+    if algorithm not in ASYMMETRIC_ALGORITHMS or not JWKS_URL:
+        raise AuthError(f"Can't verify {algorithm} tokens locally")
+
+    kid = header.get("kid")
+    try:
+        await _refresh_jwks()
+        if kid not in _jwks["keys"]:
+            await _refresh_jwks(force=True)
+    except (httpx.HTTPError, *JWKS_BODY_ERRORS) as e:
+        if not _jwks["keys"]:
+            raise AuthError(f"JWKS unavailable: {e}")
+        # keep using the keys we already have
+    key = _jwks["keys"].get(kid)
+    if key is None:
+        raise AuthError(f"Unknown signing key {kid}")
+    return key.key, [algorithm]
+
+
+async def verify_token(token):
+    """Return the user for a Supabase access token, verified locally and cached until exp"""
+    user = cached_user(token)
+    if user is not None:
+        return user
+
+    try:
+        key, algorithms = await _signing_key(token)
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            audience=SUPABASE_JWT_AUDIENCE,
+            options={"require": ["exp", "sub"]},
+        )
+    except jwt.PyJWTError as e:
+        raise AuthError(str(e))
+
+    user = SimpleNamespace(id=claims["sub"], email=claims.get("email"), role=claims.get("role"))
+    remember(token, user, claims["exp"])
+    return user
@@ -0,0 +1,90 @@
+"""Microbenchmark: per-request auth overhead, Supabase round-trip vs local JWT checks.
+
+    cd backend && python -m bench.auth_overhead --rtt 0.04
+
+--rtt adds simulated network latency to the stub Supabase auth server; the
+remote numbers on localhost with --rtt 0 are the floor, not what production sees.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+STUB_PORT = 8932
+SECRET = "bench-secret-bench-secret-bench-secret"
+os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ["SUPABASE_JWT_SECRET"] = SECRET
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+
+import jwt  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from supabase import create_client  # noqa: E402
+
+import auth  # noqa: E402
+
+USER_ID = "6f1c7a1e-0000-4000-8000-000000000001"
+
+
+def make_token():
+    now = int(time.time())
+    return jwt.encode(
+        {"sub": USER_ID, "email": "student@example.com", "aud": "authenticated",
+         "role": "authenticated", "iat": now, "exp": now + 3600},
+        SECRET, algorithm="HS256",
+    )
+
+
+def start_stub_auth(rtt):
+    stub = FastAPI()
+
+    @stub.get("/auth/v1/user")
+    async def get_user():
+        await asyncio.sleep(rtt)
+        return {"id": USER_ID, "aud": "authenticated", "email": "student@example.com",
+                "app_metadata": {}, "user_metadata": {}, "created_at": "2025-01-01T00:00:00Z"}
+
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def report(label, samples):
+    us = [s * 1e6 for s in samples]
+    print(f"{label:<32} mean={statistics.mean(us):10.1f}us  p50={statistics.median(us):10.1f}us")
+
+
+def timed(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main(args):
+    start_stub_auth(args.rtt)
+    supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_KEY"])
+    token = make_token()
+    loop = asyncio.new_event_loop()
+
+    report("before: supabase.auth.get_user", timed(lambda: supabase.auth.get_user(token), args.remote_n))
+
+    def cold():
+        auth._validated.clear()
+        loop.run_until_complete(auth.verify_token(token))
+
+    report("after: local verify (cold)", timed(cold, args.n))
+    report("after: local verify (cached)", timed(lambda: loop.run_until_complete(auth.verify_token(token)), args.n))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt", type=float, default=0.0, help="simulated Supabase round-trip in seconds")
+    parser.add_argument("--n", type=int, default=5000)
+    parser.add_argument("--remote-n", type=int, default=200)
+    main(parser.parse_args())
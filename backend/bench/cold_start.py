@@ -0,0 +1,100 @@
+"""How long a fresh worker takes to import, become ready, and answer its first request.
+
+    cd backend && python -m bench.cold_start --runs 5
+    cd backend && python -m bench.cold_start --app-dir /tmp/old/backend   # compare another checkout
+
+Each run starts `uvicorn main:app` in a new process against the stub LLM and
+reports the time for `import main` on its own, the time from spawn until the
+server answers GET /ready (a checkout without the probe counts its first 404),
+and the latency of the first and second POST /essay on that worker.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench.stub_llm import start_in_thread
+
+STUB_PORT = 8945
+APP_PORT = 8946
+ESSAY = {"essay": "I learned to fix bikes in my uncle's garage. " * 40, "grade": "12",
+         "prompt": "Tell us about a skill you taught yourself.", "cache": "bypass"}
+AUTH = {"Authorization": "Bearer dev-token-bypass"}
+
+
+def worker_env(tmp):
+    env = dict(os.environ)
+    env.update(
+        GROQ_API_KEY="stub", GROQ_BASE_URL=f"http://127.0.0.1:{STUB_PORT}",
+        SUPABASE_URL="http://127.0.0.1:9", SUPABASE_SERVICE_KEY="stub", DEV_MODE="true",
+        RATE_LIMIT_BACKEND="off", PERSIST_JOURNAL_PATH=os.path.join(tmp, "journal.db"),
+        PYTHONDONTWRITEBYTECODE="1",
+    )
+    return env
+
+
+def time_import(app_dir, env):
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=app_dir, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise SystemExit(out.stderr)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_boot(app_dir, env):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60) as http:
+            while True:
+                try:
+                    if http.get("/ready").status_code in (200, 404):
+                        break
+                except httpx.TransportError:
+                    pass
+                if proc.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                time.sleep(0.005)
+            ready = time.perf_counter() - start
+            requests = []
+            for _ in range(2):
+                t = time.perf_counter()
+                response = http.post("/essay", json=ESSAY, headers=AUTH)
+                assert response.status_code == 200, response.text
+                requests.append(time.perf_counter() - t)
+        return ready, requests[0], requests[1]
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app-dir", default=".")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+    start_in_thread(STUB_PORT, latency=args.latency)
+    env = worker_env(tempfile.mkdtemp())
+
+    imports, boots, firsts, seconds = [], [], [], []
+    for _ in range(args.runs):
+        imports.append(time_import(args.app_dir, env))
+        ready, first, second = time_boot(args.app_dir, env)
+        boots.append(ready)
+        firsts.append(first)
+        seconds.append(second)
+
+    print(f"{os.path.abspath(args.app_dir)}  (median of {args.runs}, stub latency {args.latency * 1000:.0f}ms)")
+    print(f"  import main         {statistics.median(imports) * 1000:7.0f}ms")
+    print(f"  spawn -> ready      {statistics.median(boots) * 1000:7.0f}ms")
+    print(f"  first POST /essay   {statistics.median(firsts) * 1000:7.0f}ms")
+    print(f"  second POST /essay  {statistics.median(seconds) * 1000:7.0f}ms")
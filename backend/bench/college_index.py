@@ -0,0 +1,62 @@
+"""How fast the college index (colleges.py) loads and answers.
+
+    cd backend && python -m bench.college_index --runs 20000
+
+"Load" parses data/colleges.csv and builds the bitsets, which is what startup
+pays once. The rest are per-request costs on a few typical profiles: the
+shortlist that goes in the prompt, the check of a returned college list, and a
+single name lookup. Profile parsing (states_for / majors_for) is cached, as it
+is in the app once a profile has been seen.
+"""
+import argparse
+import statistics
+import time
+
+import colleges
+
+PROFILES = [
+    {"gpa": "3.9", "interests": "robotics, coding", "collegeGoals": "Computer Science", "location": "California"},
+    {"gpa": "3.5", "interests": "nursing, volunteering at the clinic", "collegeGoals": "BSN", "location": "Midwest"},
+    {"gpa": "3.1", "interests": "drawing, animation", "collegeGoals": "art school", "location": "Texas or the South"},
+    {"gpa": "3.7", "interests": "debate, history", "collegeGoals": "pre-law", "location": "anywhere"},
+]
+
+COLLEGE_LIST = {
+    "reach": ["MIT - Electrical Engineering and Computer Science", "Stanford University - Computer Science"],
+    "target": ["UC San Diego - Computer Engineering", "University of Washington - Informatics"],
+    "safety": ["San Jose State University - Computer Science", "Cal State East Bay - Computer Science"],
+}
+
+
+def timings(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples
+
+
+def report(label, samples):
+    print(f"  {label:<28} p50 {statistics.median(samples) * 1e6:7.1f}µs  "
+          f"p99 {samples[int(len(samples) * 0.99) - 1] * 1e6:7.1f}µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20000)
+    args = parser.parse_args()
+
+    loads = timings(colleges.load, 50)
+    index = colleges.get_index()
+    print(f"{len(index)} colleges, {len(index.by_state)} states, {len(index.by_major)} majors, "
+          f"{len(index.by_name)} names")
+    report("load", loads)
+
+    for profile in PROFILES:
+        print(f"GPA {profile['gpa']}, {profile['location']!r}, majors {colleges.profile_majors(profile)}")
+        report("shortlist", timings(lambda: colleges.shortlist(profile), args.runs))
+        report("prompt block", timings(lambda: colleges.candidates_note(profile), args.runs))
+        report("check college list", timings(lambda: colleges.fix_college_list(COLLEGE_LIST, profile), args.runs))
+    report("name lookup", timings(lambda: index.resolve("UC San Diego - Computer Engineering"), args.runs))
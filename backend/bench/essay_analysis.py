@@ -0,0 +1,82 @@
+"""How long the local essay analysis (analysis.py) takes on a full-length essay.
+
+    cd backend && python -m bench.essay_analysis --runs 2000
+
+The essay is ~650 words (the Common App limit) in five paragraphs, with a few
+cliches and a generic topic in it so every part of the analysis has work to do.
+"First call" is a fresh essay with nothing in the syllable cache yet; "new
+essay" clears the per-paragraph cache before each run, "resubmitted" doesn't.
+"""
+import argparse
+import random
+import statistics
+import time
+
+import analysis
+
+SENTENCES = [
+    "Ever since I was young, the garage behind our apartment was where my uncle fixed bikes for the whole block.",
+    "He never wrote anything down, so I started keeping a notebook of every repair and what it cost.",
+    "My coach said hard work pays off, but nobody told me what to do when the work itself stopped making sense.",
+    "I tore my ACL in the second game of the season and spent the spring in physical therapy.",
+    "Sitting on the bench, I noticed the equipment manager spent more time with broken helmets than with players.",
+    "At the end of the day, the helmets were a better puzzle than the playbook.",
+    "I learned to read a torque chart before I could read a defensive formation.",
+    "Most afternoons I biked to the hardware store with a list written on the back of my hand.",
+    "The owner, Mr. Alvarez, let me sort bolts by thread pitch in exchange for whatever I broke.",
+    "It was out of my comfort zone to ask strangers for their old parts, but the worst they said was no.",
+    "By winter I had rebuilt eleven bikes and given nine of them away to kids at the middle school.",
+    "Some of them came back with flat tires and stories, which I liked better than thank-you notes.",
+    "I still keep the notebook, although the early pages are mostly grease and crossed-out sums.",
+    "What changed was not my knee but the way I looked at anything that did not work.",
+]
+
+
+def sample_essay(words=650, seed=0):
+    rng = random.Random(seed)
+    paragraphs, count = [[] for _ in range(5)], 0
+    while count < words:
+        sentence = rng.choice(SENTENCES)
+        paragraphs[min(count * 5 // words, 4)].append(sentence)
+        count += len(sentence.split())
+    return "\n\n".join(" ".join(p) for p in paragraphs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=650)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    analysis.PhraseMatcher(
+        [(phrase, None) for phrase in analysis.CLICHES]
+        + [(phrase, topic) for topic, phrases in analysis.GENERIC_TOPICS.items() for phrase in phrases]
+    )
+    build = time.perf_counter() - start
+
+    essay = sample_essay(args.words)
+    analysis.syllables.cache_clear()
+    start = time.perf_counter()
+    result = analysis.analyze_essay(essay, 650)
+    first = time.perf_counter() - start
+
+    fresh, cached = [], []
+    for _ in range(args.runs):
+        analysis.analyze_paragraph.cache_clear()
+        start = time.perf_counter()
+        analysis.analyze_essay(essay, 650)
+        fresh.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        analysis.analyze_essay(essay, 650)
+        cached.append(time.perf_counter() - start)
+
+    print(f"essay: {result['word_count']} words, {result['paragraph_count']} paragraphs, "
+          f"{result['sentences']['count']} sentences, {result['cliche_count']} cliches, "
+          f"topics {[t['topic'] for t in result['generic_topics']]}")
+    print(f"  build matcher ({len(analysis.MATCHER.goto)} states)  {build * 1000:7.3f}ms")
+    print(f"  first call                   {first * 1000:7.3f}ms")
+    for label, samples in (("new essay", fresh), ("resubmitted (paragraphs cached)", cached)):
+        samples.sort()
+        print(f"  {label}: p50 {statistics.median(samples) * 1000:.3f}ms  "
+              f"p99 {samples[int(len(samples) * 0.99) - 1] * 1000:.3f}ms  max {samples[-1] * 1000:.3f}ms")
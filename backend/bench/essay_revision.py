@@ -0,0 +1,118 @@
+"""Tokens, latency and storage: re-grading each revision from scratch vs as a revision.
+
+    cd backend && python -m bench.essay_revision --revisions 10 --tokens-per-second 250
+
+A 650-word essay is graded, then revised one sentence at a time. Each draft is
+graded twice: as a new essay (cache bypassed, the old behaviour) and with
+`parent_id` set to the previous draft. The stub LLM answers with full-size
+feedback and takes `--latency` plus completion tokens / `--tokens-per-second`.
+"Uncached" leaves out the static system prompt, which the provider's prompt
+cache covers. Storage is the JSON size of what each approach saves for the
+whole chain.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+STUB_PORT = 8955
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+os.environ["DEV_MODE"] = "true"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from analysis import paragraphs, sentences  # noqa: E402
+from bench import stub_llm  # noqa: E402
+from bench.essay_analysis import sample_essay  # noqa: E402
+from bench.fakes import FakeSupabase  # noqa: E402
+from bench.load_generate import AUTH  # noqa: E402
+from metrics import LLM_TOKENS  # noqa: E402
+from prompts import ESSAY_REVISION_TEMPLATE, ESSAY_TEMPLATE  # noqa: E402
+from router import essay_router  # noqa: E402
+
+EDITS = ["then I started over with a cleaner plan", "which nobody had asked me to do",
+         "and that surprised me more than anyone", "even on the days it rained"]
+
+
+def tokens(kind):
+    return sum(LLM_TOKENS.labels(model, kind)._value.get() for model in essay_router.models)
+
+
+def revise(essay, rng):
+    """The essay with one sentence reworded"""
+    parts = paragraphs(essay)
+    index = rng.randrange(len(parts))
+    chosen = rng.choice(sentences(parts[index]))
+    parts[index] = parts[index].replace(chosen, chosen.rstrip(".!?") + ", " + rng.choice(EDITS) + ".", 1)
+    return "\n\n".join(parts)
+
+
+def grade(client, body):
+    prompt, completion = tokens("prompt"), tokens("completion")
+    start = time.perf_counter()
+    response = client.post("/essay", json=body, headers=AUTH)
+    assert response.status_code == 200, response.text
+    return time.perf_counter() - start, tokens("prompt") - prompt, tokens("completion") - completion, response.json()
+
+
+def stored_size(db, essay_id):
+    row = next(r for r in db.tables["essays"] if r["id"] == essay_id)
+    return sum(len(json.dumps(row.get(column), ensure_ascii=False)) for column in ("essay_text", "feedback", "delta"))
+
+
+def report(label, samples, system, storage):
+    seconds, prompt, completion = zip(*samples)
+    prompt = statistics.mean(prompt)
+    print(f"{label:<12} p50 {statistics.median(seconds) * 1000:6.0f}ms  prompt {prompt:5.0f} "
+          f"(uncached {prompt - system:5.0f})  completion {statistics.mean(completion):4.0f}  "
+          f"stored {storage / 1024:5.1f}KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--revisions", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed per-call latency (queue + prompt)")
+    parser.add_argument("--tokens-per-second", type=float, default=250)
+    args = parser.parse_args()
+
+    stub_llm.SAMPLE_FEEDBACK.clear()
+    stub_llm.SAMPLE_FEEDBACK.update(stub_llm.full_size_feedback())
+    server = stub_llm.start_in_thread(STUB_PORT, latency=args.latency)
+    server.config.app.state.tokens_per_second = args.tokens_per_second
+    db = FakeSupabase()
+    main.supabase = db
+    main.rate_limiter.enabled = False
+
+    rng = random.Random(7)
+    drafts = [sample_essay()]
+    for _ in range(args.revisions):
+        drafts.append(revise(drafts[-1], rng))
+    body = {"grade": "12", "program": "Engineering", "prompt": "Tell us about a skill you taught yourself."}
+
+    with TestClient(main.app) as client:
+        first = grade(client, dict(body, essay=drafts[0], cache="bypass"))
+        full, full_ids = [], [first[3]["id"]]
+        for draft in drafts[1:]:
+            result = grade(client, dict(body, essay=draft, cache="bypass"))
+            full.append(result[:3])
+            full_ids.append(result[3]["id"])
+
+        parent, revised, revised_ids = first[3]["id"], [], [first[3]["id"]]
+        for draft in drafts[1:]:
+            result = grade(client, dict(body, essay=draft, cache="bypass", parent_id=parent))
+            revised.append(result[:3])
+            parent = result[3]["id"]
+            revised_ids.append(parent)
+        while main.writer.pending:
+            time.sleep(0.05)
+
+    print(f"{args.revisions} one-sentence revisions of a {len(drafts[0].split())}-word essay")
+    report("from scratch", full, len(ESSAY_TEMPLATE.system) // 4, sum(stored_size(db, i) for i in full_ids))
+    report("as revision", revised, len(ESSAY_REVISION_TEMPLATE.system) // 4,
+           sum(stored_size(db, i) for i in revised_ids))
@@ -0,0 +1,275 @@
+"""In-memory stand-in for the bits of the supabase client the backend uses.
+
+Use FakeSupabase in-process (`main.supabase = FakeSupabase()`), or serve it
+over PostgREST's and GoTrue's HTTP API so the real SupabaseClient, and any
+number of uvicorn workers, share one database:
+
+    python -m bench.fakes --port 8961 --latency 0.005
+then point the backend at it with SUPABASE_URL=http://127.0.0.1:8961
+"""
+import argparse
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import jwt
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+# Tokens from make_token() verify locally when the backend has SUPABASE_JWT_SECRET set to this
+BENCH_JWT_SECRET = "bench-secret-bench-secret-bench-secret"
+
+
+_COMPARE = {
+    "eq": lambda a, b: a == b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+}
+
+
+def _split_top_level(expression):
+    parts, depth, quoted, current = [], 0, False, ""
+    for c in expression:
+        if c == '"':
+            quoted = not quoted
+        elif not quoted and c == "(":
+            depth += 1
+        elif not quoted and c == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and c == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += c
+    parts.append(current)
+    return parts
+
+
+def _logic_tree(kind, expression):
+    """PostgREST or=(...)/and(...) filters, enough for the keyset cursors the backend builds"""
+    checks = []
+    for part in _split_top_level(expression):
+        nested = re.fullmatch(r"(and|or)\((.*)\)", part)
+        if nested:
+            checks.append(_logic_tree(nested.group(1), nested.group(2)))
+            continue
+        column, op, value = part.split(".", 2)
+        value = value.strip('"')
+        checks.append(lambda row, c=column, o=op, v=value: _COMPARE[o](str(row.get(c)), v))
+    combine = any if kind == "or" else all
+    return lambda row: combine(check(row) for check in checks)
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.filters = []
+        self.order_by = []
+        self.columns = None
+        self.row_limit = None
+
+    def select(self, columns="*"):
+        self.op = "select"
+        if columns != "*":
+            self.columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self.op = "insert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict="id", ignore_duplicates=False):
+        self.op = "upsert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values):
+        self.op = "update"
+        self.payload = values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def or_(self, expression):
+        self.filters.append(_logic_tree("or", expression))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def _matches(self, row):
+        return all(f(row) for f in self.filters)
+
+    def execute(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.db.fail_writes and self.op in ("insert", "upsert", "update", "delete"):
+            raise ConnectionError("fake supabase is down")
+        if self.op == "upsert":
+            existing = {r["id"]: r for r in rows}
+            fresh = []
+            for row in self.payload:
+                if row["id"] in existing:
+                    if not self.ignore_duplicates:
+                        existing[row["id"]].update(row)
+                else:
+                    fresh.append(row)
+            self.payload = fresh
+            self.op = "insert"
+        if self.op == "insert":
+            inserted = []
+            for row in self.payload:
+                row = dict(row)
+                row.setdefault("id", str(uuid.uuid4()))
+                row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                rows.append(row)
+                inserted.append(row)
+            return SimpleNamespace(data=inserted)
+        if self.op == "update":
+            updated = [r for r in rows if self._matches(r)]
+            for row in updated:
+                row.update(self.payload)
+            return SimpleNamespace(data=[dict(r) for r in updated])
+        if self.op == "delete":
+            gone = [r for r in rows if self._matches(r)]
+            self.db.tables[self.table] = [r for r in rows if not self._matches(r)]
+            return SimpleNamespace(data=gone)
+        data = [r for r in rows if self._matches(r)]
+        for column, desc in reversed(self.order_by):
+            data.sort(key=lambda r: str(r.get(column) or ""), reverse=desc)
+        if self.row_limit is not None:
+            data = data[:self.row_limit]
+        if self.columns:
+            data = [{c: r.get(c) for c in self.columns} for r in data]
+        else:
+            # fresh dicts like a real response, so callers can't edit the stored rows
+            data = [dict(r) for r in data]
+        return SimpleNamespace(data=data)
+
+
+class FakeAuth:
+    def get_user(self, token):
+        claims = jwt.decode(token, options={"verify_signature": False})
+        return SimpleNamespace(user=SimpleNamespace(id=claims["sub"], email=claims.get("email")))
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.fail_writes = False  # flip on to simulate Supabase being unreachable
+        self.auth = FakeAuth()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def make_token(user_id, secret=BENCH_JWT_SECRET, ttl=3600):
+    """A Supabase-style access token for `user_id`"""
+    now = int(time.time())
+    return jwt.encode(
+        {"sub": user_id, "email": f"{user_id}@example.com", "aud": "authenticated",
+         "role": "authenticated", "iat": now, "exp": now + ttl},
+        secret, algorithm="HS256",
+    )
+
+
+# query parameters that aren't column filters
+_REST_OPTIONS = {"select", "columns", "on_conflict", "order", "limit", "offset"}
+
+
+def create_supabase_app(db=None, latency=0.0):
+    """A FakeSupabase behind /rest/v1/<table> (what postgrest-py sends) and /auth/v1/user.
+    `app.state.latency` seconds are added to every call, like a network round trip."""
+    app = FastAPI()
+    app.state.db = db or FakeSupabase()
+    app.state.latency = latency
+    app.state.calls = 0
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH", "DELETE"])
+    async def rest(table: str, request: Request):
+        app.state.calls += 1
+        if app.state.latency:
+            await asyncio.sleep(app.state.latency)
+        params, prefer = request.query_params, request.headers.get("prefer", "")
+        body = await request.body()
+        payload = json.loads(body) if body else None
+
+        query = app.state.db.table(table)
+        if request.method == "POST" and "resolution=" in prefer:
+            query.upsert(payload, ignore_duplicates="ignore-duplicates" in prefer)
+        elif request.method == "POST":
+            query.insert(payload)
+        elif request.method == "PATCH":
+            query.update(payload)
+        elif request.method == "DELETE":
+            query.delete()
+        else:
+            query.select(params.get("select", "*"))
+        for column, value in params.multi_items():
+            if column in ("or", "and"):
+                query.filters.append(_logic_tree(column, value[1:-1]))
+            elif column not in _REST_OPTIONS:
+                query.filters.append(_logic_tree("and", f"{column}.{value}"))
+        for part in filter(None, params.get("order", "").split(",")):
+            column, _, direction = part.partition(".")
+            query.order(column, desc=direction.startswith("desc"))
+        if "limit" in params:
+            query.limit(int(params["limit"]))
+
+        try:
+            result = query.execute()
+        except ConnectionError as e:
+            return JSONResponse(status_code=503, content={"message": str(e)})
+        if "return=minimal" in prefer:
+            return Response(status_code=204)
+        return JSONResponse(status_code=201 if request.method == "POST" else 200, content=result.data)
+
+    @app.get("/auth/v1/user")
+    async def user(request: Request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        found = app.state.db.auth.get_user(token).user
+        return {"id": found.id, "aud": "authenticated", "email": found.email,
+                "app_metadata": {}, "user_metadata": {}, "created_at": "2025-01-01T00:00:00Z"}
+
+    return app
+
+
+def start_in_thread(port, db=None, latency=0.0):
+    """Serve create_supabase_app from a background thread; returns the uvicorn server"""
+    config = uvicorn.Config(create_supabase_app(db, latency), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8961)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    args = parser.parse_args()
+    uvicorn.run(create_supabase_app(latency=args.latency), host="127.0.0.1", port=args.port, log_level="warning")
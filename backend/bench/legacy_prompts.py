@@ -0,0 +1,254 @@
+"""The prompt builders exactly as they were before prompts.py, kept for bench/prompt_build.py."""
+from datetime import datetime
+
+
+def legacy_roadmap_messages(data):
+    gpa = data.get("gpa")
+    grade = data.get("grade")
+    interests = data.get("interests")
+    activities = data.get("activities")
+    demographic = data.get("demographics")
+    testing = data.get("testing")
+    goals = data.get("collegeGoals")
+    classes = data.get("classes")
+    location = data.get("location")
+    
+    # 1. Get Current Date & Logic
+    now = datetime.now()
+    current_date_str = now.strftime("%B %Y")
+    
+    # Determine timeline duration
+    if "9" in str(grade) or "freshman" in str(grade).lower():
+        duration_note = "Start NOW. Cover 9th and 10th grade in semesters, then 11th/12th in detail."
+    elif "10" in str(grade) or "sophomore" in str(grade).lower():
+        duration_note = "Start NOW. Cover the rest of 10th, all of 11th, and end at Jan of 12th Grade."
+    elif "11" in str(grade) or "junior" in str(grade).lower():
+        duration_note = "Start NOW. Cover 11th Spring/Summer and 12th Fall/Winter in detail."
+    else:
+        duration_note = "Start NOW. Focus on Senior Winter/Spring transition to college."
+
+    # 2. STRICT JSON SCHEMA
+    # Enhanced schema with specificity requirements
+    json_schema = """
+    {
+      "student_summary": "A warm, personalized paragraph summarizing their profile and unique strengths.",
+      "college_list_suggestions": {
+         "reach": ["School A with specific major/program", "School B with specific major/program", "School C with specific major/program"],
+         "target": ["School C with specific major/program", "School D with specific major/program", "School E with specific major/program"],
+         "safety": ["School E with specific major/program", "School F with specific major/program", "School N with specific major/program"]
+      },
+      "academic_plan": {
+         "course_suggestions": ["Specific Course Name (e.g., 'AP Calculus BC' not 'math class')", "Specific Course Name"],
+         "testing_strategy": "Specific, actionable advice with target scores, test dates, and preparation timeline"
+      },
+      "extracurriculars": {
+         "current_optimization": "Specific, actionable steps to improve existing activities with measurable outcomes",
+         "new_opportunities": ["Specific opportunity name with why it fits (e.g., 'Join Model UN - builds public speaking skills needed for Political Science')", "Specific opportunity 2"]
+      },
+      "timeline": [
+        {
+          "period": "Specific Season/Year (e.g., 'Fall 2025' not 'next semester')", 
+          "focus": "Specific main theme/goal for this period",
+          "tasks": ["Specific, actionable task with deadline or timeframe (e.g., 'Register for PSAT by September 15th' not 'take a test')", "Another specific task"]
+        }
+      ]
+    }
+    """
+
+    # 3. STRATEGIC GUIDELINES (Enhanced with specificity requirements)
+    logic_constraints = f"""
+    1. TIMELINE CONTEXT: Current date is {current_date_str}. {duration_note}
+    2. MANDATORY SECTIONS: Fill every field in the JSON schema.
+    
+    3. SPECIFICITY REQUIREMENTS - CRITICAL:
+       - All tasks must be SPECIFIC and ACTIONABLE. Use concrete actions, not vague suggestions.
+       - Good task: "Register for October PSAT by September 15th through CollegeBoard website"
+       - Bad task: "Take a test" or "Study more" or "Do well in school"
+       - Include WHO, WHAT, WHEN, WHERE, and HOW when relevant.
+       - Each task should have a clear, measurable outcome.
+       
+    4. GOAL SPECIFICITY:
+       - Course suggestions must include full course names (e.g., "AP Computer Science A" not "a CS class").
+       - College suggestions should include the specific major/program (e.g., "MIT - Computer Science and Engineering" not just "MIT").
+       - Timeline periods must be specific (e.g., "Fall 2025 - 11th Grade" not "next fall").
+       - Testing strategy must include target scores, specific test dates, and preparation methods.
+       
+    5. LOCATION STRATEGY: 
+       - User Preference: "{location}"
+       - Prioritize schools in this region with specific major matches.
+       - When suggesting schools outside the region, explicitly state why (e.g., "UC Berkeley - #1 in Computer Science, worth considering despite being out of state").
+    
+    6. SCHOOL LIST REALISM AND SPECIFICITY:
+       - Ensure "Safety" schools are actually safe (typically >50% acceptance or local options).
+       - Include specific major/program for each school (e.g., "Arizona State University - Computer Science" not just "ASU").
+       - Be cautious with competitive majors. For example, CS at UIUC or UW is very hard, so they are "Targets" or "Reaches" not Safeties.
+       - For Art majors, RISD or CalArts are Reaches. Suggest specific state schools with good art programs for Safeties.
+       - Include 2-3 schools per category (Reach, Target, Safety) for optimal balance.
+       
+    7. TESTING STRATEGY SPECIFICITY:
+       - If they are young (9th/10th), provide specific test names (PSAT/NMSQT), registration deadlines, and target scores.
+       - If older, provide specific SAT/ACT test dates, registration deadlines, and score goals.
+       - Include preparation method recommendations (e.g., "Take 3 practice tests using Khan Academy before October SAT").
+       - If test-optional, explain which schools accept this and when they might still want to test.
+       
+    8. EXTRACURRICULAR SPECIFICITY:
+       - "Current Optimization" should include 2-3 specific, actionable steps to improve existing activities.
+       - "New Opportunities" should name specific clubs/organizations and explain why they fit the student's profile.
+       - Include leadership opportunities when applicable (e.g., "Run for Debate Team Captain in November").
+       
+    9. TIMELINE TASK SPECIFICITY:
+       - Each timeline task must include:
+         * Specific action verb (Register, Complete, Apply, Join, etc.)
+         * What exactly to do (course name, test name, program name)
+         * When (deadline or timeframe)
+         * Optional: Where (website, location) or How (method)
+       - Tasks should be sequenced logically (prerequisites first, then next steps).
+       - Include deadlines for time-sensitive items (application deadlines, test registration dates).
+       
+    10. HOLISTIC PROFILE CONNECTIONS:
+       - Identify connections between interests and suggest interdisciplinary paths.
+       - Example: Art + Biology → Medical Illustration, recommend specific programs.
+       - Make connections explicit in the student_summary or task descriptions.
+    """
+
+    # 4. Enhanced Final Prompt with examples
+    prompt = (
+        f"You are a supportive, detail-oriented college admissions mentor. Generate a highly specific, actionable JSON roadmap.\n"
+        f"Student Profile:\n"
+        f"- Grade: {grade}\n"
+        f"- GPA: {gpa}\n"
+        f"- Interests: {interests}\n"
+        f"- Activities: {activities}\n"
+        f"- Demographics: {demographic}\n"
+        f"- Testing Status: {testing}\n"
+        f"- College Goals: {goals}\n"
+        f"- Location Preference: {location}\n"
+        f"- Course Rigor: {classes}\n\n"
+        
+        f"### CRITICAL REQUIREMENTS FOR SPECIFICITY\n"
+        f"Every output must be SPECIFIC and ACTIONABLE. Avoid vague suggestions.\n\n"
+        f"EXAMPLES OF GOOD VS BAD:\n"
+        f"- ❌ BAD: 'Take the SAT'\n"
+        f"- ✅ GOOD: 'Register for October 7th SAT by September 8th via CollegeBoard.org. Aim for 1450+ based on current {gpa} GPA.'\n\n"
+        f"- ❌ BAD: 'Join some clubs'\n"
+        f"- ✅ GOOD: 'Apply to Model UN by September 20th. This builds public speaking skills aligned with your Political Science interest.'\n\n"
+        f"- ❌ BAD: 'Study for tests'\n"
+        f"- ✅ GOOD: 'Complete 3 full-length SAT practice tests using Khan Academy (one per week in September). Review wrong answers thoroughly.'\n\n"
+        
+        f"### STRATEGIC GUIDELINES\n"
+        f"{logic_constraints}\n\n"
+
+        f"### OUTPUT INSTRUCTIONS\n"
+        f"You must output valid JSON using the exact schema below. Fill in EVERY field with SPECIFIC, DETAILED information.\n"
+        f"Remember: Specificity is key. Each task, suggestion, and recommendation should be concrete and actionable.\n"
+        f"{json_schema}"
+    )
+
+    return [
+        {"role": "system", "content": "You are a JSON-only API. You must return valid JSON with all requested fields."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def legacy_essay_messages(data):
+    grade = data.get("grade")
+    prompt_text = data.get("prompt")
+    essay = data.get("essay")
+    program = data.get("program")
+    word_limit = data.get("word_limit")
+    
+    # ... (Keep existing word count logic) ...
+    word_count = len(essay.split())
+    length_instruction = f"Current Word Count: {word_count} words."
+    if word_limit:
+        length_instruction += f" / Limit: {word_limit} words."
+    else:
+        length_instruction += " (No specific limit provided)."
+
+    # 1. NEW JSON SCHEMA: COMPONENT SCORING
+    json_schema = """
+    {
+      "pre_grading_analysis": {
+        "cliche_count": 0,
+        "cliches_found": ["List phrases"],
+        "is_generic_topic": true,
+        "predicted_impact": "Will the reader yawn or cry?"
+      },
+      "scoring_breakdown": {
+        "voice_and_authenticity": { "score": 15, "max": 20, "reason": "..." },
+        "insight_and_growth": { "score": 15, "max": 20, "reason": "..." },
+        "storytelling_and_craft": { "score": 15, "max": 20, "reason": "..." },
+        "originality_and_risk": { "score": 15, "max": 20, "reason": "..." },
+        "prompt_responsiveness": { "score": 15, "max": 20, "reason": "..." }
+      },
+      "letter_grade": 75,
+      "summary_badge": "Generic & Safe | Risky & Raw | Polished but Boring | Exceptional",
+      "key_strengths": ["Strength 1", "Strength 2"],
+      "areas_for_improvement": ["Fix 1", "Fix 2"],
+      "final_summary": "Summary...",
+      "detailed_action_plan": "Specific next steps..."
+    }
+    """
+
+    # 2. SYSTEM PROMPT: FORCE DISTRIBUTION
+    system_instruction = f"""
+You are a **CYNICAL ADMISSIONS OFFICER** who is tired of reading generic essays.
+Student Context: Grade {grade}, applying to {program}.
+
+### SCORING PROTOCOL (COMPONENT METHOD)
+You must grade on 5 distinct components (Max 20 points each).
+**TOTAL SCORE = Sum of components.**
+
+**1. Voice & Authenticity (Max 20)**
+- 18-20: Sounds exactly like a teenager talking to a friend. Raw, vulnerable.
+- 14-17: Polished but slightly "resume-speak."
+- <14: Sounds like ChatGPT or a parent wrote it.
+
+**2. Insight & Growth (Max 20)**
+- 18-20: A profound realization that changes their worldview.
+- 14-17: "I worked hard and succeeded." (Standard)
+- <14: No lesson learned, or the lesson is a cliché.
+
+**3. Storytelling & Craft (Max 20)**
+- 18-20: vivid imagery, "Show don't tell," cinematic pacing.
+- 14-17: Readable but relies on adjectives ("it was difficult") rather than scenes.
+- <14: Confusing structure or boring list of events.
+
+**4. Originality & Risk (Max 20)**
+- 18-20: Topic or angle I have NEVER seen before.
+- 14-17: Common topic (sports/mission trip) but with a slight twist.
+- <14: The "Costco Rotisserie Chicken" of generic essays (Sports, Dead Pet, Divorce, Moving). **CAP THIS AT 12 POINTS IF GENERIC.**
+
+**5. Prompt Responsiveness (Max 20)**
+- 18-20: Answers the prompt deeply and directly.
+- <14: Ignores the prompt to tell a tangentially related story.
+
+### MANDATORY PENALTIES
+- If the essay is a "Sports Injury" or "Mission Trip" essay: **Max Total Score is 82** (unless it subverts the genre perfectly).
+- If cliches > 3: **Deduct 5 points from total.**
+
+### GRADE CALIBRATION
+- **93+**: Top 1% of applicants. (Requires 19/20 in Originality).
+- **85-92**: Strong, admit-ready.
+- **75-84**: The "Safe Zone." Good grammar, boring content. **MOST ESSAYS ARE HERE.**
+- **< 75**: Weak.
+
+**DO NOT DEFAULT TO 93.** If it feels "fine," give it a 78.
+"""
+
+    user_content = f"""
+Prompt: {prompt_text}
+
+Student Essay:
+{essay}
+
+Analyze and grade based on the component system. 
+Calculate the 'letter_grade' by summing the 5 component scores.
+Output valid JSON:
+{json_schema}
+"""
+
+    return [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": user_content},
+    ]
@@ -0,0 +1,101 @@
+"""Load test: GET /roadmaps latency while many /generate calls are in flight.
+
+Runs the app in-process against the stub LLM server and an in-memory supabase,
+so nothing external is touched:
+
+    cd backend && python -m bench.load_generate --generate 50 --latency 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+STUB_PORT = 8931
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+os.environ["DEV_MODE"] = "true"
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from bench.fakes import FakeSupabase  # noqa: E402
+from bench.stub_llm import start_in_thread  # noqa: E402
+
+AUTH = {"Authorization": "Bearer dev-token-bypass"}
+PROFILE = {
+    "gpa": "3.8", "grade": "11th", "interests": "Robotics, teaching",
+    "activities": "Robotics team", "testing": "PSAT 1300", "collegeGoals": "Engineering",
+    "classes": "AP Physics", "location": "California",
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def describe(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<28} n={len(ms):<4} p50={statistics.median(ms):7.2f}ms "
+          f"p99={percentile(ms, 99):7.2f}ms max={max(ms):7.2f}ms")
+
+
+async def poll_roadmaps(http, stop):
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await http.get("/roadmaps", headers=AUTH)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+        await asyncio.sleep(0.01)
+    return samples
+
+
+async def run(args):
+    main.supabase = FakeSupabase()
+    main.rate_limiter.enabled = False
+    # ASGITransport doesn't run startup/shutdown hooks, so start the writer ourselves
+    await main.writer.start()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as http:
+        # Baseline: nothing else in flight
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_roadmaps(http, stop))
+        await asyncio.sleep(args.latency)
+        stop.set()
+        idle = await poller
+
+        # Under load: N roadmap generations in flight at once
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_roadmaps(http, stop))
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            # bypass the response cache so every call really goes upstream
+            http.post("/generate", json=dict(PROFILE, cache="bypass"), headers=AUTH)
+            for _ in range(args.generate)
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        loaded = await poller
+    await main.writer.stop()
+
+    codes = {}
+    for response in responses:
+        codes[response.status_code] = codes.get(response.status_code, 0) + 1
+    print(f"/generate x{args.generate}: {elapsed:.2f}s total, status codes {codes}")
+    describe("GET /roadmaps idle", idle)
+    describe("GET /roadmaps under load", loaded)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--generate", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=2.0, help="stub completion latency in seconds")
+    args = parser.parse_args()
+    start_in_thread(STUB_PORT, latency=args.latency)
+    asyncio.run(run(args))
@@ -0,0 +1,521 @@
+"""Load test the whole service: uvicorn workers against the stub LLM and a fake Supabase.
+
+    cd backend && python -m bench.loadtest --scenario mixed --concurrency 50 --duration 30 --workers 2
+    cd backend && python -m bench.loadtest --compare bench/results/before.json bench/results/after.json
+
+Starts bench.stub_llm and the fake Supabase (bench.fakes) in their own
+processes, seeds every bench user with saved roadmaps and essays, then runs
+`uvicorn main:app --workers N` and drives it from `--concurrency` clients,
+each sending its next request as soon as the last one is answered, for
+`--duration` seconds after a `--warmup`.
+
+Reports RPS and p50/p95/p99 per endpoint, and for each worker its event-loop
+lag (from event_loop_lag_seconds), peak RSS and CPU. Everything is saved as
+JSON (default bench/results/<scenario>-<time>.json); --compare prints two runs
+side by side and exits 1 if the second one regressed by more than --threshold.
+
+The client's own loop lag and CPU are reported too: if the client is pegged,
+it's the bottleneck and the server numbers are a floor.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from bench.essay_analysis import sample_essay
+from bench.fakes import BENCH_JWT_SECRET, make_token
+from bench.stub_llm import full_size_feedback, full_size_roadmap
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+
+PROFILE = {
+    "gpa": "3.8", "grade": "11th", "interests": "Robotics, teaching",
+    "activities": "Robotics team", "testing": "PSAT 1300", "collegeGoals": "Engineering",
+    "classes": "AP Physics", "location": "California",
+}
+# /metrics wants this once DEV_MODE is off
+METRICS_TOKEN = "bench-metrics-token"
+ESSAY_PROMPT = "Tell us about a skill you taught yourself."
+
+# op: weight. list_* are what a dashboard load sends (summary lists), *_full the
+# whole history with documents, get_* one saved document.
+SCENARIOS = {
+    "generate": {"generate": 1},
+    "essay": {"essay": 1},
+    "dashboard": {"list_roadmaps": 1, "list_essays": 1},
+    "history": {"list_roadmaps_full": 1, "list_essays_full": 1, "get_roadmap": 2, "get_essay": 2},
+    "delete": {"delete_roadmap": 1, "delete_essay": 1},
+    "mixed": {"generate": 1, "essay": 2, "list_roadmaps": 6, "list_essays": 6, "get_roadmap": 3,
+              "get_essay": 3, "delete_roadmap": 1, "delete_essay": 1},
+}
+
+
+class User:
+    def __init__(self, number):
+        self.id = str(uuid.UUID(int=number + 1))
+        self.headers = {"Authorization": f"Bearer {make_token(self.id)}"}
+        self.roadmaps = []
+        self.essays = []
+
+
+def roadmap_row(user, roadmap):
+    return {
+        "id": str(uuid.uuid4()), "user_id": user.id, "gpa": PROFILE["gpa"], "grade": PROFILE["grade"],
+        "interests": PROFILE["interests"], "activities": PROFILE["activities"], "demographics": None,
+        "testing": PROFILE["testing"], "college_goals": PROFILE["collegeGoals"], "location": PROFILE["location"],
+        "classes": PROFILE["classes"], "roadmap_content": roadmap, "prompt_version": "bench", "revision": 0,
+    }
+
+
+def essay_row(user, essay, feedback):
+    return {
+        "id": str(uuid.uuid4()), "user_id": user.id, "grade": "12", "prompt": ESSAY_PROMPT,
+        "essay_text": essay, "program": "Common App", "feedback": feedback,
+        "letter_grade": feedback["letter_grade"], "prompt_version": "bench",
+        "parent_id": None, "base_id": None, "delta": None,
+    }
+
+
+async def seed(supabase, users, count):
+    """Give every user `count` saved roadmaps and essays, straight into the fake Supabase (not timed)"""
+    roadmap, feedback, essay = full_size_roadmap(), full_size_feedback(), sample_essay()
+    for user in users:
+        roadmaps = [roadmap_row(user, roadmap) for _ in range(count)]
+        essays = [essay_row(user, essay, feedback) for _ in range(count)]
+        for table, rows in (("roadmaps", roadmaps), ("essays", essays)):
+            if rows:
+                response = await supabase.post(f"/rest/v1/{table}", json=rows)
+                response.raise_for_status()
+        user.roadmaps += [row["id"] for row in roadmaps]
+        user.essays += [row["id"] for row in essays]
+
+
+def build_request(op, user, rng, cache):
+    """(method, path, body) for one op, or None if the user has nothing saved to use it on"""
+    bypass = {} if cache else {"cache": "bypass"}
+    if op == "generate":
+        return "POST", "/generate", dict(PROFILE, **bypass)
+    if op == "essay":
+        essay = sample_essay(seed=rng.randrange(1000))
+        return "POST", "/essay", {"essay": essay, "grade": "12", "prompt": ESSAY_PROMPT, **bypass}
+    if op in ("list_roadmaps", "list_essays"):
+        return "GET", f"/{op[5:]}?summary=true", None
+    if op in ("list_roadmaps_full", "list_essays_full"):
+        return "GET", f"/{op[5:-5]}", None
+    pool = user.roadmaps if op.endswith("roadmap") else user.essays
+    if not pool:
+        return None
+    table = "roadmaps" if op.endswith("roadmap") else "essays"
+    if op.startswith("get_"):
+        return "GET", f"/{table}/{rng.choice(pool)}", None
+    return "DELETE", f"/{table}/{pool.pop(rng.randrange(len(pool)))}", None
+
+
+class Recorder:
+    def __init__(self):
+        self.measuring = False
+        self.latencies = {}
+        self.statuses = {}
+        self.bytes = Counter()
+
+    def record(self, op, status, seconds, size):
+        if not self.measuring:
+            return
+        self.latencies.setdefault(op, []).append(seconds)
+        self.statuses.setdefault(op, Counter())[str(status)] += 1
+        self.bytes[op] += size
+
+
+async def client_loop(http, supabase, users, weights, recorder, deadline, args, rng):
+    ops, cumulative = list(weights), list(weights.values())
+    while time.perf_counter() < deadline:
+        user = rng.choice(users)
+        op = rng.choices(ops, cumulative)[0]
+        request = build_request(op, user, rng, args.cache)
+        if request is None:
+            # deleted everything: save some more (untimed) and go again
+            await seed(supabase, [user], args.seed)
+            continue
+        method, path, body = request
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, path, json=body, headers=user.headers)
+            status, size = response.status_code, response.num_bytes_downloaded
+        except httpx.HTTPError as e:
+            status, size = type(e).__name__, 0
+        recorder.record(op, status, time.perf_counter() - start, size)
+        if status == 200 and op in ("generate", "essay"):
+            saved = response.json().get("id")
+            if saved:
+                (user.roadmaps if op == "generate" else user.essays).append(saved)
+
+
+async def loop_lag(samples, interval=0.05):
+    """The client's own event-loop lag, to tell when the client is the bottleneck"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def scrape(text):
+    """{worker: {"lag_buckets": {le: count}, "lag_sum", "lag_count", "rss"}} from a /metrics body"""
+    workers = {}
+    for family in text_string_to_metric_families(text):
+        if family.name not in ("event_loop_lag_seconds", "process_rss_bytes"):
+            continue
+        for sample in family.samples:
+            worker = workers.setdefault(sample.labels["worker"], {"lag_buckets": {}, "lag_sum": 0.0,
+                                                                  "lag_count": 0.0, "rss": 0.0})
+            if sample.name == "event_loop_lag_seconds_bucket":
+                worker["lag_buckets"][float(sample.labels["le"])] = sample.value
+            elif sample.name == "event_loop_lag_seconds_sum":
+                worker["lag_sum"] = sample.value
+            elif sample.name == "event_loop_lag_seconds_count":
+                worker["lag_count"] = sample.value
+            elif sample.name == "process_rss_bytes":
+                worker["rss"] = sample.value
+    return workers
+
+
+def bucket_quantile(buckets, count, q):
+    """Estimate a quantile from cumulative histogram buckets, interpolating inside the bucket"""
+    if not count:
+        return 0.0
+    target, previous_bound, previous_count = q * count, 0.0, 0.0
+    for bound, cumulative in sorted(buckets.items()):
+        if cumulative >= target:
+            if bound == float("inf"):
+                return previous_bound
+            share = (target - previous_count) / ((cumulative - previous_count) or 1)
+            return previous_bound + (bound - previous_bound) * share
+        previous_bound, previous_count = bound, cumulative
+    return previous_bound
+
+
+def cpu_seconds(pid):
+    """utime + stime of a process from /proc, or None off Linux"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def worker_report(before, after, peaks, cpu_before, cpu_after, elapsed):
+    report = {}
+    for worker, end in sorted(after.items()):
+        start = before.get(worker, {"lag_buckets": {}, "lag_sum": 0.0, "lag_count": 0.0})
+        buckets = {le: value - start["lag_buckets"].get(le, 0.0) for le, value in end["lag_buckets"].items()}
+        count = end["lag_count"] - start["lag_count"]
+        cpu = None
+        if cpu_before.get(worker) is not None and cpu_after.get(worker) is not None:
+            cpu = round((cpu_after[worker] - cpu_before[worker]) / elapsed * 100, 1)
+        report[worker] = {
+            "event_loop_lag_ms": {
+                "mean": round((end["lag_sum"] - start["lag_sum"]) / count * 1000, 2) if count else 0.0,
+                "p50": round(bucket_quantile(buckets, count, 0.50) * 1000, 2),
+                "p99": round(bucket_quantile(buckets, count, 0.99) * 1000, 2),
+            },
+            "rss_mb": {"end": round(end["rss"] / 2**20, 1), "peak": round(max(peaks.get(worker, 0.0), end["rss"]) / 2**20, 1)},
+            "cpu_percent": cpu,
+        }
+    return report
+
+
+async def sample_workers(http, peaks, stop, interval=1.0):
+    """Peak RSS per worker while the test runs"""
+    while not stop.is_set():
+        try:
+            for worker, data in scrape((await http.get("/metrics")).text).items():
+                peaks[worker] = max(peaks.get(worker, 0.0), data["rss"])
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def wait_for_workers(http, count, timeout=60):
+    """Until GET /ready answers and `count` workers have reported in to /metrics"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await http.get("/ready")).status_code == 200:
+                workers = scrape((await http.get("/metrics")).text)
+                if len(workers) >= count:
+                    return workers
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"app didn't come up with {count} workers in {timeout}s")
+
+
+async def wait_for_port(url, timeout=30):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.perf_counter() < deadline:
+            try:
+                await http.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+    raise SystemExit(f"{url} didn't come up in {timeout}s")
+
+
+def spawn(args, env, log):
+    return subprocess.Popen([sys.executable, "-m"] + args, cwd=BACKEND_DIR, env=env, stdout=log, stderr=log)
+
+
+async def run(args):
+    weights = SCENARIOS[args.scenario]
+    tmp = tempfile.mkdtemp(prefix="loadtest-")
+    log = open(os.path.join(tmp, "processes.log"), "w")
+    metrics_dir = os.path.join(tmp, "metrics")
+    os.mkdir(metrics_dir)
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    app_env = dict(
+        env,
+        GROQ_API_KEY="stub", GROQ_BASE_URL=f"http://127.0.0.1:{args.stub_port}",
+        SUPABASE_URL=f"http://127.0.0.1:{args.supabase_port}", SUPABASE_SERVICE_KEY="stub",
+        SUPABASE_JWT_SECRET=BENCH_JWT_SECRET, METRICS_TOKEN=METRICS_TOKEN, DEV_MODE="false", RATE_LIMIT_BACKEND="off",
+        RESPONSE_CACHE_BACKEND="memory", JOBS_BACKEND="memory",
+        PERSIST_JOURNAL_PATH=os.path.join(tmp, "journal.db"), PROMETHEUS_MULTIPROC_DIR=metrics_dir,
+    )
+    app_env.update(item.split("=", 1) for item in args.env)
+
+    stub_args = ["bench.stub_llm", "--port", str(args.stub_port), "--latency", str(args.llm_latency),
+                 "--error-rate", str(args.llm_error_rate)]
+    if args.tokens_per_second:
+        stub_args += ["--tokens-per-second", str(args.tokens_per_second)]
+    processes = [
+        spawn(stub_args, env, log),
+        spawn(["bench.fakes", "--port", str(args.supabase_port), "--latency", str(args.supabase_latency)], env, log),
+    ]
+    try:
+        await wait_for_port(f"http://127.0.0.1:{args.stub_port}/")
+        await wait_for_port(f"http://127.0.0.1:{args.supabase_port}/")
+        processes.append(spawn(
+            ["uvicorn", "main:app", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+            app_env, log,
+        ))
+
+        rng = random.Random(args.random_seed)
+        users = [User(n) for n in range(args.users)]
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits,
+                                     timeout=args.timeout) as http, \
+                httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.supabase_port}", timeout=60) as supabase, \
+                httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=10,
+                                  headers={"Authorization": f"Bearer {METRICS_TOKEN}"}) as probe:
+            await wait_for_workers(probe, args.workers)
+            await seed(supabase, users, args.seed)
+            print(f"🚦 {args.scenario}: {args.concurrency} clients, {args.users} users with {args.seed} saved "
+                  f"roadmaps/essays each, {args.workers} worker(s), {args.warmup}s warmup + {args.duration}s")
+
+            recorder, client_lag = Recorder(), []
+            lag_task = asyncio.create_task(loop_lag(client_lag))
+            deadline = time.perf_counter() + args.warmup + args.duration
+            clients = [
+                asyncio.create_task(client_loop(http, supabase, users, weights, recorder, deadline, args,
+                                                random.Random(rng.random())))
+                for _ in range(args.concurrency)
+            ]
+            await asyncio.sleep(args.warmup)
+
+            before = scrape((await probe.get("/metrics")).text)
+            cpu_before = {worker: cpu_seconds(worker) for worker in before}
+            usage_before = resource.getrusage(resource.RUSAGE_SELF)
+            client_lag.clear()
+            recorder.measuring = True
+            started = time.perf_counter()
+            peaks, stop = {}, asyncio.Event()
+            sampler = asyncio.create_task(sample_workers(probe, peaks, stop))
+
+            await asyncio.sleep(args.duration)
+            recorder.measuring = False
+            elapsed = time.perf_counter() - started
+            usage_after = resource.getrusage(resource.RUSAGE_SELF)
+            after = scrape((await probe.get("/metrics")).text)
+            cpu_after = {worker: cpu_seconds(worker) for worker in after}
+            stop.set()
+            await sampler
+            await asyncio.gather(*clients)
+            lag_task.cancel()
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+
+    endpoints = {}
+    for op in weights:
+        samples = recorder.latencies.get(op)
+        if not samples:
+            continue
+        ms = [s * 1000 for s in samples]
+        statuses = recorder.statuses[op]
+        endpoints[op] = {
+            "requests": len(ms),
+            "rps": round(len(ms) / elapsed, 2),
+            "errors": sum(n for status, n in statuses.items() if not status.startswith("2")),
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p95_ms": round(percentile(ms, 95), 2),
+            "p99_ms": round(percentile(ms, 99), 2),
+            "max_ms": round(max(ms), 2),
+            "mean_kb": round(recorder.bytes[op] / len(ms) / 1024, 2),
+            "statuses": dict(statuses),
+        }
+    client_cpu = (usage_after.ru_utime + usage_after.ru_stime - usage_before.ru_utime - usage_before.ru_stime)
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "scenario": args.scenario,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "out")},
+        "elapsed_s": round(elapsed, 2),
+        "totals": {
+            "requests": total,
+            "rps": round(total / elapsed, 2),
+            "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+        },
+        "endpoints": endpoints,
+        "workers": worker_report(before, after, peaks, cpu_before, cpu_after, elapsed),
+        "client": {
+            "cpu_percent": round(client_cpu / elapsed * 100, 1),
+            "event_loop_lag_p99_ms": round(percentile(client_lag, 99) * 1000, 2) if client_lag else None,
+        },
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def print_result(result):
+    totals = result["totals"]
+    print(f"{result['scenario']} @ {result['commit']}: {totals['requests']} requests in {result['elapsed_s']}s, "
+          f"{totals['rps']} req/s, {totals['errors']} errors")
+    print(f"  {'endpoint':<20} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'KB':>8}  statuses")
+    for op, stats in result["endpoints"].items():
+        print(f"  {op:<20} {stats['rps']:>8.1f} {stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms "
+              f"{stats['p99_ms']:>7.1f}ms {stats['mean_kb']:>8.1f}  {stats['statuses']}")
+    for worker, stats in result["workers"].items():
+        lag = stats["event_loop_lag_ms"]
+        print(f"  worker {worker:<8} loop lag p50 {lag['p50']:.2f}ms p99 {lag['p99']:.2f}ms  "
+              f"RSS {stats['rss_mb']['end']}MB (peak {stats['rss_mb']['peak']}MB)  CPU {stats['cpu_percent']}%")
+    client = result["client"]
+    print(f"  client: CPU {client['cpu_percent']}%, loop lag p99 {client['event_loop_lag_p99_ms']}ms")
+    if client["cpu_percent"] > 90:
+        print("  ⚠️ the client was CPU-bound, so these numbers are a floor; use fewer clients or a faster machine")
+
+
+def compare(old_path, new_path, threshold):
+    """Print two runs side by side; returns the regressions beyond `threshold` (a fraction)"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def change(a, b):
+        return (b - a) / a if a else 0.0
+
+    regressions = []
+    print(f"{old_path} ({old['commit']})  ->  {new_path} ({new['commit']})")
+    print(f"  {'endpoint':<20} {'req/s':>18} {'p50 ms':>20} {'p95 ms':>20} {'p99 ms':>20}")
+    for op in sorted(set(old["endpoints"]) | set(new["endpoints"])):
+        a, b = old["endpoints"].get(op), new["endpoints"].get(op)
+        if a is None or b is None:
+            print(f"  {op:<20} only in {'new' if a is None else 'old'} run")
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            delta = change(a[key], b[key])
+            cells.append(f"{a[key]:>7.1f} -> {b[key]:>7.1f} {delta:+4.0%}")
+        print(f"  {op:<20} " + "  ".join(cells))
+        if change(a["rps"], b["rps"]) < -threshold:
+            regressions.append(f"{op} req/s {a['rps']} -> {b['rps']}")
+        if change(a["p95_ms"], b["p95_ms"]) > threshold:
+            regressions.append(f"{op} p95 {a['p95_ms']}ms -> {b['p95_ms']}ms")
+        if b["errors"] / b["requests"] > a["errors"] / a["requests"] + 0.01:
+            regressions.append(f"{op} errors {a['errors']}/{a['requests']} -> {b['errors']}/{b['requests']}")
+    for label, run_ in (("old", old), ("new", new)):
+        workers = run_["workers"].values()
+        if workers:
+            print(f"  {label}: worst loop lag p99 {max(w['event_loop_lag_ms']['p99'] for w in workers):.2f}ms, "
+                  f"peak RSS {max(w['rss_mb']['peak'] for w in workers)}MB")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=20, help="clients with one request in flight each")
+    parser.add_argument("--duration", type=float, default=30, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds run before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=30, help="saved roadmaps and essays per user to start with")
+    parser.add_argument("--cache", action="store_true", help="let the response cache answer repeat submissions")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM seconds per call")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="stub LLM completion speed")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of stub LLM calls that 503")
+    parser.add_argument("--supabase-latency", type=float, default=0.005, help="fake Supabase seconds per call")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the app, e.g. LLM_MAX_CONCURRENCY=64")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8962)
+    parser.add_argument("--stub-port", type=int, default=8960)
+    parser.add_argument("--supabase-port", type=int, default=8961)
+    parser.add_argument("--out", help="where to save the JSON results")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved runs instead")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        found = compare(*args.compare, args.threshold)
+        for regression in found:
+            print(f"  ❌ {regression}")
+        sys.exit(1 if found else 0)
+
+    result = asyncio.run(run(args))
+    print_result(result)
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{args.scenario}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"💾 {out}")
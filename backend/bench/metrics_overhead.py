@@ -0,0 +1,67 @@
+"""Cost of the instrumentation on the hot path.
+
+    cd backend && python -m bench.metrics_overhead
+
+Times a `timed()` stage block on its own, then a request through a bare ASGI
+app with and without MetricsMiddleware + the eight stage timers a /generate
+request records, calling the app directly so no HTTP client noise is included.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import metrics
+from metrics import MetricsMiddleware, timed
+
+STAGES = [("request", "auth"), ("roadmap", "validate"), ("roadmap", "prompt"), ("llm", "slot_wait"),
+          ("llm", "completion"), ("roadmap", "completion"), ("roadmap", "parse"), ("roadmaps", "insert")]
+
+
+def make_app(instrumented):
+    async def app(scope, receive, send):
+        if instrumented:
+            for pipeline, stage in STAGES:
+                with timed(pipeline, stage):
+                    pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    return MetricsMiddleware(app) if instrumented else app
+
+
+async def per_request(app, n):
+    scope = {"type": "http", "method": "POST", "path": "/generate", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def per_stage(n):
+    start = time.perf_counter()
+    for _ in range(n):
+        with timed("bench", "noop"):
+            pass
+    return (time.perf_counter() - start) / n * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=20000)
+    args = parser.parse_args()
+    print(f"one timed() stage:                 {per_stage(args.n):6.2f}us")
+    for server_timing in (False, True):
+        metrics.SERVER_TIMING = server_timing
+        bare = asyncio.run(per_request(make_app(False), args.n))
+        instrumented = asyncio.run(per_request(make_app(True), args.n))
+        print(f"request overhead (Server-Timing {'on ' if server_timing else 'off'}): "
+              f"{instrumented - bare:6.2f}us  ({bare:.2f}us -> {instrumented:.2f}us)")
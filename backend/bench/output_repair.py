@@ -0,0 +1,82 @@
+"""What broken model output costs: local repair + refill vs asking for the whole thing again.
+
+    cd backend && python -m bench.output_repair --truncate-rate 0.3 -n 40
+
+The stub cuts `--truncate-rate` of its answers off partway through (as if the
+completion hit max_tokens). Every /generate call still has to come back with
+a valid roadmap; the bench reports how each answer got there, the completion
+tokens the refills cost, and what re-running the whole
+completion for each broken answer would have cost instead.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+STUB_PORT = 8949
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+os.environ["DEV_MODE"] = "true"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from bench import stub_llm  # noqa: E402
+from bench.fakes import FakeSupabase  # noqa: E402
+from bench.load_generate import AUTH, PROFILE  # noqa: E402
+from metrics import STRUCTURED_OUTPUTS  # noqa: E402
+from schemas import parse_document  # noqa: E402
+
+OUTCOMES = ["valid", "repaired", "refilled", "failed"]
+
+
+def outcomes():
+    return {outcome: STRUCTURED_OUTPUTS.labels("roadmap", outcome)._value.get() for outcome in OUTCOMES}
+
+
+def local_repair_cost(n):
+    """Median time parse_document takes on a truncated roadmap"""
+    text = json.dumps(stub_llm.SAMPLE_ROADMAP)
+    cut = text[:int(len(text) * 0.8)]
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        parse_document("roadmap", cut)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--truncate-rate", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--tokens-per-second", type=float, default=1000)
+    parser.add_argument("-n", type=int, default=40)
+    args = parser.parse_args()
+
+    stub_llm.SAMPLE_ROADMAP.clear()
+    stub_llm.SAMPLE_ROADMAP.update(stub_llm.full_size_roadmap())
+    full_tokens = len(json.dumps(stub_llm.SAMPLE_ROADMAP)) / 4
+    server = stub_llm.start_in_thread(STUB_PORT, latency=args.latency)
+    server.config.app.state.tokens_per_second = args.tokens_per_second
+    server.config.app.state.faults = {"*": {"truncate_rate": args.truncate_rate}}
+    main.supabase = FakeSupabase()
+    main.rate_limiter.enabled = False
+
+    with TestClient(main.app) as client:
+        before = outcomes()
+        statuses = []
+        for _ in range(args.n):
+            statuses.append(client.post("/generate", json=dict(PROFILE, cache="bypass"), headers=AUTH).status_code)
+        counts = {outcome: int(outcomes()[outcome] - before[outcome]) for outcome in OUTCOMES}
+
+    broken = counts["repaired"] + counts["refilled"] + counts["failed"]
+    print(f"{args.n} roadmaps, {args.truncate_rate:.0%} of answers truncated: {counts}")
+    print(f"  HTTP 200: {statuses.count(200)}/{args.n}")
+    print(f"  repair success rate: {(broken - counts['failed']) / broken:.0%}" if broken else "  nothing to repair")
+    print(f"  local repair of a truncated roadmap: {local_repair_cost(200) * 1e6:.0f}us")
+    print(f"  extra completion tokens, refills: {server.config.app.state.refill_tokens}"
+          f"   vs re-running every broken answer: ~{broken * full_tokens:.0f}")
@@ -0,0 +1,70 @@
+"""Prompt size and build time, old f-string builders vs the prompts.py templates.
+
+    cd backend && python -m bench.prompt_build
+
+Tokens are estimated at ~4 characters each (no Llama tokenizer here), which is
+close enough to compare the two. "Cacheable" is the leading part of the prompt
+that is byte-identical across requests, i.e. what the provider can reuse from
+its prompt cache instead of processing again.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import prompts
+from bench.legacy_prompts import legacy_essay_messages, legacy_roadmap_messages
+
+PROFILES = [
+    {"gpa": "3.8", "grade": "11th", "interests": "Robotics, teaching", "activities": "Robotics team",
+     "testing": "PSAT 1300", "collegeGoals": "Engineering", "classes": "AP Physics", "location": "California"},
+    {"gpa": "3.2", "grade": "9th", "interests": "Art history", "activities": "Volunteer at museum",
+     "demographics": "First-gen", "testing": "None yet", "collegeGoals": "Liberal arts",
+     "classes": "Honors English", "location": "Northeast"},
+]
+ESSAYS = [
+    {"essay": "The first time I took apart a radio I was seven. " * 40, "grade": "12",
+     "program": "Engineering", "prompt": "Describe a challenge you overcame.", "word_limit": 650},
+    {"essay": "My grandmother's kitchen smelled like cardamom. " * 60, "grade": "11",
+     "program": "Nursing", "prompt": "Tell us about your background."},
+]
+
+
+def tokens(text):
+    return len(text) // 4
+
+
+def common_prefix(texts):
+    return os.path.commonprefix(texts)
+
+
+def flatten(messages):
+    return "".join(m["role"] + m["content"] for m in messages)
+
+
+def timed(build, inputs, rounds):
+    samples = []
+    for _ in range(rounds):
+        for data in inputs:
+            start = time.perf_counter()
+            build(data)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def compare(label, old, new, inputs, rounds):
+    print(label)
+    for name, build in (("before", old), ("after", new)):
+        prompts_built = [flatten(build(data)) for data in inputs]
+        size = statistics.mean(tokens(p) for p in prompts_built)
+        shared = tokens(common_prefix(prompts_built))
+        print(f"  {name:<7} ~{size:6.0f} tokens/request  cacheable prefix ~{shared:5d} tokens "
+              f"({shared / size:4.0%})  build p50={timed(build, inputs, rounds):7.1f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    compare("roadmap", legacy_roadmap_messages, prompts.build_roadmap_messages, PROFILES, args.rounds)
+    compare("essay", legacy_essay_messages, prompts.build_essay_messages, ESSAYS, args.rounds)
@@ -0,0 +1,64 @@
+"""Does the limit hold across worker processes, and what does a check cost?
+
+    cd backend && python -m bench.ratelimit_workers --workers 4 --seconds 3
+
+Each process hammers the same users' buckets for a few seconds. With the
+per-process memory backend every worker hands out its own allowance (the old
+slowapi behaviour); with the shared sqlite file the total admitted stays at
+burst + refill * elapsed no matter how many workers there are.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from ratelimit import MemoryBuckets, SQLiteBuckets
+
+CAPACITY = 15000.0
+RATE = 200.0   # tokens/second, i.e. 12k a minute
+COST = 4200.0  # about one roadmap
+USERS = 8
+
+
+def hammer(backend, path, seconds, results):
+    store = SQLiteBuckets(path) if backend == "sqlite" else MemoryBuckets()
+    admitted, checks, latency = 0.0, 0, 0.0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        for user in range(USERS):
+            start = time.perf_counter()
+            allowed, _ = store.take(f"interactive:user-{user}", COST, CAPACITY, RATE, time.time())
+            latency += time.perf_counter() - start
+            checks += 1
+            admitted += COST if allowed else 0
+    results.put((admitted, checks, latency))
+
+
+def run(backend, workers, seconds):
+    path = os.path.join(tempfile.mkdtemp(), "ratelimit.db")
+    if backend == "sqlite":
+        SQLiteBuckets(path)  # create the table before the workers race for it
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=hammer, args=(backend, path, seconds, results)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    totals = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    admitted = sum(t[0] for t in totals)
+    checks = sum(t[1] for t in totals)
+    mean_us = sum(t[2] for t in totals) / checks * 1e6
+    allowed_per_user = CAPACITY + RATE * seconds
+    print(f"{backend:<7} workers={workers}  checks/s={checks / seconds:9.0f}  mean check={mean_us:6.1f}us  "
+          f"admitted per user={admitted / USERS:8.0f} tokens (limit {allowed_per_user:.0f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    for workers in sorted({1, args.workers}):
+        for backend in ("memory", "sqlite"):
+            run(backend, workers, args.seconds)
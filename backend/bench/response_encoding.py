@@ -0,0 +1,156 @@
+"""Bytes on the wire and serialization CPU for a user with 100 saved roadmaps.
+
+    cd backend && python -m bench.response_encoding --roadmaps 100
+
+Before: FastAPI's default path (jsonable_encoder + json.dumps), no compression,
+documents stored as plain JSON. After: orjson, gzip (and br if the `brotli`
+package is installed) above RESPONSE_COMPRESSION_MIN_BYTES, and
+STORAGE_ENCODING=compact. Wire bytes come from real requests through the app;
+CPU is process time per call of the serialization alone. The text of each
+saved document is reshuffled from the sample essay's words, so rows don't
+repeat each other; that is a bit less compressible than real prose.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+os.environ["DEV_MODE"] = "true"
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import encoding  # noqa: E402
+import main  # noqa: E402
+from bench.fakes import FakeSupabase  # noqa: E402
+from bench.load_generate import AUTH  # noqa: E402
+from bench.stub_llm import full_size_feedback, full_size_roadmap  # noqa: E402
+from bench.essay_analysis import sample_essay  # noqa: E402
+from bench.loadtest import PROFILE  # noqa: E402
+
+
+def reworded(value, words, rng):
+    """`value` with every string replaced by random words of about the same length"""
+    if isinstance(value, dict):
+        return {key: reworded(item, words, rng) for key, item in value.items()}
+    if isinstance(value, list):
+        return [reworded(item, words, rng) for item in value]
+    if isinstance(value, str):
+        text = []
+        while sum(len(word) + 1 for word in text) < len(value):
+            text.append(rng.choice(words))
+        return " ".join(text)
+    return value
+
+
+def seed(db, count):
+    """`count` roadmaps and essays for the dev user, each with its own text"""
+    essay = sample_essay()
+    words = essay.split()
+    rng = random.Random(0)
+    for i in range(count):
+        roadmap = reworded(full_size_roadmap(), words, rng)
+        feedback = reworded(full_size_feedback(), words, rng)
+        feedback["letter_grade"] = 60 + i % 40
+        feedback["summary_badge"] = "Polished but Boring"
+        db.tables.setdefault("roadmaps", []).append({
+            "id": f"roadmap-{i:04d}", "user_id": "dev-user-123", "created_at": f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}",
+            "gpa": PROFILE["gpa"], "grade": PROFILE["grade"], "interests": PROFILE["interests"],
+            "activities": PROFILE["activities"], "demographics": None, "testing": PROFILE["testing"],
+            "college_goals": PROFILE["collegeGoals"], "location": PROFILE["location"], "classes": PROFILE["classes"],
+            "roadmap_content": encoding.encode_document(roadmap), "prompt_version": "bench", "revision": 0,
+        })
+        db.tables.setdefault("essays", []).append({
+            "id": f"essay-{i:04d}", "user_id": "dev-user-123", "created_at": f"2026-01-01T00:{i // 60:02d}:{i % 60:02d}",
+            "grade": "12", "prompt": "Tell us about a skill you taught yourself.", "essay_text": essay,
+            "program": "Common App", "feedback": encoding.encode_document(feedback),
+            "letter_grade": feedback["letter_grade"], "prompt_version": "bench",
+            "parent_id": None, "base_id": None, "delta": None,
+        })
+
+
+def cpu_per_call(fn, repeat):
+    fn()
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat
+
+
+def wire_bytes(client, path, accept):
+    response = client.get(path, headers={**AUTH, "Accept-Encoding": accept})
+    assert response.status_code == 200, response.text
+    return int(response.headers["content-length"]), response.headers.get("content-encoding") or "identity"
+
+
+def old_render(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def new_render(content, accept):
+    body = encoding.ORJSONResponse(content).body
+    chosen = encoding.accepted_encoding(accept)
+    if chosen and len(body) >= encoding.RESPONSE_COMPRESSION_MIN_BYTES:
+        body = encoding.compress(body, chosen)
+    return body
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roadmaps", type=int, default=100, help="saved roadmaps (and essays) for the user")
+    parser.add_argument("--repeat", type=int, default=50, help="calls per CPU measurement")
+    args = parser.parse_args()
+
+    accepts = ["gzip"] + (["br"] if encoding.brotli is not None else [])
+    if encoding.brotli is None:
+        print("(brotli isn't installed, so only gzip is measured)")
+
+    endpoints = ["/roadmaps?limit=100", "/roadmaps?summary=true&limit=100", "/roadmaps/roadmap-0000",
+                 "/essays?limit=100", "/essays?summary=true&limit=100"]
+    main.rate_limiter.enabled = False
+    results = {}
+    for storage in ("json", "compact"):
+        encoding.STORAGE_ENCODING = storage
+        main.supabase = db = FakeSupabase()
+        seed(db, args.roadmaps)
+        stored = [len(json.dumps(row["roadmap_content"])) for row in db.tables["roadmaps"]]
+        with TestClient(main.app) as client:
+            contents = {path: client.get(path, headers=AUTH).json() for path in endpoints}
+            sizes = {path: {accept: wire_bytes(client, path, accept) for accept in ["identity"] + accepts}
+                     for path in endpoints}
+        # roughly what PostgREST sends back for GET /roadmaps?limit=100, and what parsing + decoding it costs
+        body = json.dumps(db.tables["roadmaps"])
+        read = cpu_per_call(lambda: encoding.decode_rows("roadmaps", json.loads(body)), args.repeat)
+        results[storage] = (contents, sizes, sum(stored) / len(stored), len(body), read)
+
+    contents, sizes = results["json"][0], results["json"][1]
+    print(f"\n{args.roadmaps} saved roadmaps + essays, bytes on the wire per request")
+    print(f"  {'endpoint':<34}{'before':>12}" + "".join(f"{accept:>18}" for accept in accepts))
+    for path in endpoints:
+        before, _ = sizes[path]["identity"]
+        cells = []
+        for accept in accepts:
+            size, used = sizes[path][accept]
+            cells.append(f"{size / 1024:8.1f}KB {size / before:5.0%}" if used != "identity" else f"{'(not compressed)':>18}")
+        print(f"  {path:<34}{before / 1024:10.1f}KB" + "".join(f"{cell:>18}" for cell in cells))
+
+    print("\nserialization CPU per request (before: jsonable_encoder + json.dumps)")
+    print(f"  {'endpoint':<34}{'before':>10}{'orjson':>10}" + "".join(f"{'orjson+' + a:>14}" for a in accepts))
+    for path in endpoints:
+        content = contents[path]
+        old = cpu_per_call(lambda: old_render(content), args.repeat)
+        cells = [cpu_per_call(lambda: new_render(content, "identity"), args.repeat)]
+        cells += [cpu_per_call(lambda: new_render(content, accept), args.repeat) for accept in accepts]
+        print(f"  {path:<34}{old * 1000:8.2f}ms" + f"{cells[0] * 1000:8.2f}ms"
+              + "".join(f"{cell * 1000:12.2f}ms" for cell in cells[1:]))
+
+    print("\nstorage (roadmap_content)")
+    for storage in ("json", "compact"):
+        _, _, per_row, body, read = results[storage]
+        print(f"  {storage:<8} {per_row / 1024:6.1f}KB per row  {body / 1024:7.1f}KB from Supabase for GET /roadmaps  "
+              f"parse+decode {read * 1000:6.2f}ms")
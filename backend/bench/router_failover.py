@@ -0,0 +1,86 @@
+"""Tail latency and hard failures, one model vs the router's fallback + hedging.
+
+Injects slow responses and errors into the primary model on the stub LLM and
+sends the same workload straight to that model (what the endpoints did before
+the router) and through a two-model router:
+
+    cd backend && python -m bench.router_failover --requests 200 --hedge-min-after 0.4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+STUB_PORT = 8935
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "64")
+
+from bench.load_generate import percentile  # noqa: E402
+from bench.stub_llm import start_in_thread  # noqa: E402
+from llm import create_completion  # noqa: E402
+from router import ModelRouter  # noqa: E402
+
+PRIMARY = "llama-3.3-70b-versatile"
+SECONDARY = "llama-3.1-8b-instant"
+SCENARIOS = {
+    "healthy": {},
+    "slow tail (4% take 4s)": {PRIMARY: {"slow_rate": 0.04, "slow_latency": 4.0}},
+    "flaky (30% errors)": {PRIMARY: {"error_rate": 0.3}},
+    "outage (100% errors)": {PRIMARY: {"error_rate": 1.0}},
+}
+MESSAGES = [{"role": "user", "content": "Return a roadmap as JSON."}]
+
+
+class Direct:
+    """No router: one model, errors go straight back to the caller"""
+    hedged = fallbacks = 0
+
+    async def complete(self, **kwargs):
+        return await create_completion(model=PRIMARY, **kwargs)
+
+
+async def drive(router, requests, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await router.complete(messages=MESSAGES, max_tokens=100)
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one() for _ in range(requests)])
+    return latencies, failures
+
+
+async def run(args, stub):
+    for name, faults in SCENARIOS.items():
+        print(name)
+        for label, router in (("single model", Direct()),
+                              ("router", ModelRouter("bench", [PRIMARY, SECONDARY], args.hedge_min_after,
+                                                           args.hedge_min_samples))):
+            stub.state.faults = faults
+            stub.state.calls = 0
+            latencies, failures = await drive(router, args.requests, args.concurrency)
+            ms = [s * 1000 for s in latencies] or [0]
+            print(f"  {label:<13} p50={percentile(ms, 50):6.0f}ms p95={percentile(ms, 95):6.0f}ms "
+                  f"p99={percentile(ms, 99):6.0f}ms failed={failures:<4} upstream calls={stub.state.calls:<4} "
+                  f"hedged={router.hedged} fallbacks={router.fallbacks}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="normal stub latency in seconds")
+    parser.add_argument("--hedge-min-after", type=float, default=0.4, help="never hedge sooner than this")
+    parser.add_argument("--hedge-min-samples", type=int, default=20, help="primary calls before hedging starts")
+    args = parser.parse_args()
+    server = start_in_thread(STUB_PORT, latency=args.latency)
+    asyncio.run(run(args, server.config.app))
@@ -0,0 +1,82 @@
+"""Tokens and latency: regenerating a whole roadmap vs rewriting one section.
+
+    cd backend && python -m bench.section_regen --tokens-per-second 250
+
+The stub LLM answers with a full-size roadmap (six timeline periods, about the
+length a real one comes back at) and takes `--latency` plus completion tokens /
+`--tokens-per-second` per call, so output length drives latency the way it does
+against Groq. Token counts are what the stub reports in `usage` (~4 chars each).
+"""
+import argparse
+import os
+import statistics
+import time
+
+STUB_PORT = 8948
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+os.environ["DEV_MODE"] = "true"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from bench import stub_llm  # noqa: E402
+from bench.fakes import FakeSupabase  # noqa: E402
+from bench.load_generate import AUTH, PROFILE  # noqa: E402
+from metrics import LLM_TOKENS  # noqa: E402
+from router import roadmap_router  # noqa: E402
+
+SECTIONS = ["student_summary", "college_list_suggestions", "academic_plan", "extracurriculars",
+            "timeline", "timeline.3"]
+
+
+def tokens(kind):
+    return sum(LLM_TOKENS.labels(model, kind)._value.get() for model in roadmap_router.models)
+
+
+def measure(call, n):
+    samples, prompt, completion = [], tokens("prompt"), tokens("completion")
+    for _ in range(n):
+        start = time.perf_counter()
+        response = call()
+        assert response.status_code == 200, response.text
+        samples.append(time.perf_counter() - start)
+    return (statistics.median(samples), (tokens("prompt") - prompt) / n, (tokens("completion") - completion) / n)
+
+
+def report(label, result, baseline=None):
+    seconds, prompt, completion = result
+    line = f"{label:<36} {seconds * 1000:7.0f}ms  prompt {prompt:6.0f}  completion {completion:6.0f}"
+    if baseline:
+        line += f"   ({baseline[0] / seconds:4.1f}x faster, {baseline[2] / completion:4.1f}x fewer output tokens)"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed per-call latency (queue + prompt)")
+    parser.add_argument("--tokens-per-second", type=float, default=250)
+    parser.add_argument("-n", type=int, default=3)
+    args = parser.parse_args()
+
+    stub_llm.SAMPLE_ROADMAP.clear()
+    stub_llm.SAMPLE_ROADMAP.update(stub_llm.full_size_roadmap())
+    server = stub_llm.start_in_thread(STUB_PORT, latency=args.latency)
+    server.config.app.state.tokens_per_second = args.tokens_per_second
+    main.supabase = FakeSupabase()
+    main.rate_limiter.enabled = False
+
+    with TestClient(main.app) as client:
+        body = dict(PROFILE, cache="bypass")
+        full = measure(lambda: client.post("/generate", json=body, headers=AUTH), args.n)
+        roadmap_id = client.post("/generate", json=body, headers=AUTH).json()["id"]
+        while main.writer.pending_row("roadmaps", roadmap_id, "dev-user-123"):
+            time.sleep(0.05)
+
+        report("full /generate", full)
+        for section in SECTIONS:
+            result = measure(lambda: client.post(
+                f"/roadmaps/{roadmap_id}/regenerate", json={"section": section}, headers=AUTH), args.n)
+            report(f"regenerate {section}", result, full)
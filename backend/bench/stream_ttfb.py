@@ -0,0 +1,62 @@
+"""Time to first useful byte: /generate vs /generate/stream.
+
+    cd backend && python -m bench.stream_ttfb --latency 8
+"""
+import argparse
+import asyncio
+import os
+import time
+
+STUB_PORT = 8933
+APP_PORT = 8934
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+os.environ["DEV_MODE"] = "true"
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+import main  # noqa: E402
+from bench.fakes import FakeSupabase  # noqa: E402
+from bench.load_generate import AUTH, PROFILE  # noqa: E402
+from bench.stub_llm import start_in_thread  # noqa: E402
+
+
+async def run(args):
+    main.supabase = FakeSupabase()
+    main.rate_limiter.enabled = False
+    # httpx's ASGITransport buffers whole responses, so serve the app for real
+    app_server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    serving = asyncio.create_task(app_server.serve())
+    while not app_server.started:
+        await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=None) as http:
+        start = time.perf_counter()
+        response = await http.post("/generate", json=dict(PROFILE, cache="bypass"), headers=AUTH)
+        assert response.status_code == 200, response.text
+        print(f"/generate              first byte {time.perf_counter() - start:6.2f}s  (whole roadmap at once)")
+
+        start = time.perf_counter()
+        first_section = None
+        async with http.stream("POST", "/generate/stream", json=dict(PROFILE, cache="bypass"), headers=AUTH) as response:
+            assert response.status_code == 200
+            async for line in response.aiter_lines():
+                if line.startswith("event:") and first_section is None:
+                    first_section = time.perf_counter() - start
+                    print(f"/generate/stream       first event {first_section:6.2f}s  ({line[7:]})")
+                if line == "event: done":
+                    print(f"/generate/stream       done        {time.perf_counter() - start:6.2f}s")
+
+    app_server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=8.0, help="stub generation time in seconds")
+    args = parser.parse_args()
+    start_in_thread(STUB_PORT, latency=args.latency)
+    asyncio.run(run(args))
@@ -0,0 +1,260 @@
+"""Tiny stand-in for the Groq chat completions API, for load tests.
+
+Run it on its own:  python -m bench.stub_llm --port 8900 --latency 2 --tokens-per-second 300
+then point the backend at it with GROQ_BASE_URL=http://127.0.0.1:8900
+
+Set `app.state.tokens_per_second` to make latency grow with the length of the
+answer (each call then takes latency + completion tokens / rate), which is what
+matters when comparing a full roadmap against a single rewritten section.
+
+Faults can be injected per model through `app.state.faults`, e.g.
+    {"llama-3.3-70b-versatile": {"error_rate": 0.2, "slow_rate": 0.1, "slow_latency": 8}}
+`truncate_rate` cuts that share of answers off partway through, like a
+completion that ran out of max_tokens.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SAMPLE_ROADMAP = {
+    "student_summary": "A curious builder who loves robotics and teaching younger students.",
+    "college_list_suggestions": {
+        "reach": ["MIT - Electrical Engineering and Computer Science", "Stanford University - Computer Science"],
+        "target": ["UC San Diego - Computer Engineering", "University of Washington - Informatics"],
+        "safety": ["San Jose State University - Computer Science", "Cal State East Bay - Computer Science"],
+    },
+    "academic_plan": {
+        "course_suggestions": ["AP Calculus BC", "AP Computer Science A"],
+        "testing_strategy": "Take the October PSAT, then the March SAT aiming for 1400+.",
+    },
+    "extracurriculars": {
+        "current_optimization": "Take on build lead for the robotics team by November.",
+        "new_opportunities": ["Join Code Nation - mentors you in web development"],
+    },
+    "timeline": [
+        {"period": "Fall 2025 - 11th Grade", "focus": "Testing and leadership",
+         "tasks": ["Register for October PSAT by September 15th"]},
+        {"period": "Spring 2026 - 11th Grade", "focus": "Summer programs",
+         "tasks": ["Apply to COSMOS by February 7th"]},
+    ],
+}
+
+SAMPLE_FEEDBACK = {
+    "pre_grading_analysis": {
+        "additional_cliches": [],
+        "is_generic_topic": False,
+        "predicted_impact": "The reader keeps going.",
+    },
+    "scoring_breakdown": {
+        "voice_and_authenticity": {"score": 16, "max": 20, "reason": "Mostly natural."},
+        "insight_and_growth": {"score": 15, "max": 20, "reason": "Standard lesson."},
+        "storytelling_and_craft": {"score": 16, "max": 20, "reason": "Some scenes."},
+        "originality_and_risk": {"score": 14, "max": 20, "reason": "Familiar angle."},
+        "prompt_responsiveness": {"score": 17, "max": 20, "reason": "On prompt."},
+    },
+    "letter_grade": 78,
+    "summary_badge": "Polished but Boring",
+    "key_strengths": ["Clear structure"],
+    "areas_for_improvement": ["Open with a scene"],
+    "final_summary": "Solid but safe.",
+    "detailed_action_plan": "Rewrite the opening paragraph around one moment.",
+}
+
+
+def refill_keys(messages):
+    """The keys a refill request (see schemas.refill_messages) asks for, or None"""
+    last = messages[-1].get("content", "") if messages else ""
+    match = re.match(r"That JSON is missing or has malformed values for: (.+?)\. Reply", last)
+    return match.group(1).split(", ") if match else None
+
+
+def sample_section(prompt):
+    """The sample roadmap's value at the path a section rewrite asks for"""
+    path = re.search(r"Section to rewrite: (\S+)", prompt).group(1)
+    value = SAMPLE_ROADMAP
+    for part in path.split("."):
+        value = value[int(part)] if isinstance(value, list) else value[part]
+    return {"section": value}
+
+
+def sample_revision():
+    """A re-grade of a revised draft (prompts.ESSAY_REVISION_SCHEMA): scores and notes, advice left as it was"""
+    payload = {key: SAMPLE_FEEDBACK[key]
+               for key in ("pre_grading_analysis", "scoring_breakdown", "letter_grade", "summary_badge")}
+    payload["revision_notes"] = "The new closing scene shows the change instead of stating it."
+    return payload
+
+
+def full_size_feedback():
+    """Essay feedback about as long as a real answer (~900 tokens)"""
+    reason = ("The opening scene in the garage is specific and sounds like you, but the middle paragraphs "
+              "summarize instead of showing a moment, so the reader never sees the change happen.")
+    advice = "Cut the second paragraph's summary and replace it with one scene: the first bike you gave away."
+    return {
+        "pre_grading_analysis": {"additional_cliches": [], "is_generic_topic": False,
+                                 "predicted_impact": "The reader smiles at the garage, then skims the middle."},
+        "scoring_breakdown": {
+            name: {"score": 15, "max": 20, "reason": reason}
+            for name in ("voice_and_authenticity", "insight_and_growth", "storytelling_and_craft",
+                         "originality_and_risk", "prompt_responsiveness")
+        },
+        "letter_grade": 75,
+        "summary_badge": "Polished but Boring",
+        "key_strengths": [reason] * 3,
+        "areas_for_improvement": [advice] * 4,
+        "final_summary": " ".join([reason] * 3),
+        "detailed_action_plan": " ".join([advice] * 6),
+    }
+
+
+def full_size_roadmap():
+    """A roadmap about as long as a real answer (~2k tokens), for benches where output length matters"""
+    task = ("Register for the {n} SAT by the posted deadline on CollegeBoard.org, then take two full-length "
+            "Khan Academy practice tests in the three weeks before and review every missed question")
+    school = "University of Example {n} - Computer Science and Engineering (strong co-op program, in region)"
+    return {
+        "student_summary": " ".join(["You are a curious builder who turns interests into projects people use."] * 6),
+        "college_list_suggestions": {
+            tier: [school.format(n=f"{tier} {i}") for i in range(3)] for tier in ("reach", "target", "safety")
+        },
+        "academic_plan": {
+            "course_suggestions": [f"AP Course Number {i} (fits your engineering goals)" for i in range(6)],
+            "testing_strategy": " ".join(["Take the October PSAT, then the March SAT aiming for 1450+."] * 5),
+        },
+        "extracurriculars": {
+            "current_optimization": " ".join(["Run for robotics build lead in November and track outcomes."] * 4),
+            "new_opportunities": [f"Join Opportunity {i} - builds the skills your major needs" for i in range(4)],
+        },
+        "timeline": [
+            {"period": f"Season {p} - Grade", "focus": "Testing, leadership and summer program applications",
+             "tasks": [task.format(n=f"{p}/{t}") for t in range(5)]}
+            for p in range(6)
+        ],
+    }
+
+
+async def stream_chunks(body, content, latency, chunk_size=16):
+    """OpenAI-style SSE chunks, spread evenly over `latency` seconds"""
+    pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    for index, piece in enumerate(pieces):
+        await asyncio.sleep(latency / len(pieces))
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "delta": {"role": "assistant", "content": piece} if index == 0 else {"content": piece},
+                "finish_reason": "stop" if index == len(pieces) - 1 else None,
+            }],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def create_stub_app(latency=1.0, error_rate=0.0, tokens_per_second=None):
+    stub = FastAPI()
+    stub.state.latency = latency
+    stub.state.tokens_per_second = tokens_per_second
+    stub.state.refill_tokens = 0
+    stub.state.calls = 0
+    stub.state.calls_by_model = {}
+    stub.state.faults = {"*": {"error_rate": error_rate}}
+
+    def fault_for(model):
+        return {**stub.state.faults.get("*", {}), **stub.state.faults.get(model, {})}
+
+    @stub.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stub.state.calls += 1
+        model = body.get("model")
+        stub.state.calls_by_model[model] = stub.state.calls_by_model.get(model, 0) + 1
+
+        fault = fault_for(model)
+        latency = fault.get("latency", stub.state.latency)
+        if random.random() < fault.get("slow_rate", 0.0):
+            latency = fault.get("slow_latency", latency * 10)
+        if random.random() < fault.get("error_rate", 0.0):
+            await asyncio.sleep(latency / 10)
+            return JSONResponse(status_code=503, content={"error": {"message": "stub: over capacity"}})
+
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        keys = None
+        if "Section to rewrite:" in prompt:
+            payload = sample_section(prompt)
+        else:
+            if "Your grading of the previous draft" in prompt:
+                payload = sample_revision()
+            else:
+                payload = SAMPLE_FEEDBACK if "scoring_breakdown" in prompt else SAMPLE_ROADMAP
+            keys = refill_keys(body.get("messages"))
+            if keys:
+                payload = {key: payload[key] for key in keys if key in payload}
+        content = json.dumps(payload)
+        if keys:
+            stub.state.refill_tokens += len(content) // 4
+        if random.random() < fault.get("truncate_rate", 0.0):
+            content = content[:random.randint(len(content) // 2, len(content) - 1)]
+        if stub.state.tokens_per_second:
+            latency += len(content) / 4 / stub.state.tokens_per_second
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(body, content, latency), media_type="text/event-stream")
+
+        await asyncio.sleep(latency)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        }
+
+    return stub
+
+
+def start_in_thread(port, latency=1.0, error_rate=0.0):
+    """Serve the stub from a background thread (its own event loop); returns the uvicorn server"""
+    config = uvicorn.Config(create_stub_app(latency, error_rate), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with a 503")
+    parser.add_argument("--tokens-per-second", type=float, default=None,
+                        help="completion speed; each call then takes latency + completion tokens / rate")
+    parser.add_argument("--faults", default=None,
+                        help='per-model faults as JSON, e.g. \'{"*": {"slow_rate": 0.1, "truncate_rate": 0.05}}\'')
+    args = parser.parse_args()
+    stub = create_stub_app(args.latency, args.error_rate, args.tokens_per_second)
+    if args.faults:
+        stub.state.faults = {**stub.state.faults, **json.loads(args.faults)}
+    uvicorn.run(stub, host="127.0.0.1", port=args.port, log_level="warning")
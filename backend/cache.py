@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from analysis import paragraphs
+
+# Model responses keyed on what actually went into the completion, so a
+# resubmitted essay or roadmap profile is answered without calling Groq again.
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # memory | sqlite | off
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.db")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+
+def _normalize(value):
+    # Whitespace-only edits (trailing newline after a refresh, double spaces)
+    # shouldn't count as a new submission. Paragraph breaks do count: the essay
+    # analysis and revision diff work per paragraph, so they're kept the way
+    # analysis.paragraphs splits them.
+    if isinstance(value, str):
+        return "\n\n".join(" ".join(part.split()) for part in paragraphs(value))
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def cache_key(kind, payload, model, temperature, template_version):
+    """Stable hash of a normalized request payload plus everything that shapes the completion"""
+    material = json.dumps({
+        "kind": kind,
+        "payload": _normalize(payload),
+        "model": model,
+        "temperature": temperature,
+        "template": template_version,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU with a TTL"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.entries[key] = (value, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteCache:
+    """File-backed store (same idea as feedback.db), shared by every worker on the box"""
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, stored_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE response_cache SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self.conn.execute("DELETE FROM response_cache WHERE stored_at < ?", (now - self.ttl,))
+            # least recently used entries go first once we're over the cap
+            self.conn.execute("""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Wraps a backend and counts hits/misses for monitoring"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if self.backend is None:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def contains(self, key):
+        """Lookup that doesn't count toward hit/miss stats"""
+        return self.backend is not None and self.backend.get(key) is not None
+
+    def set(self, key, value):
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": RESPONSE_CACHE_BACKEND,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def make_backend(kind=RESPONSE_CACHE_BACKEND):
+    if kind == "off":
+        return None
+    if kind == "sqlite":
+        return SQLiteCache()
+    return MemoryCache()
+
+
+response_cache = ResponseCache(make_backend())
+
+
+def wants_bypass(data):
+    """Per-request opt out: {"cache": "bypass"} skips the lookup (the fresh result is still stored)"""
+    return str(data.get("cache", "")).lower() == "bypass"
@@ -0,0 +1,391 @@
+import array
+import bisect
+import csv
+import hashlib
+import os
+import re
+import time
+from functools import lru_cache
+
+from metrics import record_output
+
+# A small bundled college dataset (data/colleges.csv) that grounds the
+# roadmap's college_list_suggestions. Before generating, we pick real schools
+# that fit the student's GPA, location and interests and put that shortlist in
+# the prompt, so the model chooses from it instead of making a list up. After,
+# the returned list is checked against the same data: schools placed in a tier
+# that's too safe for their admit rate move up, duplicates go, and a tier left
+# short is topped up from the shortlist.
+#
+# Rows are kept as columns in admit-rate order, with a bitset (a Python int,
+# bit i = row i) per state and per major, so any filter is a couple of ANDs
+# and a lookup stays in the microseconds.
+
+COLLEGES_PATH = os.getenv("COLLEGES_PATH", os.path.join(os.path.dirname(__file__), "data", "colleges.csv"))
+SHORTLIST_PER_TIER = int(os.getenv("COLLEGES_SHORTLIST_PER_TIER", "5"))
+# a tier with fewer schools than this after the check is topped up from the shortlist
+TIER_MIN = 2
+TIERS = ("reach", "target", "safety")
+
+# (lowest GPA, long shots below this admit rate %, reach below this, safety from this); target
+# is in between. Long shots still count as reaches but aren't put on the shortlist. Safety
+# never starts below 50%, as the roadmap guidelines ask.
+TIER_BANDS = [(3.8, 0, 20, 50), (3.4, 8, 35, 65), (0.0, 15, 50, 80)]
+DEFAULT_BAND = TIER_BANDS[1]
+
+# tag: (how to name it after a school, words in interests / goals that point at it)
+MAJORS = {
+    "cs": ("Computer Science", ["computer science", "computers?", "coding", "programming", "software", "cs",
+                                "ai", "artificial intelligence", "machine learning", "data science",
+                                "cyber ?security", "web development", "app development"]),
+    "engineering": ("Engineering", ["engineering", "engineers?", "robotics", "mechanical", "electrical",
+                                    "civil", "biomedical"]),
+    "aerospace": ("Aerospace Engineering", ["aerospace", "aeronautics?", "aeronautical", "aviation", "pilot",
+                                            "space", "rockets?", "astronaut"]),
+    "business": ("Business", ["business", "entrepreneurship", "entrepreneur", "finance", "marketing",
+                              "accounting", "management", "startups?"]),
+    "economics": ("Economics", ["economics", "econ"]),
+    "biology": ("Biology", ["biology", "bio", "genetics", "neuroscience", "biochemistry", "life sciences",
+                            "zoology", "ecology"]),
+    "premed": ("Pre-Med", ["pre-?med", "medicine", "doctor", "physician", "medical", "dentist", "dental",
+                           "pharmacy", "surgeon"]),
+    "nursing": ("Nursing", ["nursing", "nurse"]),
+    "public_health": ("Public Health", ["public health", "epidemiology", "global health"]),
+    "chemistry": ("Chemistry", ["chemistry", "chem"]),
+    "physics": ("Physics", ["physics", "astronomy", "astrophysics"]),
+    "math": ("Mathematics", ["math", "maths", "mathematics", "statistics"]),
+    "psychology": ("Psychology", ["psychology", "psych", "cognitive science"]),
+    "political_science": ("Political Science", ["political science", "politics", "government", "law",
+                                                "pre-?law", "public policy", "policy"]),
+    "international_relations": ("International Relations", ["international relations", "foreign affairs",
+                                                            "diplomacy", "global studies"]),
+    "english": ("English", ["english", "literature", "creative writing", "writing", "poetry"]),
+    "journalism": ("Journalism", ["journalism", "journalist", "reporter", "news"]),
+    "communications": ("Communications", ["communications?", "media", "public relations", "advertising"]),
+    "history": ("History", ["history"]),
+    "philosophy": ("Philosophy", ["philosophy", "ethics"]),
+    "art": ("Studio Art", ["art", "arts", "painting", "drawing", "fine arts", "studio art", "sculpture",
+                           "illustration", "photography"]),
+    "design": ("Design", ["design", "graphic design", "ux", "industrial design", "fashion"]),
+    "architecture": ("Architecture", ["architecture", "architect"]),
+    "animation": ("Animation", ["animation", "game design", "video games?", "game development", "vfx"]),
+    "film": ("Film", ["film", "filmmaking", "cinema", "screenwriting", "movies"]),
+    "music": ("Music", ["music", "musician", "composition", "singing", "orchestra", "piano"]),
+    "theater": ("Theater", ["theater", "theatre", "acting", "drama", "musical theater"]),
+    "education": ("Education", ["education", "teaching", "teacher"]),
+    "environmental": ("Environmental Science", ["environmental", "environment", "sustainability", "climate",
+                                                "conservation", "forestry"]),
+    "agriculture": ("Agriculture", ["agriculture", "farming", "animal science", "veterinary", "vet",
+                                    "horticulture", "food science"]),
+    "marine_biology": ("Marine Biology", ["marine", "ocean", "oceanography", "marine biology"]),
+    "kinesiology": ("Kinesiology", ["kinesiology", "sports medicine", "physical therapy", "exercise science",
+                                    "athletic training"]),
+}
+
+# What @university / @liberal_arts stand for in the majors column
+MAJOR_GROUPS = {
+    "university": ["cs", "engineering", "business", "economics", "biology", "premed", "chemistry", "physics",
+                   "math", "psychology", "political_science", "english", "history", "philosophy",
+                   "communications", "education", "environmental"],
+    "liberal_arts": ["cs", "economics", "biology", "premed", "chemistry", "physics", "math", "psychology",
+                     "political_science", "english", "history", "philosophy", "art", "music", "theater",
+                     "environmental"],
+}
+
+STATE_NAMES = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA", "colorado": "CO",
+    "connecticut": "CT", "delaware": "DE", "florida": "FL", "georgia": "GA", "hawaii": "HI", "idaho": "ID",
+    "illinois": "IL", "indiana": "IN", "iowa": "IA", "kansas": "KS", "kentucky": "KY", "louisiana": "LA",
+    "maine": "ME", "maryland": "MD", "massachusetts": "MA", "michigan": "MI", "minnesota": "MN",
+    "mississippi": "MS", "missouri": "MO", "montana": "MT", "nebraska": "NE", "nevada": "NV",
+    "new hampshire": "NH", "new jersey": "NJ", "new mexico": "NM", "new york": "NY", "north carolina": "NC",
+    "north dakota": "ND", "ohio": "OH", "oklahoma": "OK", "oregon": "OR", "pennsylvania": "PA",
+    "rhode island": "RI", "south carolina": "SC", "south dakota": "SD", "tennessee": "TN", "texas": "TX",
+    "utah": "UT", "vermont": "VT", "virginia": "VA", "washington": "WA", "west virginia": "WV",
+    "wisconsin": "WI", "wyoming": "WY",
+}
+# Two-letter codes that are also everyday words only count spelled out
+AMBIGUOUS_CODES = {"IN", "OR", "ME", "OK", "HI"}
+
+# Regions and nicknames people type into the location field. Tried in order at
+# each position, so cities and state names come before the regions they start
+# with ("South Carolina" isn't "the South").
+REGIONS = [
+    (r"washington,? d\.?c|d\.c|dc", "DC"),
+    (r"(?:southern|northern) california|bay area|socal|norcal|los angeles|san francisco|san diego", "CA"),
+    (r"new york city|nyc", "NY"),
+    (r"boston", "MA"),
+    (r"chicago", "IL"),
+    (r"seattle", "WA"),
+    (r"atlanta", "GA"),
+] + [(name, code) for name, code in sorted(STATE_NAMES.items(), key=lambda item: -len(item[0]))] + [
+    (r"pacific northwest|pnw|northwest", "WA OR ID"),
+    (r"west coast", "CA OR WA"),
+    (r"east coast", "ME NH MA RI CT NY NJ DE MD DC VA NC SC GA FL"),
+    (r"new england", "CT ME MA NH RI VT"),
+    (r"mid-?atlantic", "NY NJ PA DE MD DC"),
+    (r"north ?east(?:ern)?", "CT ME MA NH RI VT NJ NY PA"),
+    (r"south ?east(?:ern)?", "FL GA NC SC VA TN AL MS KY WV LA AR"),
+    (r"south ?west(?:ern)?", "AZ NM TX OK NV"),
+    (r"mid ?west(?:ern)?", "IL IN MI OH WI IA KS MN MO NE ND SD"),
+    (r"mountain west|rockies|rocky mountains?", "CO UT WY MT ID NV NM AZ"),
+    (r"south(?:ern)?", "DE DC FL GA MD NC SC VA WV AL KY MS TN AR LA OK TX"),
+    (r"west(?:ern)?", "AZ CO ID MT NV NM UT WY AK CA HI OR WA"),
+]
+# one group per entry, so match.lastindex says which one matched
+_REGION = re.compile("|".join(rf"\b({pattern})\b" for pattern, _ in REGIONS))
+_REGION_STATES = [set(states.split()) for _, states in REGIONS]
+CODES = set(STATE_NAMES.values()) | {"DC"}
+_CODE = re.compile(r"\b[A-Z]{2}\b")
+_MAJOR_PATTERNS = {
+    tag: re.compile(r"\b(?:" + "|".join(words) + r")\b") for tag, (_, words) in MAJORS.items()
+}
+# Where the school's name ends in an entry like "MIT - Computer Science" or "UCLA (Film)"
+_NAME_END = re.compile(r"\s[-–—|/]\s|\s*[(:;]|\s[-–—]")
+
+
+def normalize(name):
+    words = re.findall(r"[a-z0-9]+", name.lower().replace("&", " and "))
+    if words and words[0] == "the":
+        words = words[1:]
+    return " ".join(words)
+
+
+def expand_majors(spec):
+    tags = set()
+    for tag in filter(None, (part.strip() for part in spec.split(";"))):
+        if tag.startswith("@"):
+            tags.update(MAJOR_GROUPS[tag[1:]])
+        elif tag.startswith("-"):
+            tags.discard(tag[1:])
+        else:
+            tags.add(tag)
+    unknown = tags - set(MAJORS)
+    if unknown:
+        raise ValueError(f"unknown majors in colleges data: {', '.join(sorted(unknown))}")
+    return tags
+
+
+class CollegeIndex:
+    """The dataset as columns in admit-rate order (most selective first), with
+    a bitset per state and per major and a name/alias lookup"""
+
+    def __init__(self, rows, version=""):
+        rows = sorted(rows, key=lambda row: row["acceptance"])
+        self.version = version
+        self.names = [row["name"] for row in rows]
+        self.states = [row["state"] for row in rows]
+        self.acceptance = array.array("f", (row["acceptance"] for row in rows))
+        self.by_state, self.by_major, self.by_name = {}, {}, {}
+        for i, row in enumerate(rows):
+            bit = 1 << i
+            self.by_state[row["state"]] = self.by_state.get(row["state"], 0) | bit
+            for tag in row["majors"]:
+                self.by_major[tag] = self.by_major.get(tag, 0) | bit
+            for name in [row["name"]] + row["aliases"]:
+                self.by_name.setdefault(normalize(name), i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def band(self, low, high):
+        """Rows with low <= admit rate < high"""
+        start = bisect.bisect_left(self.acceptance, low)
+        end = bisect.bisect_left(self.acceptance, high)
+        return ((1 << end) - 1) ^ ((1 << start) - 1)
+
+    def in_states(self, states):
+        mask = 0
+        for state in states:
+            mask |= self.by_state.get(state, 0)
+        return mask
+
+    def with_majors(self, tags):
+        mask = 0
+        for tag in tags:
+            mask |= self.by_major.get(tag, 0)
+        return mask
+
+    def rows(self, mask):
+        """Row numbers in a bitset, most selective first"""
+        # reading the binary string is ~4x faster than peeling off bits one at a time
+        return [row for row, bit in enumerate(bin(mask)[:1:-1]) if bit == "1"]
+
+    def resolve(self, entry):
+        """Row number of the school an entry like "UC Berkeley - Computer Science" names, or None"""
+        head = _NAME_END.split(str(entry), 1)[0]
+        for name in (head, head.split(",")[0]):
+            row = self.by_name.get(normalize(name))
+            if row is not None:
+                return row
+        return None
+
+    def describe(self, row):
+        return f"{self.names[row]} ({self.acceptance[row]:.0f}%, {self.states[row]})"
+
+
+def load(path=COLLEGES_PATH):
+    with open(path, "rb") as f:
+        raw = f.read()
+    lines = [line for line in raw.decode("utf-8").splitlines() if line and not line.startswith("#")]
+    rows = []
+    for record in csv.DictReader(lines):
+        rows.append({
+            "name": record["name"].strip(),
+            "aliases": [alias.strip() for alias in record["aliases"].split(";") if alias.strip()],
+            "state": record["state"].strip().upper(),
+            "acceptance": float(record["acceptance"]),
+            "majors": expand_majors(record["majors"]),
+        })
+    return CollegeIndex(rows, hashlib.sha1(raw).hexdigest()[:12])
+
+
+_index = None
+
+
+def get_index():
+    """The index, loaded from COLLEGES_PATH on first use (lifespan() warms it at startup)"""
+    global _index
+    if _index is None:
+        start = time.perf_counter()
+        _index = load()
+        print(f"🏫 Loaded {len(_index)} colleges in {(time.perf_counter() - start) * 1000:.1f}ms")
+    return _index
+
+
+@lru_cache(maxsize=1024)
+def states_for(location):
+    """State codes a free-text location preference points at, or None for anywhere"""
+    if not location:
+        return None
+    states = set()
+    for match in _REGION.finditer(location.lower()):
+        states |= _REGION_STATES[match.lastindex - 1]
+    states.update(code for code in _CODE.findall(location) if code in CODES - AMBIGUOUS_CODES)
+    return frozenset(states) or None
+
+
+@lru_cache(maxsize=1024)
+def majors_for(text):
+    """Major tags the student's interests and goals mention, in MAJORS order"""
+    text = text.lower()
+    return tuple(tag for tag, pattern in _MAJOR_PATTERNS.items() if pattern.search(text))
+
+
+def tier_bands(gpa, long_shots=True):
+    """{tier: (lowest admit rate %, highest)} for a student's GPA"""
+    try:
+        gpa = float(gpa)
+    except (TypeError, ValueError):
+        gpa = None
+    floor, reach, safety = DEFAULT_BAND[1:]
+    if gpa is not None:
+        floor, reach, safety = next(band[1:] for band in TIER_BANDS if gpa >= band[0])
+    return {"reach": (0 if long_shots else floor, reach), "target": (reach, safety), "safety": (safety, 101)}
+
+
+def profile_majors(profile):
+    return majors_for(f"{profile.get('interests') or ''} {profile.get('collegeGoals') or ''}")
+
+
+def spread(rows, count):
+    """`count` rows picked evenly across a list sorted by admit rate"""
+    if count <= 0:
+        return []
+    if len(rows) <= count:
+        return rows
+    if count == 1:
+        return [rows[len(rows) // 2]]
+    return [rows[round(k * (len(rows) - 1) / (count - 1))] for k in range(count)]
+
+
+def shortlist(profile, per_tier=SHORTLIST_PER_TIER):
+    """{tier: [row numbers]} of schools that fit the profile: in the student's region and
+    offering their majors if there are enough, then their majors anywhere, then the region"""
+    index = get_index()
+    states = states_for(str(profile.get("location") or ""))
+    majors = profile_majors(profile)
+    region = index.in_states(states) if states else 0
+    major = index.with_majors(majors)
+    picks = {}
+    for tier, (low, high) in tier_bands(profile.get("gpa"), long_shots=False).items():
+        band = index.band(low, high)
+        picked, taken = [], 0
+        for mask in (band & region & major, band & major, band & region, band):
+            for row in spread(index.rows(mask & ~taken), per_tier - len(picked)):
+                picked.append(row)
+                taken |= 1 << row
+            if len(picked) >= per_tier:
+                break
+        picks[tier] = sorted(picked)
+    return picks
+
+
+def candidates_note(profile):
+    """The shortlist as a block for the roadmap prompt"""
+    index = get_index()
+    picks = shortlist(profile)
+    if not any(picks.values()):
+        return ""
+    lines = [
+        "\n\nCandidate colleges (admit rate, state), already sorted into tiers for this student's GPA, "
+        "location and interests. Build college_list_suggestions from these and add the specific "
+        "major/program; only suggest a school that isn't listed if it fits clearly better, and say why:"
+    ]
+    for tier in TIERS:
+        lines.append(f"- {tier.title()}: " + "; ".join(index.describe(row) for row in picks[tier]))
+    return "\n".join(lines)
+
+
+def fix_college_list(college_list, profile):
+    """(checked copy of a college list, whether anything changed). Known schools in a
+    tier that's too safe for their admit rate move to the right one (moving a school
+    to a safer tier is left to the model, since competitive majors are harder than the
+    school's overall rate); repeats are dropped and short tiers topped up from the shortlist"""
+    index = get_index()
+    bands = tier_bands(profile.get("gpa"))
+    fixed = {tier: [] for tier in TIERS}
+    seen, changed = set(), False
+    for rank, tier in enumerate(TIERS):
+        entries = college_list.get(tier)
+        for entry in entries if isinstance(entries, list) else []:
+            row = index.resolve(entry)
+            key = row if row is not None else normalize(entry)
+            if key in seen:
+                changed = True
+                continue
+            seen.add(key)
+            destination = tier
+            if row is not None:
+                rate = index.acceptance[row]
+                destination = next(name for name in TIERS if rate < bands[name][1])
+                if TIERS.index(destination) > rank:
+                    destination = tier
+            changed = changed or destination != tier
+            fixed[destination].append(entry)
+
+    short = [tier for tier in TIERS if len(fixed[tier]) < TIER_MIN]
+    if short:
+        picks = shortlist(profile)
+        majors = profile_majors(profile)
+        offers = index.with_majors(majors)
+        for tier in short:
+            # the shortlist falls back to schools without the major; use those last
+            rows = sorted(picks[tier], key=lambda row: not offers >> row & 1)
+            for row in rows:
+                if len(fixed[tier]) >= TIER_MIN:
+                    break
+                if row not in seen:
+                    seen.add(row)
+                    # only name a program the school actually has
+                    major = next((tag for tag in majors if index.by_major.get(tag, 0) >> row & 1), None)
+                    fixed[tier].append(f"{index.names[row]} - {MAJORS[major][0]}" if major else index.names[row])
+                    changed = True
+    return fixed, changed
+
+
+def check_college_list(college_list, profile):
+    """fix_college_list for a freshly generated list, counted in llm_structured_output_total{kind="college_list"}"""
+    fixed, changed = fix_college_list(college_list, profile)
+    record_output("college_list", "repaired" if changed else "valid")
+    return fixed
@@ -0,0 +1,82 @@
+import os
+import threading
+
+import httpx
+
+# The backend only uses Supabase's table API (PostgREST) and, for the optional
+# remote auth fallback, GoTrue. supabase.create_client() imports and builds the
+# whole stack (realtime, storage3 -> pyiceberg, functions), which is most of a
+# cold start, so this talks to those two services directly and only imports
+# their clients the first time they're needed.
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
+
+class SupabaseClient:
+    """Drop-in for the `supabase` client as main.py uses it: .table(name) and .auth"""
+
+    def __init__(self, url, key):
+        self.url = (url or "").rstrip("/")
+        self.key = key
+        self.headers = {"apiKey": key or "", "Authorization": f"Bearer {key}"}
+        self.lock = threading.RLock()
+        self._http = None
+        self._rest = None
+        self._auth = None
+
+    @property
+    def http(self):
+        # One keep-alive pool shared by table and auth calls; handlers run these in
+        # worker threads, and httpx.Client is safe to share between threads
+        if self._http is None:
+            with self.lock:
+                if self._http is None:
+                    self._http = httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=SUPABASE_POOL_SIZE,
+                            max_keepalive_connections=SUPABASE_POOL_SIZE,
+                        ),
+                        timeout=SUPABASE_TIMEOUT,
+                        follow_redirects=True,
+                    )
+        return self._http
+
+    @property
+    def rest(self):
+        if self._rest is None:
+            with self.lock:
+                if self._rest is None:
+                    from postgrest import SyncPostgrestClient
+                    self._rest = SyncPostgrestClient(
+                        f"{self.url}/rest/v1", headers={**self.headers, "Accept": "application/json",
+                                                        "Content-Type": "application/json"},
+                        http_client=self.http,
+                    )
+        return self._rest
+
+    def table(self, name):
+        return self.rest.from_(name)
+
+    @property
+    def auth(self):
+        if self._auth is None:
+            with self.lock:
+                if self._auth is None:
+                    from supabase_auth import SyncGoTrueClient
+                    self._auth = SyncGoTrueClient(
+                        url=f"{self.url}/auth/v1",
+                        headers=self.headers,
+                        auto_refresh_token=False,
+                        persist_session=False,
+                        http_client=self.http,
+                    )
+        return self._auth
+
+    def warm(self):
+        """Import and build the table client now (called from the lifespan hook, after fork)"""
+        return self.rest
+
+    def close(self):
+        if self._http is not None:
+            self._http.close()
+        self._http = self._rest = self._auth = None
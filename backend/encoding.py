@@ -0,0 +1,182 @@
+import asyncio
+import base64
+import gzip
+import os
+import zlib
+
+import orjson
+from fastapi.responses import Response
+
+from metrics import timed
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli` to also serve br
+    brotli = None
+
+# Saved roadmaps and essay feedback are the biggest things we send and store.
+# On the wire: large JSON responses are gzip/brotli compressed when the browser
+# asks for it, and the history endpoints serialize with orjson. In the
+# database: roadmap_content / feedback can be stored as zlib-compressed text
+# (STORAGE_ENCODING=compact), decoded transparently whenever a row is read.
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))  # 0 turns it off
+# level 1 is ~5x cheaper than 6 on a full history page for ~20% more bytes
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "1"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+STORAGE_ENCODING = os.getenv("STORAGE_ENCODING", "json")  # json | compact
+STORAGE_COMPACT_MIN_BYTES = int(os.getenv("STORAGE_COMPACT_MIN_BYTES", "2048"))
+
+# Bigger bodies are compressed in a thread (zlib/brotli release the GIL) so the loop keeps serving
+COMPRESS_IN_THREAD_BYTES = 64 * 1024
+
+# Already compressed or streamed as it's produced (SSE must reach the browser event by event)
+UNCOMPRESSED_TYPES = ("text/event-stream", "image/", "audio/", "video/", "application/zip", "application/gzip")
+
+
+class ORJSONResponse(Response):
+    """JSONResponse that serializes with orjson (several times faster on big nested rows)"""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        with timed("response", "serialize"):
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def accepted_encoding(header):
+    """Best of br/gzip the client accepts (by q-value, br on a tie), or None"""
+    offered = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    wildcard = offered.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in (("br", "gzip") if brotli is not None else ("gzip",)):
+        q = offered.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(body, encoding):
+    with timed("response", "compress"):
+        if encoding == "br":
+            return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Plain ASGI middleware: compresses single-message responses of at least
+    RESPONSE_COMPRESSION_MIN_BYTES when Accept-Encoding allows it. Streamed
+    responses (SSE) go out untouched."""
+
+    def __init__(self, app, minimum_size=RESPONSE_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.minimum_size <= 0:
+            return await self.app(scope, receive, send)
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = accepted_encoding(accept) if accept else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                # held back until we know whether the body gets compressed
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            headers = start.get("headers", [])
+            content_type = next((v for k, v in headers if k == b"content-type"), b"").decode("latin-1")
+            body = message.get("body", b"")
+            if (message.get("more_body", False) or len(body) < self.minimum_size
+                    or any(k == b"content-encoding" for k, _ in headers)
+                    or content_type.startswith(UNCOMPRESSED_TYPES)):
+                passthrough = True
+                await send(start)
+                return await send(message)
+            if len(body) >= COMPRESS_IN_THREAD_BYTES:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            start["headers"] = [(k, v) for k, v in headers if k != b"content-length"] + [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# Document columns that may be stored compact
+DOCUMENT_COLUMNS = {
+    'roadmaps': ('roadmap_content',),
+    'essays': ('feedback',),
+}
+COMPACT_PREFIX = "z1:"
+
+
+def encode_document(value):
+    """A document as it's stored: unchanged, or `z1:` + base64 zlib of its JSON when
+    STORAGE_ENCODING=compact and it's big enough to be worth it"""
+    if STORAGE_ENCODING != "compact" or value is None or isinstance(value, str):
+        return value
+    raw = orjson.dumps(value)
+    if len(raw) < STORAGE_COMPACT_MIN_BYTES:
+        return value
+    return COMPACT_PREFIX + base64.b64encode(zlib.compress(raw, 6)).decode()
+
+
+def decode_document(value):
+    """Inverse of encode_document; also parses documents saved as plain JSON strings"""
+    if not isinstance(value, str):
+        return value
+    if value.startswith(COMPACT_PREFIX):
+        return orjson.loads(zlib.decompress(base64.b64decode(value[len(COMPACT_PREFIX):])))
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return value
+
+
+def encode_row(table, row):
+    """Copy of a row about to be written with its document columns encoded"""
+    columns = [column for column in DOCUMENT_COLUMNS.get(table, ()) if column in row]
+    if STORAGE_ENCODING != "compact" or not columns:
+        return row
+    row = dict(row)
+    for column in columns:
+        row[column] = encode_document(row[column])
+    return row
+
+
+def decode_rows(table, rows):
+    """Decode the document columns of rows read back from the database (in place)"""
+    columns = DOCUMENT_COLUMNS.get(table, ())
+    for row in rows:
+        for column in columns:
+            if column in row:
+                row[column] = decode_document(row[column])
+    return rows
@@ -0,0 +1,336 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+from llm import LLMBusyError
+
+# Opt-in async mode for /generate and /essay: the request only enqueues a job,
+# a small worker pool runs it, and the client polls GET /jobs/{id}. Keeps long
+# completions from holding an HTTP connection open past proxy timeouts.
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "memory")  # memory | sqlite
+JOBS_PATH = os.getenv("JOBS_PATH", "jobs.db")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_MAX_QUEUE_DEPTH = int(os.getenv("JOBS_MAX_QUEUE_DEPTH", "200"))
+JOBS_MAX_PENDING_PER_USER = int(os.getenv("JOBS_MAX_PENDING_PER_USER", "3"))
+JOBS_RESULT_TTL = float(os.getenv("JOBS_RESULT_TTL", "3600"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "0.5"))
+# A job stuck in "running" this long (worker died mid-job) goes back in the queue
+JOBS_STALE_SECONDS = float(os.getenv("JOBS_STALE_SECONDS", "600"))
+# A job put back because the completion pool was full waits this long before it's claimed again
+JOBS_BUSY_BACKOFF = float(os.getenv("JOBS_BUSY_BACKOFF", "5"))
+
+
+class QueueFullError(Exception):
+    """Too many jobs waiting overall"""
+
+
+class TooManyJobsError(Exception):
+    """This user already has JOBS_MAX_PENDING_PER_USER jobs waiting or running"""
+
+
+def new_job(kind, user_id, payload, cost=0):
+    now = time.time()
+    return {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "user_id": user_id,
+        "status": "queued",
+        "payload": payload,
+        "result": None,
+        "error": None,
+        # rate-limit tokens charged at submit, handed back if the job fails
+        "cost": cost,
+        "created_at": now,
+        "updated_at": now,
+        # not claimed before this (pushed back after an LLM-busy requeue)
+        "run_at": now,
+    }
+
+
+class MemoryJobStore:
+    """Jobs in a dict; fine for a single worker process and for tests"""
+
+    def __init__(self):
+        # called from worker threads (see JobQueue)
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def add(self, job, max_depth, max_per_user):
+        with self.lock:
+            if self._depth() >= max_depth:
+                raise QueueFullError()
+            if self._pending_for(job["user_id"]) >= max_per_user:
+                raise TooManyJobsError()
+            self.jobs[job["id"]] = job
+
+    def claim(self):
+        now = time.time()
+        with self.lock:
+            queued = [j for j in self.jobs.values() if j["status"] == "queued" and j["run_at"] <= now]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: j["run_at"])
+            job["status"] = "running"
+            job["updated_at"] = now
+            return dict(job)
+
+    def finish(self, job_id, status, result=None, error=None):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                job.update(status=status, result=result, error=error, updated_at=time.time())
+
+    def requeue(self, job_id, delay):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                now = time.time()
+                job.update(status="queued", updated_at=now, run_at=now + delay)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def depth(self):
+        with self.lock:
+            return self._depth()
+
+    def _depth(self):
+        return sum(1 for j in self.jobs.values() if j["status"] == "queued")
+
+    def pending_for(self, user_id):
+        with self.lock:
+            return self._pending_for(user_id)
+
+    def _pending_for(self, user_id):
+        return sum(1 for j in self.jobs.values()
+                   if j["user_id"] == user_id and j["status"] in ("queued", "running"))
+
+    def purge(self, finished_before, stale_before):
+        with self.lock:
+            for job_id, job in list(self.jobs.items()):
+                if job["status"] in ("done", "failed") and job["updated_at"] < finished_before:
+                    del self.jobs[job_id]
+                elif job["status"] == "running" and job["updated_at"] < stale_before:
+                    job["status"] = "queued"
+
+
+JOB_COLUMNS = ("id", "kind", "user_id", "status", "payload", "result", "error", "cost",
+               "created_at", "updated_at", "run_at")
+SELECT_JOB = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+
+
+class SQLiteJobStore:
+    """Jobs in a local SQLite file, so every uvicorn worker on the box shares one queue"""
+
+    def __init__(self, path=JOBS_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                cost INTEGER NOT NULL DEFAULT 0,
+                run_at REAL NOT NULL DEFAULT 0
+            )
+        """)
+        # queues made before jobs had these columns
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "cost" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN cost INTEGER NOT NULL DEFAULT 0")
+        if "run_at" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN run_at REAL NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_run_at ON jobs (status, run_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_user_status ON jobs (user_id, status)")
+
+    def _row_to_job(self, row):
+        job = dict(zip(JOB_COLUMNS, row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def add(self, job, max_depth, max_per_user):
+        with self.lock:
+            # IMMEDIATE takes the write lock up front so the checks and the insert are atomic across processes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0] >= max_depth:
+                    raise QueueFullError()
+                pending = self.conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN ('queued', 'running')",
+                    (job["user_id"],),
+                ).fetchone()[0]
+                if pending >= max_per_user:
+                    raise TooManyJobsError()
+                self.conn.execute(
+                    f"INSERT INTO jobs ({', '.join(JOB_COLUMNS)}) VALUES ({', '.join('?' * len(JOB_COLUMNS))})",
+                    (job["id"], job["kind"], job["user_id"], job["status"], json.dumps(job["payload"]),
+                     None, None, job["cost"], job["created_at"], job["updated_at"], job["run_at"]),
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def claim(self):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    f"{SELECT_JOB} WHERE status = 'queued' AND run_at <= ? ORDER BY run_at LIMIT 1", (now,)
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (now, row[0])
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._row_to_job(row)
+        job["status"] = "running"
+        return job
+
+    def finish(self, job_id, status, result=None, error=None):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def requeue(self, job_id, delay):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ?, run_at = ? WHERE id = ?",
+                (now, now + delay, job_id),
+            )
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute(f"{SELECT_JOB} WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def depth(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def pending_for(self, user_id):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN ('queued', 'running')", (user_id,)
+            ).fetchone()[0]
+
+    def purge(self, finished_before, stale_before):
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (finished_before,)
+            )
+            self.conn.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND updated_at < ?", (stale_before,)
+            )
+
+
+def make_store(kind=JOBS_BACKEND):
+    if kind == "sqlite":
+        return SQLiteJobStore()
+    return MemoryJobStore()
+
+
+class JobQueue:
+    """Runs queued jobs with a fixed pool of asyncio workers.
+
+    `runners` maps a job kind to `async def runner(payload, current_user) -> dict`;
+    `refund(current_user, cost)` hands back what a failed job was charged.
+    Store calls go through a thread: the SQLite store can wait up to its busy
+    timeout on another process's write lock, and that mustn't stall the loop.
+    """
+
+    def __init__(self, store, runners, workers=JOBS_WORKERS, refund=None):
+        self.store = store
+        self.runners = runners
+        self.workers = workers
+        self.refund = refund
+        self.wakeup = None
+        self.tasks = []
+
+    async def submit(self, kind, user_id, payload, cost=0):
+        job = new_job(kind, user_id, payload, cost)
+        await asyncio.to_thread(self.store.add, job, JOBS_MAX_QUEUE_DEPTH, JOBS_MAX_PENDING_PER_USER)
+        if self.wakeup:
+            self.wakeup.set()
+        return job
+
+    async def get(self, job_id, user_id):
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+        return job
+
+    async def start(self):
+        self.wakeup = asyncio.Event()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            job = await asyncio.to_thread(self.store.claim)
+            if job is None:
+                now = time.time()
+                await asyncio.to_thread(self.store.purge, now - JOBS_RESULT_TTL, now - JOBS_STALE_SECONDS)
+                self.wakeup.clear()
+                try:
+                    # other processes can add jobs too (sqlite), so don't wait forever on our own event
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=JOBS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        runner = self.runners[job["kind"]]
+        user = SimpleNamespace(id=job["user_id"])
+        try:
+            result = await runner(job["payload"], user)
+        except LLMBusyError:
+            # completion pool is saturated; put it back (for later, so it isn't
+            # reclaimed straight away) rather than failing the job
+            await asyncio.to_thread(self.store.requeue, job["id"], JOBS_BUSY_BACKOFF)
+            return
+        except Exception as e:
+            print(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            await asyncio.to_thread(
+                self.store.finish, job["id"], "failed", error="AI service temporarily unavailable."
+            )
+            if self.refund and job.get("cost"):
+                try:
+                    await self.refund(user, job["cost"])
+                except Exception as e:
+                    print(f"Refund for job {job['id']} failed: {e}")
+            return
+        await asyncio.to_thread(self.store.finish, job["id"], "done", result=result)
+
+    async def stats(self):
+        queued = await asyncio.to_thread(self.store.depth)
+        return {"backend": JOBS_BACKEND, "queued": queued, "workers": self.workers}
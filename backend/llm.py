@@ -0,0 +1,147 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+from metrics import observe, record_usage
+
+# How many completions we let run against Groq at the same time. Anything past
+# this waits in line for a slot instead of piling onto the provider.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# How long a request may wait for a slot before we give up with a 503
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+# SDK-level retries of the same model; router.py falls back to the next model instead
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))
+
+
+class LLMBusyError(Exception):
+    """Raised when no completion slot frees up within LLM_QUEUE_TIMEOUT"""
+
+
+_client = None
+_http_client = None
+
+
+def get_client():
+    """The shared AsyncGroq client. The app's lifespan hook builds it at startup
+    (in each worker, after fork); anything else gets it on first use."""
+    global _client, _http_client
+    if _client is None:
+        # groq pulls in a few hundred ms of pydantic models, so it stays off main's import path
+        from groq import AsyncGroq
+
+        # One pooled HTTP connection set shared by every request, so we keep the
+        # TLS session to Groq warm instead of reconnecting per completion.
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONCURRENCY,
+                max_keepalive_connections=LLM_MAX_CONCURRENCY,
+            ),
+            timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=10.0),
+        )
+        _client = AsyncGroq(
+            api_key=os.environ.get("GROQ_API_KEY"),
+            base_url=os.environ.get("GROQ_BASE_URL") or None,
+            http_client=_http_client,
+            max_retries=LLM_MAX_RETRIES,
+        )
+    return _client
+
+
+async def close_client():
+    global _client, _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _client = _http_client = None
+
+# Built inside the running loop, not at import: on Python 3.9 a semaphore binds
+# to whatever loop exists when it's created, and the first request that has to
+# wait for a slot then fails with "attached to a different loop"
+_slots = None
+_slots_loop = None
+
+
+def _get_slots():
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        _slots, _slots_loop = asyncio.Semaphore(LLM_MAX_CONCURRENCY), loop
+    return _slots
+
+
+async def _acquire_slot():
+    """Wait for a completion slot; returns the semaphore to release it on"""
+    slots = _get_slots()
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=LLM_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise LLMBusyError(f"No completion slot free after {LLM_QUEUE_TIMEOUT}s")
+    finally:
+        observe("llm", "slot_wait", time.perf_counter() - start)
+    return slots
+
+
+async def create_completion(**kwargs):
+    """Run a chat completion without blocking the event loop, capped at LLM_MAX_CONCURRENCY in flight"""
+    slots = await _acquire_slot()
+    try:
+        start = time.perf_counter()
+        completion = await get_client().chat.completions.create(**kwargs)
+        observe("llm", "completion", time.perf_counter() - start)
+        record_usage(kwargs.get("model"), getattr(completion, "usage", None))
+        return completion
+    finally:
+        slots.release()
+
+
+class CompletionStream:
+    """Text deltas of a streamed completion. Holds its pool slot until exhausted or closed."""
+
+    def __init__(self, stream, slots, model=None, started=None):
+        self._stream = stream
+        self._slots = slots
+        self._released = False
+        self.model = model
+        self.started = started or time.perf_counter()
+
+    async def __aiter__(self):
+        first = True
+        try:
+            async for chunk in self._stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first:
+                        first = False
+                        observe("llm", "first_token", time.perf_counter() - self.started)
+                    yield chunk.choices[0].delta.content
+                # Groq puts usage on the last chunk under x_groq
+                x_groq = getattr(chunk, "x_groq", None)
+                usage = getattr(chunk, "usage", None) or getattr(x_groq, "usage", None)
+                if usage is not None:
+                    record_usage(self.model, usage, first_token=False)
+            observe("llm", "completion", time.perf_counter() - self.started)
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            await self._stream.close()
+        finally:
+            self._slots.release()
+
+
+async def stream_completion(**kwargs):
+    """Start a streamed chat completion; the slot is taken now, so busy errors surface before any bytes go out"""
+    slots = await _acquire_slot()
+    started = time.perf_counter()
+    try:
+        stream = await get_client().chat.completions.create(stream=True, **kwargs)
+    except BaseException:
+        slots.release()
+        raise
+    return CompletionStream(stream, slots, kwargs.get("model"), started)
@@ -1,33 +1,95 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, status
+from fastapi import FastAPI, Request, Depends, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from groq import Groq
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import os
+import asyncio
+import base64
+import hmac
+import statistics
+import jwt
+from collections import Counter
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from supabase import create_client, Client
 import json
 from datetime import datetime
-from slowapi import Limiter, _rate_limit_exceeded_handler  # Add these
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from typing import Optional
 load_dotenv()
 
-client = Groq(
-    api_key=os.environ.get("GROQ_API_KEY")
+import llm
+from llm import LLMBusyError, LLM_QUEUE_TIMEOUT
+from db import SupabaseClient
+from router import roadmap_router, essay_router
+from streamjson import SectionStream
+from prompts import (
+    ROADMAP_TEMPLATE, ESSAY_TEMPLATE, ESSAY_REVISION_TEMPLATE, build_roadmap_messages, build_essay_messages,
+    build_section_messages, build_revision_messages,
 )
+from sections import (
+    SectionPathError, parse_path, shape_at, get_at, set_at, matches_shape, compact, context_without,
+)
+from cache import response_cache, cache_key, wants_bypass
+from persistence import PersistenceQueue
+from schemas import InvalidOutputError, check, finish_document, load_cached
+from analysis import analyze_essay, merge_into_feedback
+from colleges import get_index as college_index, check_college_list, fix_college_list
+from revisions import (
+    REVISION_MAX_CHANGED, paragraph_diff, changed_share, unchanged, make_delta, expand,
+)
+from jobs import JobQueue, make_store, QueueFullError, TooManyJobsError, JOBS_MAX_PENDING_PER_USER
+from auth import verify_token, remember, check_config, AuthError, AUTH_REMOTE_FALLBACK
+from ratelimit import make_limiter, estimate_tokens, RateLimited
+from encoding import CompressionMiddleware, ORJSONResponse, encode_document, encode_row, decode_document, decode_rows
+from metrics import MetricsMiddleware, timed, render as render_metrics, monitor_event_loop, EVENT_LOOP_MONITOR_INTERVAL
 
-# Supabase setup
+# Supabase setup (cheap: nothing is imported or connected until startup or first use)
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase = SupabaseClient(supabase_url, supabase_key)
+
+# Flipped by lifespan() once clients and background workers are up; GET /ready reports it
+ready = False
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Clients are built here rather than at import so each uvicorn worker makes
+    # its own pools after the fork, and importing main stays fast
+    global ready
+    if os.getenv('DEV_MODE') != 'true':
+        check_config()
+    llm.get_client()
+    rate_limiter.start()
+    college_index()
+    if hasattr(supabase, "warm"):
+        await asyncio.to_thread(supabase.warm)
+    await writer.start()
+    await job_queue.start()
+    loop_monitor = asyncio.create_task(monitor_event_loop()) if EVENT_LOOP_MONITOR_INTERVAL > 0 else None
+    ready = True
+    print("✅ Startup complete")
+    try:
+        yield
+    finally:
+        ready = False
+        if loop_monitor is not None:
+            loop_monitor.cancel()
+        await job_queue.stop()
+        await writer.stop()
+        await llm.close_client()
+        if hasattr(supabase, "close"):
+            supabase.close()
+
+
+app = FastAPI(lifespan=lifespan)
 security = HTTPBearer()
 
-#gets their address
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Background writer for roadmap/essay rows (looks up `supabase` at write time)
+writer = PersistenceQueue(lambda: supabase, encode_row=encode_row)
+
+# Per-user token buckets shared by all workers on the box (see ratelimit.py); the
+# store is opened in lifespan()
+rate_limiter = make_limiter()
 
 
 app.add_middleware(
@@ -43,25 +105,65 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# gzip/brotli for big JSON responses (see encoding.py)
+app.add_middleware(CompressionMiddleware)
+# Per-route latency and the optional Server-Timing header (see metrics.py)
+app.add_middleware(MetricsMiddleware)
+
+# /metrics and the */stats routes show per-user limiter state, queue contents and
+# how the upstream models behave, so they want `Authorization: Bearer $METRICS_TOKEN`.
+# Without a token set they're off, except in DEV_MODE.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+async def require_metrics_token(request: Request):
+    if not METRICS_TOKEN:
+        if os.getenv('DEV_MODE') == 'true':
+            return
+        raise HTTPException(status_code=404, detail="Not Found")
+    given = request.headers.get("authorization", "")
+    if not hmac.compare_digest(given.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
 
 # Verify Supabase JWT token
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    
+    with timed("request", "auth"):
+        return await authenticate(credentials.credentials)
+
+
+async def authenticate(token):
     # Dev mode bypass (optional - for local testing)
     if os.getenv('DEV_MODE') == 'true' and token == 'dev-token-bypass':
         from types import SimpleNamespace
         return SimpleNamespace(id='dev-user-123', email='dev@test.com')
     
     try:
-        user = supabase.auth.get_user(token)
-        return user.user
+        return await verify_token(token)
+    except AuthError as e:
+        if not AUTH_REMOTE_FALLBACK:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials"
+            )
+        print(f"Local token check failed ({e}), asking Supabase")
+
+    # Opt-in fallback: round-trip to Supabase, off the event loop
+    try:
+        user = (await asyncio.to_thread(supabase.auth.get_user, token)).user
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
         )
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp", 0)
+    except jwt.PyJWTError:
+        exp = 0
+    remember(token, user, exp)
+    return user
 
 
 def validate_roadmap_input(data):
@@ -99,22 +201,126 @@ def validate_roadmap_input(data):
                 detail=f"{field} is too long (max {max_length} characters)"
             )
 
+ROADMAP_TEMPERATURE = 0.7
+ROADMAP_EXPECTED_TOKENS = 2500  # typical completion length, for rate limiting
+ROADMAP_FIELDS = ['gpa', 'grade', 'interests', 'activities', 'demographics',
+                  'testing', 'collegeGoals', 'classes', 'location']
+
+
+def ai_service_error(e):
+    """Map an upstream failure to the HTTPException the client gets"""
+    if isinstance(e, InvalidOutputError):
+        print(f"⚠️ AI output unusable after repair: {e}")
+        return HTTPException(status_code=500, detail="AI service temporarily unavailable.")
+    if isinstance(e, LLMBusyError):
+        print("⏳ LLM queue full, turning request away")
+        return HTTPException(
+            status_code=503,
+            detail="AI service is busy. Please try again shortly.",
+            headers={"Retry-After": str(int(LLM_QUEUE_TIMEOUT))}
+        )
+    print(f"Groq API Error: {e}")
+    return HTTPException(
+        status_code=500, 
+        detail="AI service temporarily unavailable."
+    )
+
+
+async def charge(current_user, cost, bucket="interactive"):
+    """Take `cost` estimated tokens from the user's rate limit bucket, or 429"""
+    try:
+        return await asyncio.to_thread(rate_limiter.charge, str(current_user.id), cost, bucket)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="You're sending requests too quickly. Please wait a moment and try again.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+async def refund(current_user, cost, bucket="interactive"):
+    """Hand the tokens back when the request failed before the model did any work for it"""
+    await asyncio.to_thread(rate_limiter.refund, str(current_user.id), cost, bucket)
+
+
+def roadmap_cost(data):
+    """Estimated tokens for a roadmap; a cache hit never reaches the model, so it's free"""
+    if not wants_bypass(data) and response_cache.contains(roadmap_cache_key(data)):
+        return 0
+    return estimate_tokens(build_roadmap_messages(data), ROADMAP_EXPECTED_TOKENS)
+
+
+def roadmap_cache_key(data):
+    payload = {field: data.get(field) for field in ROADMAP_FIELDS}
+    # The prompt is dated, so a cached roadmap is only good for the month it was made in
+    payload['month'] = datetime.now().strftime("%Y-%m")
+    # and the shortlist in it comes from the college dataset
+    payload['colleges'] = college_index().version
+    return cache_key("roadmap", payload, roadmap_router.primary, ROADMAP_TEMPERATURE, ROADMAP_TEMPLATE.version)
+
+
+def roadmap_row(current_user, data, roadmap_json):
+    """Row for the roadmaps table (roadmap_content is a jsonb column)"""
+    return {
+        'user_id': str(current_user.id),
+        'gpa': data.get("gpa"),
+        'grade': data.get("grade"),
+        'interests': data.get("interests"),
+        'activities': data.get("activities"),
+        'demographics': data.get("demographics"),
+        'testing': data.get("testing"),
+        'college_goals': data.get("collegeGoals"),
+        'location': data.get("location"),
+        'classes': data.get("classes"),
+        'roadmap_content': roadmap_json,
+        'prompt_version': ROADMAP_TEMPLATE.version,
+        'revision': 0
+    }
+
+
+async def run_roadmap(data, current_user):
+    """Generate (or reuse) a roadmap for a validated profile and queue it for saving"""
+    grade = data.get("grade")
+    cache_id = roadmap_cache_key(data)
+
+    roadmap_json = None if wants_bypass(data) else load_cached("roadmap", response_cache.get(cache_id))
+    if roadmap_json is not None:
+        print(f"⚡ Roadmap for {grade} student served from cache")
+    else:
+        print(f"📋 Roadmap request for {grade} student")
+        
+        with timed("roadmap", "prompt"):
+            messages = build_roadmap_messages(data)
+        with timed("roadmap", "completion"):
+            chat_completion = await roadmap_router.complete(
+                messages=messages,
+                temperature=ROADMAP_TEMPERATURE,
+                max_tokens=4000, 
+                response_format={"type": "json_object"}
+            )
+        
+        # Validated against schemas.Roadmap, repaired or topped up if needed
+        roadmap_json = await finish_document(
+            "roadmap", chat_completion.choices[0].message.content, messages, roadmap_router, ROADMAP_TEMPERATURE
+        )
+        # and its college list checked against the dataset
+        roadmap_json['college_list_suggestions'] = check_college_list(roadmap_json['college_list_suggestions'], data)
+        # don't pin a fallback model's answer in the cache
+        if chat_completion.model == roadmap_router.primary:
+            response_cache.set(cache_id, compact(roadmap_json))
+
+    # Save to Supabase in the background
+    roadmap_id = writer.enqueue('roadmaps', roadmap_row(current_user, data, roadmap_json))
+    return {"roadmap": roadmap_json, "id": roadmap_id}
+
+
 @app.post("/generate")
-@limiter.limit("3/minute")
 async def generate_roadmap(request: Request, current_user = Depends(get_current_user)):
     data = await request.json()
     
     # Extract data
-    validate_roadmap_input(data)
-    gpa = data.get("gpa")
-    grade = data.get("grade")
-    interests = data.get("interests")
-    activities = data.get("activities")
-    demographic = data.get("demographics")
-    testing = data.get("testing")
-    goals = data.get("collegeGoals")
-    classes = data.get("classes")
-    location = data.get("location")
+    with timed("roadmap", "validate"):
+        validate_roadmap_input(data)
     
 #     try:
 #         gpa_float = float(gpa)
@@ -126,350 +332,516 @@ async def generate_roadmap(request: Request, current_user = Depends(get_current_
 # # Limit string lengths to prevent abuse
 #     if len(str(interests)) > 2000 or len(str(activities)) > 2000:
 #         raise HTTPException(status_code=400, detail="Input too long")
-    # 1. Get Current Date & Logic
-    now = datetime.now()
-    current_date_str = now.strftime("%B %Y")
-    
-    # Determine timeline duration
-    if "9" in str(grade) or "freshman" in str(grade).lower():
-        duration_note = "Start NOW. Cover 9th and 10th grade in semesters, then 11th/12th in detail."
-    elif "10" in str(grade) or "sophomore" in str(grade).lower():
-        duration_note = "Start NOW. Cover the rest of 10th, all of 11th, and end at Jan of 12th Grade."
-    elif "11" in str(grade) or "junior" in str(grade).lower():
-        duration_note = "Start NOW. Cover 11th Spring/Summer and 12th Fall/Winter in detail."
-    else:
-        duration_note = "Start NOW. Focus on Senior Winter/Spring transition to college."
-
-    # 2. STRICT JSON SCHEMA
-    # Enhanced schema with specificity requirements
-    json_schema = """
-    {
-      "student_summary": "A warm, personalized paragraph summarizing their profile and unique strengths.",
-      "college_list_suggestions": {
-         "reach": ["School A with specific major/program", "School B with specific major/program", "School C with specific major/program"],
-         "target": ["School C with specific major/program", "School D with specific major/program", "School E with specific major/program"],
-         "safety": ["School E with specific major/program", "School F with specific major/program", "School N with specific major/program"]
-      },
-      "academic_plan": {
-         "course_suggestions": ["Specific Course Name (e.g., 'AP Calculus BC' not 'math class')", "Specific Course Name"],
-         "testing_strategy": "Specific, actionable advice with target scores, test dates, and preparation timeline"
-      },
-      "extracurriculars": {
-         "current_optimization": "Specific, actionable steps to improve existing activities with measurable outcomes",
-         "new_opportunities": ["Specific opportunity name with why it fits (e.g., 'Join Model UN - builds public speaking skills needed for Political Science')", "Specific opportunity 2"]
-      },
-      "timeline": [
-        {
-          "period": "Specific Season/Year (e.g., 'Fall 2025' not 'next semester')", 
-          "focus": "Specific main theme/goal for this period",
-          "tasks": ["Specific, actionable task with deadline or timeframe (e.g., 'Register for PSAT by September 15th' not 'take a test')", "Another specific task"]
-        }
-      ]
-    }
-    """
 
-    # 3. STRATEGIC GUIDELINES (Enhanced with specificity requirements)
-    logic_constraints = f"""
-    1. TIMELINE CONTEXT: Current date is {current_date_str}. {duration_note}
-    2. MANDATORY SECTIONS: Fill every field in the JSON schema.
-    
-    3. SPECIFICITY REQUIREMENTS - CRITICAL:
-       - All tasks must be SPECIFIC and ACTIONABLE. Use concrete actions, not vague suggestions.
-       - Good task: "Register for October PSAT by September 15th through CollegeBoard website"
-       - Bad task: "Take a test" or "Study more" or "Do well in school"
-       - Include WHO, WHAT, WHEN, WHERE, and HOW when relevant.
-       - Each task should have a clear, measurable outcome.
-       
-    4. GOAL SPECIFICITY:
-       - Course suggestions must include full course names (e.g., "AP Computer Science A" not "a CS class").
-       - College suggestions should include the specific major/program (e.g., "MIT - Computer Science and Engineering" not just "MIT").
-       - Timeline periods must be specific (e.g., "Fall 2025 - 11th Grade" not "next fall").
-       - Testing strategy must include target scores, specific test dates, and preparation methods.
-       
-    5. LOCATION STRATEGY: 
-       - User Preference: "{location}"
-       - Prioritize schools in this region with specific major matches.
-       - When suggesting schools outside the region, explicitly state why (e.g., "UC Berkeley - #1 in Computer Science, worth considering despite being out of state").
-    
-    6. SCHOOL LIST REALISM AND SPECIFICITY:
-       - Ensure "Safety" schools are actually safe (typically >50% acceptance or local options).
-       - Include specific major/program for each school (e.g., "Arizona State University - Computer Science" not just "ASU").
-       - Be cautious with competitive majors. For example, CS at UIUC or UW is very hard, so they are "Targets" or "Reaches" not Safeties.
-       - For Art majors, RISD or CalArts are Reaches. Suggest specific state schools with good art programs for Safeties.
-       - Include 2-3 schools per category (Reach, Target, Safety) for optimal balance.
-       
-    7. TESTING STRATEGY SPECIFICITY:
-       - If they are young (9th/10th), provide specific test names (PSAT/NMSQT), registration deadlines, and target scores.
-       - If older, provide specific SAT/ACT test dates, registration deadlines, and score goals.
-       - Include preparation method recommendations (e.g., "Take 3 practice tests using Khan Academy before October SAT").
-       - If test-optional, explain which schools accept this and when they might still want to test.
-       
-    8. EXTRACURRICULAR SPECIFICITY:
-       - "Current Optimization" should include 2-3 specific, actionable steps to improve existing activities.
-       - "New Opportunities" should name specific clubs/organizations and explain why they fit the student's profile.
-       - Include leadership opportunities when applicable (e.g., "Run for Debate Team Captain in November").
-       
-    9. TIMELINE TASK SPECIFICITY:
-       - Each timeline task must include:
-         * Specific action verb (Register, Complete, Apply, Join, etc.)
-         * What exactly to do (course name, test name, program name)
-         * When (deadline or timeframe)
-         * Optional: Where (website, location) or How (method)
-       - Tasks should be sequenced logically (prerequisites first, then next steps).
-       - Include deadlines for time-sensitive items (application deadlines, test registration dates).
-       
-    10. HOLISTIC PROFILE CONNECTIONS:
-       - Identify connections between interests and suggest interdisciplinary paths.
-       - Example: Art + Biology → Medical Illustration, recommend specific programs.
-       - Make connections explicit in the student_summary or task descriptions.
-    """
+    cost = await charge(current_user, roadmap_cost(data))
+    try:
+        return await run_roadmap(data, current_user)
+    except Exception as e:
+        await refund(current_user, cost)
+        raise ai_service_error(e)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Top-level roadmap sections in the order the schema asks for them; timeline
+# entries are sent one at a time.
+ROADMAP_STREAM_ITEM_KEYS = ["timeline"]
+
+
+async def single_chunk(text):
+    yield text
 
-    # 4. Enhanced Final Prompt with examples
-    prompt = (
-        f"You are a supportive, detail-oriented college admissions mentor. Generate a highly specific, actionable JSON roadmap.\n"
-        f"Student Profile:\n"
-        f"- Grade: {grade}\n"
-        f"- GPA: {gpa}\n"
-        f"- Interests: {interests}\n"
-        f"- Activities: {activities}\n"
-        f"- Demographics: {demographic}\n"
-        f"- Testing Status: {testing}\n"
-        f"- College Goals: {goals}\n"
-        f"- Location Preference: {location}\n"
-        f"- Course Rigor: {classes}\n\n"
-        
-        f"### CRITICAL REQUIREMENTS FOR SPECIFICITY\n"
-        f"Every output must be SPECIFIC and ACTIONABLE. Avoid vague suggestions.\n\n"
-        f"EXAMPLES OF GOOD VS BAD:\n"
-        f"- ❌ BAD: 'Take the SAT'\n"
-        f"- ✅ GOOD: 'Register for October 7th SAT by September 8th via CollegeBoard.org. Aim for 1450+ based on current {gpa} GPA.'\n\n"
-        f"- ❌ BAD: 'Join some clubs'\n"
-        f"- ✅ GOOD: 'Apply to Model UN by September 20th. This builds public speaking skills aligned with your Political Science interest.'\n\n"
-        f"- ❌ BAD: 'Study for tests'\n"
-        f"- ✅ GOOD: 'Complete 3 full-length SAT practice tests using Khan Academy (one per week in September). Review wrong answers thoroughly.'\n\n"
-        
-        f"### STRATEGIC GUIDELINES\n"
-        f"{logic_constraints}\n\n"
 
-        f"### OUTPUT INSTRUCTIONS\n"
-        f"You must output valid JSON using the exact schema below. Fill in EVERY field with SPECIFIC, DETAILED information.\n"
-        f"Remember: Specificity is key. Each task, suggestion, and recommendation should be concrete and actionable.\n"
-        f"{json_schema}"
+async def roadmap_events(stream, current_user, data, cache_id, messages, cost=0):
+    """SSE events for a roadmap: one per finished section / timeline entry, then done.
+    If it fails partway, `cost` goes back to the user like on /generate"""
+    parser = SectionStream(item_keys=ROADMAP_STREAM_ITEM_KEYS)
+    chunks = []
+    try:
+        async for text in stream:
+            chunks.append(text)
+            for event in parser.feed(text):
+                if len(event) == 3:
+                    key, index, item = event
+                    yield sse_event(key, {"index": index, "data": item})
+                else:
+                    key, value = event
+                    if key == "college_list_suggestions" and messages is not None and isinstance(value, dict):
+                        # the same check the finished roadmap gets below, so the two agree
+                        value = fix_college_list(value, data)[0]
+                    yield sse_event("section", {"section": key, "data": value})
+    except Exception as e:
+        print(f"Groq API Error: {e}")
+        await refund(current_user, cost)
+        yield sse_event("error", {"detail": "AI service temporarily unavailable."})
+        return
+    finally:
+        await stream.aclose()
+
+    # Without JSON mode the model sometimes wraps the object in a ``` fence; finish_document strips it
+    try:
+        if messages is None:  # replaying a cached answer, which was validated when it was stored
+            roadmap_json = load_cached("roadmap", "".join(chunks))
+        else:
+            roadmap_json = await finish_document(
+                "roadmap", "".join(chunks), messages, roadmap_router, ROADMAP_TEMPERATURE
+            )
+            roadmap_json['college_list_suggestions'] = check_college_list(
+                roadmap_json['college_list_suggestions'], data
+            )
+    except Exception as e:
+        await refund(current_user, cost)
+        yield sse_event("error", {"detail": ai_service_error(e).detail})
+        return
+    if cache_id:
+        response_cache.set(cache_id, compact(roadmap_json))
+
+    roadmap_id = writer.enqueue('roadmaps', roadmap_row(current_user, data, roadmap_json))
+    yield sse_event("done", {"roadmap": roadmap_json, "id": roadmap_id})
+
+
+@app.post("/generate/stream")
+async def generate_roadmap_stream(request: Request, current_user = Depends(get_current_user)):
+    """Same as /generate, but sends each roadmap section as a Server-Sent Event as soon as it's complete"""
+    data = await request.json()
+    with timed("roadmap", "validate"):
+        validate_roadmap_input(data)
+    cache_id = roadmap_cache_key(data)
+
+    cached = None if wants_bypass(data) else load_cached("roadmap", response_cache.get(cache_id))
+    if cached is not None:
+        print(f"⚡ Streaming roadmap for {data.get('grade')} student served from cache")
+        return StreamingResponse(
+            roadmap_events(single_chunk(compact(cached)), current_user, data, None, None),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    print(f"📋 Streaming roadmap request for {data.get('grade')} student")
+    with timed("roadmap", "prompt"):
+        messages = build_roadmap_messages(data)
+    cost = await charge(current_user, estimate_tokens(messages, ROADMAP_EXPECTED_TOKENS))
+    try:
+        # JSON mode can't be combined with streaming, so we lean on the system message here
+        stream = await roadmap_router.stream(
+            messages=messages,
+            temperature=ROADMAP_TEMPERATURE,
+            max_tokens=4000
+        )
+    except Exception as e:
+        await refund(current_user, cost)
+        raise ai_service_error(e)
+    if stream.model != roadmap_router.primary:
+        cache_id = None
+
+    return StreamingResponse(
+        roadmap_events(stream, current_user, data, cache_id, messages, cost),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+
+def validate_essay_input(data):
+    """Reject essay requests we can't grade"""
+    essay = data.get('essay')
+    if not isinstance(essay, str) or not essay.strip():
+        raise HTTPException(status_code=400, detail="Missing required field: essay")
+    if len(essay) > 20000:
+        raise HTTPException(status_code=400, detail="essay is too long (max 20000 characters)")
+    parent_id = data.get('parent_id')
+    if parent_id is not None and (not isinstance(parent_id, str) or not parent_id.strip()):
+        raise HTTPException(status_code=400, detail="parent_id must be the id of a saved essay")
+
+
+def letter_grade_of(feedback_json):
     try:
-        print(f"📋 Roadmap request for {grade} student")
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are a JSON-only API. You must return valid JSON with all requested fields."
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.7,
-            max_tokens=4000, 
+        return int(feedback_json.get("letter_grade"))
+    except (TypeError, ValueError):
+        return None
+
+
+ESSAY_TEMPERATURE = 0.4 # Keep it low to enforce strict rubric
+ESSAY_EXPECTED_TOKENS = 900
+ESSAY_REVISION_EXPECTED_TOKENS = 450
+ESSAY_FIELDS = ['grade', 'prompt', 'essay', 'program', 'word_limit']
+
+
+def essay_cache_key(data):
+    return cache_key(
+        "essay",
+        {field: data.get(field) for field in ESSAY_FIELDS},
+        essay_router.primary, ESSAY_TEMPERATURE, ESSAY_TEMPLATE.version
+    )
+
+
+def essay_cost(data, parent=None):
+    """Estimated tokens to grade an essay; free when the feedback is already cached
+    or the draft is the same as its parent's"""
+    if not wants_bypass(data) and response_cache.contains(essay_cache_key(data)):
+        return 0
+    diff = revision_diff(data, parent)
+    if diff is not None:
+        if unchanged(diff):
+            return 0
+        analysis = analyze_essay(data.get("essay"), data.get("word_limit"))
+        messages = build_revision_messages(data, analysis, parent['feedback'], diff)
+        return estimate_tokens(messages, ESSAY_REVISION_EXPECTED_TOKENS)
+    return estimate_tokens(build_essay_messages(data), ESSAY_EXPECTED_TOKENS)
+
+
+async def grade_essay_text(data):
+    """Validated model feedback for one essay (or the cached copy)"""
+    cache_id = essay_cache_key(data)
+    
+    feedback_json = None if wants_bypass(data) else load_cached("essay", response_cache.get(cache_id))
+    if feedback_json is not None:
+        print("⚡ Essay feedback served from cache")
+        return feedback_json
+
+    with timed("essay", "analysis"):
+        analysis = analyze_essay(data.get("essay"), data.get("word_limit"))
+    with timed("essay", "prompt"):
+        messages = build_essay_messages(data, analysis)
+    with timed("essay", "completion"):
+        chat_completion = await essay_router.complete(
+            messages=messages,
+            temperature=ESSAY_TEMPERATURE,
+            max_tokens=4000,
             response_format={"type": "json_object"}
         )
-        
-        roadmap_content_str = chat_completion.choices[0].message.content
-        
-        # Verify JSON before returning
-        try:
-            roadmap_json = json.loads(roadmap_content_str)
-        except json.JSONDecodeError:
-            print("⚠️ AI generated invalid JSON")
-            # You might want to retry here or return an error, but for now we pass it through
-            roadmap_json = {"error": "Invalid JSON", "raw": roadmap_content_str}
+    
+    # Validated against schemas.EssayFeedback (letter_grade is checked against the component scores)
+    feedback_json = await finish_document(
+        "essay", chat_completion.choices[0].message.content, messages, essay_router, ESSAY_TEMPERATURE
+    )
+    merge_into_feedback(feedback_json, analysis, data.get("essay"))
+    if chat_completion.model == essay_router.primary:
+        response_cache.set(cache_id, compact(feedback_json))
+    return feedback_json
 
-        # Save to Supabase (saving the raw string for DB)
-        try:
-            result = supabase.table('roadmaps').insert({
-                'user_id': str(current_user.id),
-                'gpa': gpa,
-                'grade': grade,
-                'interests': interests,
-                'activities': activities,
-                'demographics': demographic,
-                'testing': testing,
-                'college_goals': goals,
-                'location':location,
-                'classes': classes,
-                'roadmap_content': roadmap_content_str 
-            }).execute()
-            
-            return {"roadmap": roadmap_json, "id": result.data[0]['id']}
-        except Exception as db_error:
-            print(f"Database error: {str(db_error)}")
-            return {"roadmap": roadmap_json, "warning": "Roadmap generated but not saved"}
-            
+
+def essay_row(current_user, data, feedback_json, prompt_version=ESSAY_TEMPLATE.version, parent=None, base=None):
+    """Row for the essays table (feedback is a jsonb column). A revision of a saved essay
+    is stored as a delta against `base` when that's smaller than a full copy"""
+    row = {
+        'user_id': str(current_user.id),
+        'grade': data.get("grade"),
+        'prompt': data.get("prompt"),
+        'essay_text': data.get("essay"),
+        'program': data.get("program"),
+        'feedback': feedback_json,
+        # denormalized so the summary list doesn't have to ship feedback
+        'letter_grade': letter_grade_of(feedback_json),
+        'prompt_version': prompt_version,
+        # every row has these keys, since the writer batches rows into one insert
+        'parent_id': parent['id'] if parent else None,
+        'base_id': None,
+        'delta': None,
+    }
+    if parent is not None:
+        delta = make_delta(base['essay_text'], base['feedback'], row['essay_text'], feedback_json)
+        if delta is not None:
+            row.update(essay_text=None, feedback=None, base_id=base['id'], delta=delta)
+    return row
+
+
+def load_essay(user_id, essay_id):
+    """(row, base) for a saved essay with its essay_text and feedback filled in; `base`
+    is the row stored in full that its delta is against (the row itself if it has none)"""
+    row = get_history_row('essays', user_id, essay_id)
+    if row is None:
+        return None, None
+    if row.get('delta') is None:
+        return expand(row, None), row
+    base = get_history_row('essays', user_id, row['base_id'])
+    if base is None:
+        raise LookupError(f"essay {essay_id} is missing its base row {row['base_id']}")
+    return expand(row, base), base
+
+
+async def load_parent(data, current_user):
+    """(parent, base) for a resubmitted draft (see load_essay), or (None, None) for a new essay"""
+    if not data.get('parent_id'):
+        return None, None
+    try:
+        with timed("history", "db_read"):
+            parent, base = await asyncio.to_thread(load_essay, str(current_user.id), data['parent_id'])
     except Exception as e:
-        print(f"Groq API Error: {e}")
-        raise HTTPException(
-            status_code=500, 
-            detail="AI service temporarily unavailable."
+        print(f"Fetch error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load parent essay")
+    if parent is None:
+        raise HTTPException(status_code=404, detail="Parent essay not found or unauthorized")
+    return parent, base
+
+
+def revision_diff(data, parent):
+    """Paragraph diff against the parent draft, or None if it has to be graded from scratch:
+    no usable parent feedback, a different prompt, or too much of it rewritten"""
+    if parent is None or data.get("prompt") != parent.get("prompt"):
+        return None
+    if check("essay", parent.get('feedback'))[0] is None:
+        return None
+    diff = paragraph_diff(parent.get('essay_text') or "", data.get("essay"))
+    if changed_share(diff) > REVISION_MAX_CHANGED:
+        return None
+    return diff
+
+
+async def grade_revision(data, parent):
+    """(feedback, prompt version) for a revised draft, re-grading only what changed,
+    or (None, None) if it needs a full grade instead"""
+    with timed("essay_revision", "diff"):
+        diff = revision_diff(data, parent)
+    if diff is None:
+        return None, None
+    if unchanged(diff):
+        print("⚡ Revision has no changes, reusing the parent's feedback")
+        feedback_json = dict(parent['feedback'])
+        feedback_json.pop("revision_notes", None)
+        return feedback_json, parent.get('prompt_version')
+
+    with timed("essay", "analysis"):
+        analysis = analyze_essay(data.get("essay"), data.get("word_limit"))
+    with timed("essay_revision", "prompt"):
+        messages = build_revision_messages(data, analysis, parent['feedback'], diff)
+    with timed("essay_revision", "completion"):
+        chat_completion = await essay_router.complete(
+            messages=messages,
+            temperature=ESSAY_TEMPERATURE,
+            max_tokens=2000,
+            response_format={"type": "json_object"}
         )
-      
-      
+    revision = await finish_document(
+        "essay_revision", chat_completion.choices[0].message.content, messages, essay_router, ESSAY_TEMPERATURE
+    )
+    # advice the model left out carries over from the previous draft
+    feedback_json = dict(parent['feedback'])
+    feedback_json.update({key: value for key, value in revision.items() if value is not None})
+    notes = feedback_json.pop("revision_notes")
+    feedback_json, missing = check("essay", feedback_json)
+    if feedback_json is None:
+        raise InvalidOutputError("essay", missing)
+    feedback_json["revision_notes"] = notes
+    merge_into_feedback(feedback_json, analysis, data.get("essay"))
+    return feedback_json, ESSAY_REVISION_TEMPLATE.version
+
+
+async def run_essay(data, current_user, parent=None, base=None):
+    """Grade (or reuse feedback for) an essay and queue it for saving"""
+    if parent is None:
+        parent, base = await load_parent(data, current_user)
+    feedback_json, version = None, ESSAY_TEMPLATE.version
+    if parent is not None:
+        feedback_json, version = await grade_revision(data, parent)
+    if feedback_json is None:
+        feedback_json, version = await grade_essay_text(data), ESSAY_TEMPLATE.version
+    # Save to database in the background
+    essay_id = writer.enqueue('essays', essay_row(current_user, data, feedback_json, version, parent, base))
+    return {"feedback": feedback_json, "id": essay_id}
+
+
 @app.post("/essay")
-@limiter.limit("3/minute")
 async def grade_essay(request: Request, current_user = Depends(get_current_user)):
     data = await request.json()
-    grade = data.get("grade")
-    prompt_text = data.get("prompt")
-    essay = data.get("essay")
-    program = data.get("program")
-    word_limit = data.get("word_limit")
-    
-    # ... (Keep existing word count logic) ...
-    word_count = len(essay.split())
-    length_instruction = f"Current Word Count: {word_count} words."
-    if word_limit:
-        length_instruction += f" / Limit: {word_limit} words."
-    else:
-        length_instruction += " (No specific limit provided)."
-
-    # 1. NEW JSON SCHEMA: COMPONENT SCORING
-    json_schema = """
-    {
-      "pre_grading_analysis": {
-        "cliche_count": 0,
-        "cliches_found": ["List phrases"],
-        "is_generic_topic": true,
-        "predicted_impact": "Will the reader yawn or cry?"
-      },
-      "scoring_breakdown": {
-        "voice_and_authenticity": { "score": 15, "max": 20, "reason": "..." },
-        "insight_and_growth": { "score": 15, "max": 20, "reason": "..." },
-        "storytelling_and_craft": { "score": 15, "max": 20, "reason": "..." },
-        "originality_and_risk": { "score": 15, "max": 20, "reason": "..." },
-        "prompt_responsiveness": { "score": 15, "max": 20, "reason": "..." }
-      },
-      "letter_grade": 75,
-      "summary_badge": "Generic & Safe | Risky & Raw | Polished but Boring | Exceptional",
-      "key_strengths": ["Strength 1", "Strength 2"],
-      "areas_for_improvement": ["Fix 1", "Fix 2"],
-      "final_summary": "Summary...",
-      "detailed_action_plan": "Specific next steps..."
+    with timed("essay", "validate"):
+        validate_essay_input(data)
+    parent, base = await load_parent(data, current_user)
+    cost = await charge(current_user, essay_cost(data, parent))
+    try:
+        return await run_essay(data, current_user, parent, base)
+    except Exception as e:
+        await refund(current_user, cost)
+        raise ai_service_error(e)
+
+
+@app.post("/essay/analyze")
+async def analyze_essay_text(request: Request, current_user = Depends(get_current_user)):
+    """Instant local checks (cliches, generic topic, readability, structure); no model call, not rate limited"""
+    data = await request.json()
+    validate_essay_input(data)
+    with timed("essay", "analysis"):
+        return {"analysis": analyze_essay(data.get("essay"), data.get("word_limit"))}
+
+
+# Batch grading for counselors: a class set is graded concurrently, results
+# stream back as each essay finishes, and each row is queued for saving as soon
+# as its essay is graded.
+ESSAY_BATCH_MAX = int(os.getenv("ESSAY_BATCH_MAX", "40"))
+ESSAY_BATCH_CONCURRENCY = int(os.getenv("ESSAY_BATCH_CONCURRENCY", "4"))
+GRADE_BUCKETS = [(90, "90-100"), (80, "80-89"), (70, "70-79"), (0, "below 70")]
+
+
+def batch_summary(graded, failed):
+    """Score distribution and most common cliches across a graded set"""
+    scores = [g for g in (letter_grade_of(feedback) for feedback in graded) if g is not None]
+    distribution = {label: 0 for _, label in GRADE_BUCKETS}
+    for score in scores:
+        distribution[next(label for floor, label in GRADE_BUCKETS if score >= floor)] += 1
+
+    cliches = Counter()
+    for feedback in graded:
+        found = (feedback.get("pre_grading_analysis") or {}).get("cliches_found") or []
+        # count each phrase once per essay, ignoring case/punctuation differences
+        cliches.update({str(c).strip(" .,!?\"'").lower() for c in found if str(c).strip()})
+
+    return {
+        "graded": len(graded),
+        "failed": failed,
+        "mean": round(statistics.mean(scores), 1) if scores else None,
+        "median": statistics.median(scores) if scores else None,
+        "min": min(scores) if scores else None,
+        "max": max(scores) if scores else None,
+        "distribution": distribution,
+        "top_cliches": [{"phrase": phrase, "essays": n} for phrase, n in cliches.most_common(10)],
     }
-    """
 
-    # 2. SYSTEM PROMPT: FORCE DISTRIBUTION
-    system_instruction = f"""
-You are a **CYNICAL ADMISSIONS OFFICER** who is tired of reading generic essays.
-Student Context: Grade {grade}, applying to {program}.
-
-### SCORING PROTOCOL (COMPONENT METHOD)
-You must grade on 5 distinct components (Max 20 points each).
-**TOTAL SCORE = Sum of components.**
-
-**1. Voice & Authenticity (Max 20)**
-- 18-20: Sounds exactly like a teenager talking to a friend. Raw, vulnerable.
-- 14-17: Polished but slightly "resume-speak."
-- <14: Sounds like ChatGPT or a parent wrote it.
-
-**2. Insight & Growth (Max 20)**
-- 18-20: A profound realization that changes their worldview.
-- 14-17: "I worked hard and succeeded." (Standard)
-- <14: No lesson learned, or the lesson is a cliché.
-
-**3. Storytelling & Craft (Max 20)**
-- 18-20: vivid imagery, "Show don't tell," cinematic pacing.
-- 14-17: Readable but relies on adjectives ("it was difficult") rather than scenes.
-- <14: Confusing structure or boring list of events.
-
-**4. Originality & Risk (Max 20)**
-- 18-20: Topic or angle I have NEVER seen before.
-- 14-17: Common topic (sports/mission trip) but with a slight twist.
-- <14: The "Costco Rotisserie Chicken" of generic essays (Sports, Dead Pet, Divorce, Moving). **CAP THIS AT 12 POINTS IF GENERIC.**
-
-**5. Prompt Responsiveness (Max 20)**
-- 18-20: Answers the prompt deeply and directly.
-- <14: Ignores the prompt to tell a tangentially related story.
-
-### MANDATORY PENALTIES
-- If the essay is a "Sports Injury" or "Mission Trip" essay: **Max Total Score is 82** (unless it subverts the genre perfectly).
-- If cliches > 3: **Deduct 5 points from total.**
-
-### GRADE CALIBRATION
-- **93+**: Top 1% of applicants. (Requires 19/20 in Originality).
-- **85-92**: Strong, admit-ready.
-- **75-84**: The "Safe Zone." Good grammar, boring content. **MOST ESSAYS ARE HERE.**
-- **< 75**: Weak.
-
-**DO NOT DEFAULT TO 93.** If it feels "fine," give it a 78.
-"""
-
-    user_content = f"""
-Prompt: {prompt_text}
-
-Student Essay:
-{essay}
-
-Analyze and grade based on the component system. 
-Calculate the 'letter_grade' by summing the 5 component scores.
-Output valid JSON:
-{json_schema}
-"""
-    
+
+async def essay_batch_events(items, costs, current_user):
+    """SSE: one `essay` (or `error`) event per essay as it finishes, then a `summary`"""
+    slots = asyncio.Semaphore(ESSAY_BATCH_CONCURRENCY)
+
+    async def grade(index, data):
+        async with slots:
+            try:
+                # queued for saving as soon as it's graded, so its id works right away
+                return index, await run_essay(data, current_user), None
+            except Exception as e:
+                await refund(current_user, costs[index], bucket="batch")
+                return index, None, e
+
+    tasks = [asyncio.create_task(grade(index, data)) for index, data in enumerate(items)]
+    graded, failed = [], 0
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_instruction},
-                {"role": "user", "content": user_content}
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.4, # Keep it low to enforce strict rubric
-            max_tokens=4000,
-            response_format={"type": "json_object"}
-        )
-        
-        feedback_content_str = chat_completion.choices[0].message.content
-        
-        # Parse JSON response
-        try:
-            feedback_json = json.loads(feedback_content_str)
-        except json.JSONDecodeError:
-            feedback_json = {"error": "Invalid JSON", "raw_text": feedback_content_str}
-            
-        # Save to database
+        for next_done in asyncio.as_completed(tasks):
+            index, result, error = await next_done
+            if error is not None:
+                failed += 1
+                detail = (error if isinstance(error, HTTPException) else ai_service_error(error)).detail
+                yield sse_event("error", {"index": index, "detail": detail})
+                continue
+            graded.append(result["feedback"])
+            yield sse_event("essay", {"index": index, "id": result["id"], "feedback": result["feedback"]})
+        yield sse_event("summary", batch_summary(graded, failed))
+    finally:
+        # Client went away mid-batch: stop grading (what's done is already queued)
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/essays/batch")
+async def grade_essay_batch(request: Request, current_user = Depends(get_current_user)):
+    """Grade up to ESSAY_BATCH_MAX essays at once; body is {"essays": [{essay, grade, prompt, parent_id, ...}, ...]}"""
+    data = await request.json()
+    items = data.get("essays")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Missing required field: essays")
+    if len(items) > ESSAY_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Too many essays (max {ESSAY_BATCH_MAX} per batch)")
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise HTTPException(status_code=400, detail=f"essays[{index}] must be an object")
         try:
-            result = supabase.table('essays').insert({
-                'user_id': str(current_user.id),
-                'grade': grade,
-                'prompt': prompt_text,
-                'essay_text': essay,
-                'program': program,
-                'feedback': feedback_content_str 
-            }).execute()
-            
-            return {"feedback": feedback_json, "id": result.data[0]['id']}
-        except Exception as db_error:
-            print(f"Database error: {str(db_error)}")
-            return {"feedback": feedback_json, "warning": "Feedback generated but not saved"}
-            
-    except Exception as e:
-        print(f"Groq API Error: {e}")
+            validate_essay_input(item)
+        except HTTPException as e:
+            raise HTTPException(status_code=400, detail=f"essays[{index}]: {e.detail}")
+        if wants_bypass(data):
+            item["cache"] = "bypass"
+    # the whole set is charged up front, against the separate batch bucket, and each
+    # essay that fails gets its share back (revisions are charged as full grades)
+    costs = [essay_cost(item) for item in items]
+    await charge(current_user, sum(costs), bucket="batch")
+
+    print(f"📚 Batch of {len(items)} essays")
+    return StreamingResponse(
+        essay_batch_events(items, costs, current_user),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Background jobs: same work as /generate and /essay, but the request returns
+# a job id right away and the client polls GET /jobs/{id} for the result.
+job_queue = JobQueue(make_store(), {"roadmap": run_roadmap, "essay": run_essay}, refund=refund)
+
+
+async def submit_job(kind, current_user, data, cost):
+    cost = await charge(current_user, cost)
+    try:
+        job = await job_queue.submit(kind, str(current_user.id), data, cost)
+    except QueueFullError:
+        await refund(current_user, cost)
         raise HTTPException(
-            status_code=500, 
-            detail="AI service temporarily unavailable."
+            status_code=503,
+            detail="Too many requests are waiting. Please try again shortly.",
+            headers={"Retry-After": "30"}
         )
+    except TooManyJobsError:
+        await refund(current_user, cost)
+        raise HTTPException(
+            status_code=429,
+            detail=f"You already have {JOBS_MAX_PENDING_PER_USER} requests in progress"
+        )
+    return JSONResponse(status_code=202, content={"job_id": job["id"], "status": job["status"]})
+
+
+@app.post("/jobs/roadmap")
+async def create_roadmap_job(request: Request, current_user = Depends(get_current_user)):
+    data = await request.json()
+    with timed("roadmap", "validate"):
+        validate_roadmap_input(data)
+    return await submit_job("roadmap", current_user, data, roadmap_cost(data))
+
+
+@app.post("/jobs/essay")
+async def create_essay_job(request: Request, current_user = Depends(get_current_user)):
+    data = await request.json()
+    with timed("essay", "validate"):
+        validate_essay_input(data)
+    parent, _ = await load_parent(data, current_user)
+    return await submit_job("essay", current_user, data, essay_cost(data, parent))
+
+
+# Background job queue depth for monitoring (registered before /jobs/{job_id} so it isn't shadowed)
+@app.get("/jobs/stats", dependencies=[Depends(require_metrics_token)])
+async def get_job_stats():
+    return await job_queue.stats()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user = Depends(get_current_user)):
+    job = await job_queue.get(job_id, str(current_user.id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or unauthorized")
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+def delete_history_row(table, user_id, row_id):
+    """Delete one of the user's saved rows; the result's data is empty if there wasn't one"""
+    return supabase.table(table)\
+        .delete()\
+        .eq('id', row_id)\
+        .eq('user_id', user_id)\
+        .execute()
 
 
 @app.delete("/roadmaps/{roadmap_id}")
 async def delete_roadmap(roadmap_id: str, current_user = Depends(get_current_user)):
+    # Not written yet? Then dropping it from the write queue is the whole delete
+    if await writer.cancel('roadmaps', roadmap_id, str(current_user.id)):
+        return {"message": "Roadmap deleted successfully", "id": roadmap_id}
     try:
         # Verify the roadmap belongs to the user before deleting
-        result = supabase.table('roadmaps')\
-            .delete()\
-            .eq('id', roadmap_id)\
-            .eq('user_id', str(current_user.id))\
-            .execute()
+        result = await asyncio.to_thread(delete_history_row, 'roadmaps', str(current_user.id), roadmap_id)
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Roadmap not found or unauthorized")
@@ -479,38 +851,366 @@ async def delete_roadmap(roadmap_id: str, current_user = Depends(get_current_use
         print(f"Delete error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to delete roadmap")
 
+def in_full(row, base):
+    """The columns that turn a revision stored as a delta against `base` into a full row"""
+    row = expand(row, base)
+    return {'essay_text': row['essay_text'], 'feedback': row['feedback'], 'base_id': None, 'delta': None}
+
+
+def store_dependents_in_full(user_id, essay_id, base):
+    """Before deleting an essay, rewrite the saved revisions stored as deltas against it as full rows"""
+    dependents = supabase.table('essays').select('*').eq('base_id', essay_id).eq('user_id', user_id).execute().data
+    dependents = decode_rows('essays', dependents)
+    for row in dependents:
+        columns = in_full(row, base)
+        columns['feedback'] = encode_document(columns['feedback'])
+        supabase.table('essays')\
+            .update(columns)\
+            .eq('id', row['id'])\
+            .eq('user_id', user_id)\
+            .execute()
+
+
 # Delete a specific essay
 @app.delete("/essays/{essay_id}")
 async def delete_essay(essay_id: str, current_user = Depends(get_current_user)):
+    user_id = str(current_user.id)
     try:
+        base = await asyncio.to_thread(get_history_row, 'essays', user_id, essay_id)
+        if base is None:
+            raise HTTPException(status_code=404, detail="Essay not found or unauthorized")
+        # Revisions stored as deltas against it become full rows first, including
+        # ones still in the write queue or the journal (they'd fail base_id's FK)
+        await writer.rewrite_pending('essays', user_id, lambda row: row.get('base_id') == essay_id,
+                                     lambda row: in_full(row, base))
+        await asyncio.to_thread(store_dependents_in_full, user_id, essay_id, base)
+        # Not written yet? Then dropping it from the write queue is the whole delete
+        if await writer.cancel('essays', essay_id, user_id):
+            return {"message": "Essay deleted successfully", "id": essay_id}
         # Verify the essay belongs to the user before deleting
-        result = supabase.table('essays')\
-            .delete()\
-            .eq('id', essay_id)\
-            .eq('user_id', str(current_user.id))\
-            .execute()
+        result = await asyncio.to_thread(delete_history_row, 'essays', user_id, essay_id)
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Essay not found or unauthorized")
             
         return {"message": "Essay deleted successfully", "id": essay_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Delete error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to delete essay")
+# History list columns. summary=true skips the big document columns
+# (roadmap_content, essay_text, feedback); fetch those one at a time by id.
+HISTORY_SUMMARY_COLUMNS = {
+    'roadmaps': 'id, created_at, grade, gpa, college_goals, location',
+    'essays': 'id, created_at, grade, program, prompt, letter_grade',
+}
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(row):
+    raw = json.dumps([row['created_at'], row['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def list_history(table, user_id, limit=None, cursor=None, summary=False):
+    """Newest-first rows for a user, keyset-paginated on (created_at, id) when a limit is given"""
+    columns = HISTORY_SUMMARY_COLUMNS[table] if summary else '*'
+    query = supabase.table(table).select(columns).eq('user_id', user_id)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+        )
+    query = query.order('created_at', desc=True).order('id', desc=True)
+    if limit:
+        # one extra row tells us whether there's another page
+        query = query.limit(limit + 1)
+    rows = decode_rows(table, query.execute().data)
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def get_history_row(table, user_id, row_id):
+    result = supabase.table(table).select('*').eq('id', row_id).eq('user_id', user_id).limit(1).execute()
+    if result.data:
+        return decode_rows(table, result.data)[0]
+    # saved a moment ago and still in the write-behind queue
+    return writer.pending_row(table, row_id, user_id)
+
+
 # Get user's saved roadmaps
 @app.get("/roadmaps")
-async def get_roadmaps(current_user = Depends(get_current_user)):
+async def get_roadmaps(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    current_user = Depends(get_current_user)
+):
     try:
-        result = supabase.table('roadmaps').select('*').eq('user_id', str(current_user.id)).order('created_at', desc=True).execute()
-        return {"roadmaps": result.data}
+        with timed("history", "db_read"):
+            rows, next_cursor = await asyncio.to_thread(
+                list_history, 'roadmaps', str(current_user.id), limit, cursor, summary
+            )
+        return ORJSONResponse({"roadmaps": rows, "next_cursor": next_cursor})
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
+# Get one saved roadmap with its full content
+@app.get("/roadmaps/{roadmap_id}")
+async def get_roadmap(roadmap_id: str, current_user = Depends(get_current_user)):
+    try:
+        row = await asyncio.to_thread(get_history_row, 'roadmaps', str(current_user.id), roadmap_id)
+    except Exception as e:
+        print(f"Fetch error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load roadmap")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Roadmap not found or unauthorized")
+    return ORJSONResponse({"roadmap": row})
+
+
+# Rewrite one section of a saved roadmap instead of generating a whole new one
+SECTION_NOTE_MAX = 500
+SECTION_MERGE_ATTEMPTS = 5
+
+
+def profile_from_row(row):
+    """The student profile a saved roadmap was made from, keyed like a /generate body"""
+    profile = {field: row.get(field) for field in ROADMAP_FIELDS}
+    profile['collegeGoals'] = row.get('college_goals')
+    return profile
+
+
+def load_roadmap(content):
+    roadmap = decode_document(content)
+    if isinstance(roadmap, str):
+        raise ValueError("roadmap_content isn't JSON")
+    return roadmap
+
+
+def section_expected_tokens(current):
+    """A rewrite comes out about as long as what it replaces"""
+    return len(compact(current)) // 4 + 100
+
+
+def save_section(roadmap_id, user_id, steps, base_value, new_value):
+    """Merge a rewritten section into the latest saved roadmap; returns (roadmap, revision).
+
+    The update only applies if `revision` hasn't moved since we read the row, so
+    two edits racing on the same roadmap can't overwrite each other: the loser
+    re-reads and merges onto the winner's version. If the winner changed this
+    same section, we give up with a 409 rather than silently replace it.
+    """
+    for _ in range(SECTION_MERGE_ATTEMPTS):
+        result = supabase.table('roadmaps')\
+            .select('roadmap_content, revision')\
+            .eq('id', roadmap_id)\
+            .eq('user_id', user_id)\
+            .limit(1)\
+            .execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Roadmap not found or unauthorized")
+        row = result.data[0]
+        roadmap = load_roadmap(row['roadmap_content'])
+        try:
+            unchanged = get_at(roadmap, steps) == base_value
+        except KeyError:
+            unchanged = False
+        if not unchanged:
+            raise HTTPException(
+                status_code=409,
+                detail="This section was changed by another edit. Reload the roadmap and try again."
+            )
+
+        merged = set_at(roadmap, steps, new_value)
+        revision = row.get('revision') or 0
+        updated = supabase.table('roadmaps')\
+            .update({'roadmap_content': encode_document(merged), 'revision': revision + 1})\
+            .eq('id', roadmap_id)\
+            .eq('user_id', user_id)\
+            .eq('revision', revision)\
+            .execute()
+        if updated.data:
+            return merged, revision + 1
+    raise HTTPException(status_code=409, detail="This roadmap is busy being edited. Please try again.")
+
+
+@app.post("/roadmaps/{roadmap_id}/regenerate")
+async def regenerate_roadmap_section(roadmap_id: str, request: Request, current_user = Depends(get_current_user)):
+    """Rewrite one section (e.g. "college_list_suggestions" or "timeline.2") and merge it back in place"""
+    data = await request.json()
+    user_id = str(current_user.id)
+    with timed("roadmap_section", "validate"):
+        try:
+            steps = parse_path(data.get("section"))
+        except SectionPathError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        note = data.get("note")
+        if note is not None and (not isinstance(note, str) or len(note) > SECTION_NOTE_MAX):
+            raise HTTPException(status_code=400, detail=f"note is too long (max {SECTION_NOTE_MAX} characters)")
+    path = ".".join(str(step) for step in steps)
+
+    if writer.pending_row('roadmaps', roadmap_id, user_id) is not None:
+        raise HTTPException(
+            status_code=409,
+            detail="This roadmap is still being saved. Try again in a moment.",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        with timed("history", "db_read"):
+            row = await asyncio.to_thread(get_history_row, 'roadmaps', user_id, roadmap_id)
+    except Exception as e:
+        print(f"Fetch error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load roadmap")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Roadmap not found or unauthorized")
+    try:
+        roadmap = load_roadmap(row['roadmap_content'])
+        current = get_at(roadmap, steps)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="This roadmap can't be edited. Generate a new one instead.")
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"This roadmap has no {path}")
+
+    print(f"✏️ Regenerating {path} of roadmap {roadmap_id}")
+    profile = profile_from_row(row)
+    with timed("roadmap_section", "prompt"):
+        messages = build_section_messages(
+            profile, path, context_without(roadmap, steps),
+            compact(current), compact(shape_at(steps)), note
+        )
+    expected_tokens = section_expected_tokens(current)
+    cost = await charge(current_user, estimate_tokens(messages, expected_tokens))
+    try:
+        with timed("roadmap_section", "completion"):
+            chat_completion = await roadmap_router.complete(
+                messages=messages,
+                temperature=ROADMAP_TEMPERATURE,
+                max_tokens=min(4000, expected_tokens * 3),
+                response_format={"type": "json_object"}
+            )
+    except Exception as e:
+        await refund(current_user, cost)
+        raise ai_service_error(e)
+
+    with timed("roadmap_section", "parse"):
+        try:
+            new_value = json.loads(chat_completion.choices[0].message.content).get("section")
+        except (json.JSONDecodeError, AttributeError):
+            new_value = None
+    if not matches_shape(new_value, shape_at(steps)):
+        print(f"⚠️ AI returned a {path} that doesn't match the schema")
+        await refund(current_user, cost)
+        raise HTTPException(status_code=500, detail="AI service temporarily unavailable.")
+    if steps == ["college_list_suggestions"]:
+        # a single tier can't have schools moved out of it, so only whole lists are checked
+        new_value = check_college_list(new_value, profile)
+
+    try:
+        with timed("roadmaps", "update"):
+            merged, revision = await asyncio.to_thread(save_section, roadmap_id, user_id, steps, current, new_value)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Update error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to save roadmap")
+    return {"roadmap": merged, "id": roadmap_id, "section": path, "data": new_value, "revision": revision}
+
+def expand_essays(user_id, rows):
+    """Fill in the text and feedback of revisions stored as deltas, fetching their bases in one query"""
+    needed = {row['base_id'] for row in rows if row.get('delta') is not None}
+    bases = {row['id']: row for row in rows if row['id'] in needed}
+    missing = needed - set(bases)
+    if missing:
+        found = supabase.table('essays').select('*').eq('user_id', user_id)\
+            .or_(",".join(f'id.eq."{base_id}"' for base_id in sorted(missing))).execute().data
+        decode_rows('essays', found)
+        bases.update({row['id']: row for row in found})
+        for base_id in missing - set(bases):
+            pending = writer.pending_row('essays', base_id, user_id)
+            if pending is not None:
+                bases[base_id] = pending
+    return [expand(row, bases.get(row.get('base_id'))) for row in rows]
+
+
 # Get user's saved essays
 @app.get("/essays")
-async def get_essays(current_user = Depends(get_current_user)):
+async def get_essays(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    current_user = Depends(get_current_user)
+):
     try:
-        result = supabase.table('essays').select('*').eq('user_id', str(current_user.id)).order('created_at', desc=True).execute()
-        return {"essays": result.data}
+        with timed("history", "db_read"):
+            rows, next_cursor = await asyncio.to_thread(
+                list_history, 'essays', str(current_user.id), limit, cursor, summary
+            )
+        if not summary:
+            rows = await asyncio.to_thread(expand_essays, str(current_user.id), rows)
+        return ORJSONResponse({"essays": rows, "next_cursor": next_cursor})
+    except HTTPException:
+        raise
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+# Get one saved essay with its full text and feedback
+@app.get("/essays/{essay_id}")
+async def get_essay(essay_id: str, current_user = Depends(get_current_user)):
+    try:
+        row, _ = await asyncio.to_thread(load_essay, str(current_user.id), essay_id)
+    except Exception as e:
+        print(f"Fetch error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to load essay")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Essay not found or unauthorized")
+    return ORJSONResponse({"essay": row})
+
+
+# Response cache hit/miss counters for monitoring
+@app.get("/cache/stats", dependencies=[Depends(require_metrics_token)])
+async def get_cache_stats():
+    return response_cache.stats()
+
+# Prometheus scrape target: stage histograms, per-route latency, token counts
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+# Rate limiter backend and allow/deny counts
+@app.get("/ratelimit/stats", dependencies=[Depends(require_metrics_token)])
+async def get_ratelimit_stats():
+    return rate_limiter.stats()
+
+# Per-model latency, error rate and circuit state
+@app.get("/router/stats", dependencies=[Depends(require_metrics_token)])
+async def get_router_stats():
+    return {"roadmap": roadmap_router.stats(), "essay": essay_router.stats()}
+
+# Write-behind queue depth and journal size for monitoring
+@app.get("/persistence/stats", dependencies=[Depends(require_metrics_token)])
+async def get_persistence_stats():
+    return writer.stats()
+
+# Readiness probe for the load balancer / orchestrator: 503 until startup has finished
+@app.get("/ready")
+async def get_ready():
+    if not ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import resource
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+
+# Where the time goes in a request: each pipeline stage (auth, validation,
+# prompt build, completion, parse, insert) is a Prometheus histogram served at
+# /metrics. With SERVER_TIMING=true the stages of a request are also sent back
+# in a Server-Timing header so they show up in the browser's network tab.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false") == "true"
+# Set this to a writable dir when running several uvicorn workers so /metrics adds them up
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# How often each worker checks its event loop is keeping up (0 turns it off)
+EVENT_LOOP_MONITOR_INTERVAL = float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL", "0.25"))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 20, 40, 80)
+
+STAGE_SECONDS = Histogram(
+    "app_stage_seconds", "Time spent in one stage of a request pipeline",
+    ["pipeline", "stage"], buckets=LATENCY_BUCKETS,
+)
+HTTP_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time until the response starts, by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported in completion usage", ["model", "kind"])
+STRUCTURED_OUTPUTS = Counter(
+    "llm_structured_output_total",
+    "Model answers by how they came to fit the schema: valid, repaired (locally), refilled (by a follow-up call), failed",
+    ["kind", "outcome"],
+)
+
+# Per worker process (labelled with its pid), so a blocked loop or a leaking
+# worker stands out instead of being averaged away
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a task that asked to sleep, per worker",
+    ["worker"], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PROCESS_RSS = Gauge(
+    "process_rss_bytes", "Resident memory of a worker process", ["worker"], multiprocess_mode="max",
+)
+
+_timings = ContextVar("stage_timings", default=None)
+# .labels() takes a lock and builds a key on every call, so look each series up once
+_stage_children = {}
+_http_children = {}
+
+
+class timed:
+    """`with timed("roadmap", "parse"):` observes the block's duration for that stage"""
+
+    __slots__ = ("pipeline", "stage", "start")
+
+    def __init__(self, pipeline, stage):
+        self.pipeline = pipeline
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.pipeline, self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def observe(pipeline, stage, seconds):
+    child = _stage_children.get((pipeline, stage))
+    if child is None:
+        child = _stage_children[(pipeline, stage)] = STAGE_SECONDS.labels(pipeline, stage)
+    child.observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((f"{pipeline}.{stage}", seconds))
+
+
+def record_usage(model, usage, first_token=True):
+    """Token counts from a completion's usage.
+
+    Non-streamed calls have no first token we can time, so Groq's own
+    queue + prompt time stands in for time-to-first-token when it's reported.
+    """
+    if usage is None:
+        return
+    LLM_TOKENS.labels(model, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels(model, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+    queue_time = getattr(usage, "queue_time", None)
+    prompt_time = getattr(usage, "prompt_time", None)
+    if first_token and queue_time is not None and prompt_time is not None:
+        observe("llm", "first_token", queue_time + prompt_time)
+
+
+def record_output(kind, outcome):
+    STRUCTURED_OUTPUTS.labels(kind, outcome).inc()
+
+
+def rss_bytes():
+    """Current resident memory, or the peak where /proc isn't available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def monitor_event_loop(interval=EVENT_LOOP_MONITOR_INTERVAL):
+    """Sleep `interval` over and over and record how late each wake-up was; anything
+    that blocks the loop (sync I/O, heavy JSON) shows up here. Runs until cancelled."""
+    worker = str(os.getpid())
+    lag = EVENT_LOOP_LAG.labels(worker)
+    rss = PROCESS_RSS.labels(worker)
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag.observe(max(0.0, loop.time() - start - interval))
+        rss.set(rss_bytes())
+
+
+def server_timing(timings, limit=20):
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings[:limit])
+
+
+def render():
+    """Body and content type for GET /metrics"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware: per-route latency histogram plus the optional Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                key = (scope["method"], route.path if route else "unmatched", message["status"])
+                child = _http_children.get(key)
+                if child is None:
+                    child = _http_children[key] = HTTP_SECONDS.labels(*key)
+                child.observe(time.perf_counter() - start)
+                if SERVER_TIMING:
+                    timings.append(("total", time.perf_counter() - start))
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", server_timing(timings).encode())
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
@@ -0,0 +1,23 @@
+-- Run in the Supabase SQL editor before deploying the paginated history endpoints.
+
+-- Keyset pagination walks (created_at, id) newest-first per user
+create index if not exists roadmaps_user_created_id_idx
+    on roadmaps (user_id, created_at desc, id desc);
+create index if not exists essays_user_created_id_idx
+    on essays (user_id, created_at desc, id desc);
+
+-- Summary lists show the grade without shipping the whole feedback document
+alter table essays add column if not exists letter_grade integer;
+
+-- Backfill from existing feedback; rows whose feedback isn't valid JSON stay null
+create or replace function pg_temp.try_letter_grade(feedback text) returns integer as $$
+begin
+    return round((feedback::jsonb ->> 'letter_grade')::numeric);
+exception when others then
+    return null;
+end;
+$$ language plpgsql;
+
+update essays
+   set letter_grade = pg_temp.try_letter_grade(feedback::text)
+ where letter_grade is null;
@@ -0,0 +1,5 @@
+-- Run in the Supabase SQL editor before deploying the prompt templates.
+
+-- Which prompt template produced each row (e.g. roadmap-v2); older rows stay null
+alter table roadmaps add column if not exists prompt_version text;
+alter table essays add column if not exists prompt_version text;
@@ -0,0 +1,6 @@
+-- Run in the Supabase SQL editor before deploying section regeneration.
+
+-- Bumped on every in-place edit of roadmap_content; POST /roadmaps/{id}/regenerate
+-- only writes if the revision it read is still current, so racing edits can't
+-- overwrite each other
+alter table roadmaps add column if not exists revision integer not null default 0;
@@ -0,0 +1,17 @@
+-- Run in the Supabase SQL editor before deploying schema-validated output.
+
+-- Roadmaps and essay feedback are stored as parsed JSON documents instead of
+-- the model's raw text, so reads return objects and nothing is re-parsed.
+-- Old rows that never parsed keep their text under "raw".
+create or replace function pg_temp.try_jsonb(content text) returns jsonb as $$
+begin
+    return content::jsonb;
+exception when others then
+    return jsonb_build_object('error', 'Invalid JSON', 'raw', content);
+end;
+$$ language plpgsql;
+
+alter table roadmaps
+    alter column roadmap_content type jsonb using pg_temp.try_jsonb(roadmap_content::text);
+alter table essays
+    alter column feedback type jsonb using pg_temp.try_jsonb(feedback::text);
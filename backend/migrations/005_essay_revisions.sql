@@ -0,0 +1,13 @@
+-- Run in the Supabase SQL editor before deploying essay revisions.
+
+-- A resubmitted draft points at the essay it revises (parent_id). To save space
+-- it's stored as a delta (delta) against the nearest draft saved in full
+-- (base_id), with essay_text and feedback left null; the API rebuilds them.
+alter table essays add column if not exists parent_id uuid references essays(id) on delete set null;
+alter table essays add column if not exists base_id uuid references essays(id);
+alter table essays add column if not exists delta jsonb;
+alter table essays alter column essay_text drop not null;
+alter table essays alter column feedback drop not null;
+
+-- Deleting an essay first rewrites the revisions based on it as full rows
+create index if not exists essays_base_id_idx on essays (base_id) where base_id is not null;
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import httpx
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
+
+from metrics import timed
+
+# Saves happen after the response goes out: handlers hand rows to a background
+# writer that batches inserts, retries, and spools to a local journal when
+# Supabase can't be reached, so a generated roadmap/essay is never just dropped.
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "50"))
+PERSIST_BATCH_WINDOW = float(os.getenv("PERSIST_BATCH_WINDOW", "0.25"))
+PERSIST_MAX_ATTEMPTS = int(os.getenv("PERSIST_MAX_ATTEMPTS", "4"))
+PERSIST_JOURNAL_PATH = os.getenv("PERSIST_JOURNAL_PATH", "persist_journal.db")
+PERSIST_JOURNAL_RETRY_SECONDS = float(os.getenv("PERSIST_JOURNAL_RETRY_SECONDS", "60"))
+# A tombstone outlives any write of its row that was already under way, then goes
+TOMBSTONE_GRACE_SECONDS = 300
+
+# Supabase unreachable, as opposed to it rejecting a particular row
+OUTAGE_ERRORS = (httpx.TransportError, ConnectionError, TimeoutError)
+
+
+class Journal:
+    """Local SQLite spool for rows that couldn't be written to Supabase, plus
+    tombstones for rows deleted while they might still be on their way there"""
+
+    def __init__(self, path=PERSIST_JOURNAL_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_rows (
+                id TEXT PRIMARY KEY,
+                table_name TEXT NOT NULL,
+                row_json TEXT NOT NULL,
+                spooled_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tombstones (
+                id TEXT PRIMARY KEY,
+                table_name TEXT NOT NULL,
+                buried_at REAL NOT NULL
+            )
+        """)
+
+    def spool(self, table, rows):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pending_rows (id, table_name, row_json, spooled_at) VALUES (?, ?, ?, ?)",
+                [(row['id'], table, json.dumps(row), time.time()) for row in rows],
+            )
+
+    def load(self):
+        """Spooled rows grouped by table"""
+        grouped = {}
+        with self.lock:
+            found = self.conn.execute("SELECT table_name, row_json FROM pending_rows ORDER BY spooled_at").fetchall()
+        for table, row_json in found:
+            grouped.setdefault(table, []).append(json.loads(row_json))
+        return grouped
+
+    def get(self, table, row_id):
+        with self.lock:
+            found = self.conn.execute(
+                "SELECT row_json FROM pending_rows WHERE id = ? AND table_name = ?", (row_id, table)
+            ).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def forget(self, rows):
+        with self.lock:
+            self.conn.executemany("DELETE FROM pending_rows WHERE id = ?", [(row['id'],) for row in rows])
+
+    def bury(self, table, row_ids):
+        """Drop rows from the spool and remember they were deleted, in case a write of them is under way"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("DELETE FROM pending_rows WHERE id = ?", [(row_id,) for row_id in row_ids])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO tombstones (id, table_name, buried_at) VALUES (?, ?, ?)",
+                    [(row_id, table, now) for row_id in row_ids],
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def tombstones(self):
+        """[(table, id, buried_at)]"""
+        with self.lock:
+            return self.conn.execute("SELECT table_name, id, buried_at FROM tombstones").fetchall()
+
+    def unbury(self, row_ids):
+        with self.lock:
+            self.conn.executemany("DELETE FROM tombstones WHERE id = ?", [(row_id,) for row_id in row_ids])
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pending_rows").fetchone()[0]
+
+
+class PersistenceQueue:
+    """Write-behind inserts for the roadmaps and essays tables"""
+
+    def __init__(self, get_client, journal_path=PERSIST_JOURNAL_PATH, encode_row=None):
+        self.get_client = get_client
+        # (table, row) -> row as stored; runs in the insert thread, off the event loop
+        self.encode_row = encode_row
+        self.journal_path = journal_path
+        self.journal = None
+        self.queue = None
+        self.pending = {}   # id -> (table, row) until it's written or spooled
+        self.in_flight = set()   # ids whose insert is under way
+        self.tombstones = {}   # id -> table: deleted while in flight, so delete it once the insert lands
+        self.tasks = []
+        self.saved = 0
+        self.spooled = 0
+
+    def enqueue(self, table, row):
+        """Queue a row for insert and return its (client-side) id right away"""
+        return self.enqueue_many(table, [row])[0]
+
+    def enqueue_many(self, table, rows):
+        """Queue rows that should land in one insert; returns their ids in order"""
+        rows = [dict(row) for row in rows]
+        for row in rows:
+            row.setdefault('id', str(uuid.uuid4()))
+            self.pending[row['id']] = (table, row)
+        self.queue.put_nowait((table, rows))
+        return [row['id'] for row in rows]
+
+    def pending_row(self, table, row_id, user_id):
+        """A row that's been accepted but not written yet (queued, mid-insert or in the
+        journal), so reads right after a save, or during an outage, still find it"""
+        entry = self.pending.get(row_id)
+        if entry and entry[0] == table and entry[1].get('user_id') == user_id:
+            return entry[1]
+        if entry is None and self.journal is not None:
+            row = self.journal.get(table, row_id)
+            if row is not None and row.get('user_id') == user_id:
+                return row
+        return None
+
+    async def cancel(self, table, row_id, user_id):
+        """Delete a not-yet-written row. A queued row is just dropped; one whose insert
+        is under way gets a tombstone and is deleted from Supabase once it lands;
+        a journaled one is taken out of the journal so replay never writes it."""
+        entry = self.pending.get(row_id)
+        if entry and entry[0] == table and entry[1].get('user_id') == user_id:
+            del self.pending[row_id]
+            if row_id in self.in_flight:
+                self.tombstones[row_id] = table
+            return True
+        if entry is None and self.journal is not None:
+            row = await asyncio.to_thread(self.journal.get, table, row_id)
+            if row is not None and row.get('user_id') == user_id:
+                await asyncio.to_thread(self.journal.bury, table, [row_id])
+                return True
+        return False
+
+    async def rewrite_pending(self, table, user_id, match, rewrite):
+        """Apply `rewrite` (row -> changed columns) to this user's not-yet-written rows that
+        `match`, queued or journaled. Matching rows mid-insert are waited out first, so
+        when this returns each one is either in Supabase or has been rewritten here."""
+        def matching():
+            return [row for row_table, row in list(self.pending.values())
+                    if row_table == table and row.get('user_id') == user_id and match(row)]
+
+        while any(row['id'] in self.in_flight for row in matching()):
+            await asyncio.sleep(0.05)
+        # queued rows are the same dicts the drain will write, so they change in place
+        for row in matching():
+            row.update(rewrite(row))
+        journaled = [row for row in (await asyncio.to_thread(self.journal.load)).get(table, [])
+                     if row.get('user_id') == user_id and match(row)]
+        for row in journaled:
+            row.update(rewrite(row))
+        if journaled:
+            await asyncio.to_thread(self.journal.spool, table, journaled)
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.journal = Journal(self.journal_path)
+        self.tasks = [
+            asyncio.create_task(self._drain()),
+            asyncio.create_task(self._replay_journal_forever()),
+        ]
+
+    async def stop(self, timeout=10.0):
+        """Flush what's queued; whatever can't be written in time goes to the journal"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        # pending covers both queued rows and a batch that was mid-write
+        leftovers = {}
+        for table, row in list(self.pending.values()):
+            leftovers.setdefault(table, []).append(row)
+        for table, rows in leftovers.items():
+            try:
+                await asyncio.wait_for(self._write(table, rows, attempts=1), timeout=timeout)
+                self._done(rows)
+            except Exception:
+                await self._spool(table, rows)
+        # a cancelled insert may still land; the next process's replay deletes these
+        for row_id, table in list(self.tombstones.items()):
+            await asyncio.to_thread(self.journal.bury, table, [row_id])
+        self.tombstones.clear()
+
+    async def _drain(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + PERSIST_BATCH_WINDOW
+            while sum(len(rows) for _, rows in batch) < PERSIST_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            by_table = {}
+            for table, rows in batch:
+                for row in rows:
+                    if row['id'] in self.pending:   # skip rows deleted while queued
+                        by_table.setdefault(table, []).append(row)
+            for table, rows in by_table.items():
+                saved, failed = await self._save(table, rows)
+                self._done(saved)
+                if failed:
+                    print(f"Spooling {len(failed)} {table} rows")
+                    await self._spool(table, failed)
+
+    async def _save(self, table, rows, attempts=PERSIST_MAX_ATTEMPTS):
+        """(saved, failed) rows. If the batch is rejected, its rows are tried one at a
+        time so one bad row can't sink the rest; rows deleted meanwhile are deleted again."""
+        ids = [row['id'] for row in rows]
+        self.in_flight.update(ids)
+        saved, failed = [], []
+        try:
+            try:
+                await self._write(table, rows, attempts)
+                saved = rows
+            except Exception as e:
+                print(f"Database error: {str(e)} ({len(rows)} {table} rows)")
+                if len(rows) == 1 or isinstance(e, OUTAGE_ERRORS):
+                    failed = rows
+                else:
+                    for i, row in enumerate(rows):
+                        try:
+                            await self._write(table, [row], attempts=1)
+                            saved.append(row)
+                        except Exception as e:
+                            print(f"Database error: {str(e)} ({table} row {row['id']})")
+                            if isinstance(e, OUTAGE_ERRORS):
+                                failed.extend(rows[i:])
+                                break
+                            failed.append(row)
+        finally:
+            self.in_flight.difference_update(ids)
+        doomed = [row['id'] for row in saved if self.tombstones.pop(row['id'], None)]
+        if doomed:
+            try:
+                await self._delete(table, doomed)
+            except Exception as e:
+                print(f"Database error: {str(e)} (deleting {len(doomed)} {table} rows later)")
+                await asyncio.to_thread(self.journal.bury, table, doomed)
+        for row in failed:
+            # deleted mid-insert and the insert didn't land: nothing to spool or delete
+            self.tombstones.pop(row['id'], None)
+        return saved, failed
+
+    async def _write(self, table, rows, attempts=PERSIST_MAX_ATTEMPTS):
+        # Upsert on the client-side id so a retry after a lost response can't double-insert
+        def insert():
+            stored = [self.encode_row(table, row) for row in rows] if self.encode_row else rows
+            return self.get_client().table(table).upsert(
+                stored, on_conflict='id', ignore_duplicates=True
+            ).execute()
+
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(attempts),
+            wait=wait_exponential(multiplier=0.5, max=10),
+            reraise=True,
+        ):
+            with attempt, timed(table, "insert"):
+                await asyncio.to_thread(insert)
+
+    async def _delete(self, table, row_ids):
+        def delete():
+            return self.get_client().table(table).delete()\
+                .or_(",".join(f'id.eq."{row_id}"' for row_id in row_ids)).execute()
+        await asyncio.to_thread(delete)
+
+    def _done(self, rows):
+        for row in rows:
+            self.pending.pop(row['id'], None)
+        self.saved += len(rows)
+
+    async def _spool(self, table, rows):
+        # rows deleted while their insert was failing don't need saving
+        rows = [row for row in rows if row['id'] in self.pending]
+        await asyncio.to_thread(self.journal.spool, table, rows)
+        # one deleted while it was being spooled comes back out (pending_row found it until now)
+        deleted = [row['id'] for row in rows if row['id'] not in self.pending]
+        if deleted:
+            await asyncio.to_thread(self.journal.bury, table, deleted)
+        for row in rows:
+            self.pending.pop(row['id'], None)
+        self.spooled += len(rows) - len(deleted)
+
+    async def replay_journal(self):
+        """Try to write everything in the journal; rows that still fail stay there.
+        Then delete rows that were deleted while a write of them may have been under way."""
+        replayed = 0
+        for table, rows in (await asyncio.to_thread(self.journal.load)).items():
+            saved, _ = await self._save(table, rows, attempts=1)
+            if saved:
+                await asyncio.to_thread(self.journal.forget, saved)
+                replayed += len(saved)
+        if replayed:
+            print(f"💾 Replayed {replayed} journaled rows")
+        await self._sweep_tombstones()
+        return replayed
+
+    async def _sweep_tombstones(self):
+        tombstones = await asyncio.to_thread(self.journal.tombstones)
+        by_table = {}
+        for table, row_id, buried_at in tombstones:
+            by_table.setdefault(table, []).append((row_id, buried_at))
+        settled = []
+        for table, entries in by_table.items():
+            try:
+                await self._delete(table, [row_id for row_id, _ in entries])
+            except Exception as e:
+                print(f"Tombstone sweep for {table} failed: {str(e)}")
+                continue
+            settled += [row_id for row_id, buried_at in entries if buried_at < time.time() - TOMBSTONE_GRACE_SECONDS]
+        if settled:
+            await asyncio.to_thread(self.journal.unbury, settled)
+
+    async def _replay_journal_forever(self):
+        while True:
+            await self.replay_journal()
+            await asyncio.sleep(PERSIST_JOURNAL_RETRY_SECONDS)
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize() if self.queue else 0,
+            "pending": len(self.pending),
+            "in_flight": len(self.in_flight),
+            "saved": self.saved,
+            "spooled": self.spooled,
+            "journal": len(self.journal) if self.journal else 0,
+        }
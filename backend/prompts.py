@@ -0,0 +1,483 @@
+import json
+from datetime import datetime
+
+from analysis import analyze_essay, analyze_paragraph, sentences
+from colleges import candidates_note, states_for
+
+# Prompts are split into a static prefix (rubric, rules, JSON schema) that is
+# built once at import and is byte-identical on every request, and a small
+# per-request suffix with just the student's details. Keeping the shared part
+# first lets the provider's prompt cache reuse it instead of re-reading ~1.5k
+# tokens every call.
+
+
+class PromptTemplate:
+    """A static system prefix plus a str.format() suffix for the per-request fields"""
+
+    def __init__(self, version, system, suffix):
+        # Bump the version whenever the text changes; it's part of the response
+        # cache key and gets saved with each row so we know which prompt made it
+        self.version = version
+        self.system = system
+        self.suffix = suffix
+
+    def messages(self, **fields):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.suffix.format(**fields)},
+        ]
+
+
+ROADMAP_SCHEMA = """
+    {
+      "student_summary": "A warm, personalized paragraph summarizing their profile and unique strengths.",
+      "college_list_suggestions": {
+         "reach": ["School A with specific major/program", "School B with specific major/program", "School C with specific major/program"],
+         "target": ["School C with specific major/program", "School D with specific major/program", "School E with specific major/program"],
+         "safety": ["School E with specific major/program", "School F with specific major/program", "School N with specific major/program"]
+      },
+      "academic_plan": {
+         "course_suggestions": ["Specific Course Name (e.g., 'AP Calculus BC' not 'math class')", "Specific Course Name"],
+         "testing_strategy": "Specific, actionable advice with target scores, test dates, and preparation timeline"
+      },
+      "extracurriculars": {
+         "current_optimization": "Specific, actionable steps to improve existing activities with measurable outcomes",
+         "new_opportunities": ["Specific opportunity name with why it fits (e.g., 'Join Model UN - builds public speaking skills needed for Political Science')", "Specific opportunity 2"]
+      },
+      "timeline": [
+        {
+          "period": "Specific Season/Year (e.g., 'Fall 2025' not 'next semester')", 
+          "focus": "Specific main theme/goal for this period",
+          "tasks": ["Specific, actionable task with deadline or timeframe (e.g., 'Register for PSAT by September 15th' not 'take a test')", "Another specific task"]
+        }
+      ]
+    }
+    """
+
+ROADMAP_GUIDELINES = """
+    1. TIMELINE CONTEXT: Use the current date and timeline note given with the student profile.
+    2. MANDATORY SECTIONS: Fill every field in the JSON schema.
+    
+    3. SPECIFICITY REQUIREMENTS - CRITICAL:
+       - All tasks must be SPECIFIC and ACTIONABLE. Use concrete actions, not vague suggestions.
+       - Good task: "Register for October PSAT by September 15th through CollegeBoard website"
+       - Bad task: "Take a test" or "Study more" or "Do well in school"
+       - Include WHO, WHAT, WHEN, WHERE, and HOW when relevant.
+       - Each task should have a clear, measurable outcome.
+       
+    4. GOAL SPECIFICITY:
+       - Course suggestions must include full course names (e.g., "AP Computer Science A" not "a CS class").
+       - College suggestions should include the specific major/program (e.g., "MIT - Computer Science and Engineering" not just "MIT").
+       - Timeline periods must be specific (e.g., "Fall 2025 - 11th Grade" not "next fall").
+       - Testing strategy must include target scores, specific test dates, and preparation methods.
+       
+    5. LOCATION STRATEGY: 
+       - User Preference: the Location Preference in the student profile.
+       - Prioritize schools in this region with specific major matches.
+       - When suggesting schools outside the region, explicitly state why (e.g., "UC Berkeley - #1 in Computer Science, worth considering despite being out of state").
+    
+    6. SCHOOL LIST REALISM AND SPECIFICITY:
+       - Ensure "Safety" schools are actually safe (typically >50% acceptance or local options).
+       - Include specific major/program for each school (e.g., "Arizona State University - Computer Science" not just "ASU").
+       - Be cautious with competitive majors. For example, CS at UIUC or UW is very hard, so they are "Targets" or "Reaches" not Safeties.
+       - For Art majors, RISD or CalArts are Reaches. Suggest specific state schools with good art programs for Safeties.
+       - Include 2-3 schools per category (Reach, Target, Safety) for optimal balance.
+       
+    7. TESTING STRATEGY SPECIFICITY:
+       - If they are young (9th/10th), provide specific test names (PSAT/NMSQT), registration deadlines, and target scores.
+       - If older, provide specific SAT/ACT test dates, registration deadlines, and score goals.
+       - Include preparation method recommendations (e.g., "Take 3 practice tests using Khan Academy before October SAT").
+       - If test-optional, explain which schools accept this and when they might still want to test.
+       
+    8. EXTRACURRICULAR SPECIFICITY:
+       - "Current Optimization" should include 2-3 specific, actionable steps to improve existing activities.
+       - "New Opportunities" should name specific clubs/organizations and explain why they fit the student's profile.
+       - Include leadership opportunities when applicable (e.g., "Run for Debate Team Captain in November").
+       
+    9. TIMELINE TASK SPECIFICITY:
+       - Each timeline task must include:
+         * Specific action verb (Register, Complete, Apply, Join, etc.)
+         * What exactly to do (course name, test name, program name)
+         * When (deadline or timeframe)
+         * Optional: Where (website, location) or How (method)
+       - Tasks should be sequenced logically (prerequisites first, then next steps).
+       - Include deadlines for time-sensitive items (application deadlines, test registration dates).
+       
+    10. HOLISTIC PROFILE CONNECTIONS:
+       - Identify connections between interests and suggest interdisciplinary paths.
+       - Example: Art + Biology → Medical Illustration, recommend specific programs.
+       - Make connections explicit in the student_summary or task descriptions.
+    """
+
+ROADMAP_PROFILE = (
+    "Student Profile:\n"
+    "- Grade: {grade}\n"
+    "- GPA: {gpa}\n"
+    "- Interests: {interests}\n"
+    "- Activities: {activities}\n"
+    "- Demographics: {demographics}\n"
+    "- Testing Status: {testing}\n"
+    "- College Goals: {goals}\n"
+    "- Location Preference: {location}\n"
+    "- Course Rigor: {classes}\n\n"
+    "Timeline context: Current date is {current_date}. {duration_note}"
+)
+
+ROADMAP_TEMPLATE = PromptTemplate(
+    "roadmap-v3",
+    system=(
+        'You are a JSON-only API. You must return valid JSON with all requested fields.\n'
+        '\n'
+        'You are a supportive, detail-oriented college admissions mentor. Generate a highly specific, actionable JSON roadmap for the student profile in the user message.\n'
+        '\n'
+        '### CRITICAL REQUIREMENTS FOR SPECIFICITY\n'
+        'Every output must be SPECIFIC and ACTIONABLE. Avoid vague suggestions.\n'
+        '\n'
+        'EXAMPLES OF GOOD VS BAD:\n'
+        "- ❌ BAD: 'Take the SAT'\n"
+        "- ✅ GOOD: 'Register for October 7th SAT by September 8th via CollegeBoard.org. Aim for 1450+ based on their current GPA.'\n"
+        '\n'
+        "- ❌ BAD: 'Join some clubs'\n"
+        "- ✅ GOOD: 'Apply to Model UN by September 20th. This builds public speaking skills aligned with your Political Science interest.'\n"
+        '\n'
+        "- ❌ BAD: 'Study for tests'\n"
+        "- ✅ GOOD: 'Complete 3 full-length SAT practice tests using Khan Academy (one per week in September). Review wrong answers thoroughly.'\n"
+        '\n'
+        '### STRATEGIC GUIDELINES\n'
+        + ROADMAP_GUIDELINES + "\n\n"
+        "### OUTPUT INSTRUCTIONS\n"
+        "You must output valid JSON using the exact schema below. Fill in EVERY field with SPECIFIC, DETAILED information.\n"
+        "Remember: Specificity is key. Each task, suggestion, and recommendation should be concrete and actionable.\n"
+        + ROADMAP_SCHEMA
+    ),
+    # {candidates} is the shortlist from colleges.candidates_note (empty if there isn't one)
+    suffix=ROADMAP_PROFILE + "{candidates}",
+)
+
+
+def timeline_note(grade):
+    """How far out the timeline should run for this grade"""
+    if "9" in str(grade) or "freshman" in str(grade).lower():
+        return "Start NOW. Cover 9th and 10th grade in semesters, then 11th/12th in detail."
+    elif "10" in str(grade) or "sophomore" in str(grade).lower():
+        return "Start NOW. Cover the rest of 10th, all of 11th, and end at Jan of 12th Grade."
+    elif "11" in str(grade) or "junior" in str(grade).lower():
+        return "Start NOW. Cover 11th Spring/Summer and 12th Fall/Winter in detail."
+    return "Start NOW. Focus on Senior Winter/Spring transition to college."
+
+
+def profile_fields(data, now=None):
+    """Format fields for ROADMAP_PROFILE from a validated student profile"""
+    now = now or datetime.now()
+    return {
+        "grade": data.get("grade"),
+        "gpa": data.get("gpa"),
+        "interests": data.get("interests"),
+        "activities": data.get("activities"),
+        "demographics": data.get("demographics"),
+        "testing": data.get("testing"),
+        "goals": data.get("collegeGoals"),
+        "location": data.get("location"),
+        "classes": data.get("classes"),
+        "current_date": now.strftime("%B %Y"),
+        "duration_note": timeline_note(data.get("grade")),
+    }
+
+
+def build_roadmap_messages(data, now=None):
+    """Chat messages for a validated student profile"""
+    return ROADMAP_TEMPLATE.messages(candidates=candidates_note(data), **profile_fields(data, now))
+
+
+# Rewriting one part of a saved roadmap. The model gets the profile, the rest
+# of the roadmap as compact JSON (so the new part stays consistent with it) and
+# only the schema for the part being rewritten, and writes back just that part.
+ROADMAP_SECTION_TEMPLATE = PromptTemplate(
+    "roadmap-section-v2",
+    system=(
+        'You are a JSON-only API. You must return valid JSON.\n'
+        '\n'
+        'You are a supportive, detail-oriented college admissions mentor. A student already has the '
+        'college roadmap shown in the user message and wants ONE part of it rewritten. Write a new '
+        'version of only that part. It must fit the rest of the roadmap and follow the same guidelines '
+        'the roadmap was written with, and it should be a genuinely different take from the current '
+        'version, taking the student\'s note into account when there is one.\n'
+        '\n'
+        '### STRATEGIC GUIDELINES\n'
+        + ROADMAP_GUIDELINES + "\n\n"
+        "### OUTPUT INSTRUCTIONS\n"
+        'Output a JSON object with a single key, "section", whose value matches the schema given in '
+        "the user message exactly. Do not include any other part of the roadmap.\n"
+    ),
+    suffix=(
+        ROADMAP_PROFILE + "{candidates}\n\n"
+        "Rest of the roadmap (context only, do not repeat it):\n{context}\n\n"
+        "Section to rewrite: {path}\n"
+        "Current version:\n{current}\n"
+        "Student's note: {note}\n\n"
+        "Schema for the new value of {path}:\n{schema}\n"
+    ),
+)
+
+
+def build_section_messages(profile, path, context, current, schema, note=None, now=None):
+    """Chat messages for rewriting the roadmap part at `path` (e.g. "timeline.2")"""
+    candidates = ""
+    if path.startswith("college_list_suggestions"):
+        # a note like "more schools in Texas" picks the shortlist's region instead of the profile
+        if note and states_for(note):
+            profile = {**profile, "location": note}
+        candidates = candidates_note(profile)
+    return ROADMAP_SECTION_TEMPLATE.messages(
+        path=path,
+        candidates=candidates,
+        context=context,
+        current=current,
+        note=note or "(none)",
+        schema=schema,
+        **profile_fields(profile, now),
+    )
+
+
+# The part of the feedback schema a revision re-grades (see ESSAY_REVISION_SCHEMA)
+ESSAY_SCORES_SCHEMA = """
+      "pre_grading_analysis": {
+        "additional_cliches": ["Only cliches the local analysis missed, usually none"],
+        "is_generic_topic": true,
+        "predicted_impact": "Will the reader yawn or cry?"
+      },
+      "scoring_breakdown": {
+        "voice_and_authenticity": { "score": 15, "max": 20, "reason": "..." },
+        "insight_and_growth": { "score": 15, "max": 20, "reason": "..." },
+        "storytelling_and_craft": { "score": 15, "max": 20, "reason": "..." },
+        "originality_and_risk": { "score": 15, "max": 20, "reason": "..." },
+        "prompt_responsiveness": { "score": 15, "max": 20, "reason": "..." }
+      },
+      "letter_grade": 75,
+      "summary_badge": "Generic & Safe | Risky & Raw | Polished but Boring | Exceptional","""
+
+ESSAY_SCHEMA = """
+    {""" + ESSAY_SCORES_SCHEMA + """
+      "key_strengths": ["Strength 1", "Strength 2"],
+      "areas_for_improvement": ["Fix 1", "Fix 2"],
+      "final_summary": "Summary...",
+      "detailed_action_plan": "Specific next steps..."
+    }
+    """
+
+ESSAY_REVISION_SCHEMA = """
+    {""" + ESSAY_SCORES_SCHEMA + """
+      "revision_notes": "One or two sentences on what the revision made better or worse",
+      "key_strengths": ["Only if they changed; leave the key out to keep the previous ones"],
+      "areas_for_improvement": ["Only if they changed"],
+      "final_summary": "Only if it changed",
+      "detailed_action_plan": "Only if it changed"
+    }
+    """
+
+ESSAY_RUBRIC = """
+You are a **CYNICAL ADMISSIONS OFFICER** who is tired of reading generic essays.
+
+### SCORING PROTOCOL (COMPONENT METHOD)
+You must grade on 5 distinct components (Max 20 points each).
+**TOTAL SCORE = Sum of components.**
+
+**1. Voice & Authenticity (Max 20)**
+- 18-20: Sounds exactly like a teenager talking to a friend. Raw, vulnerable.
+- 14-17: Polished but slightly "resume-speak."
+- <14: Sounds like ChatGPT or a parent wrote it.
+
+**2. Insight & Growth (Max 20)**
+- 18-20: A profound realization that changes their worldview.
+- 14-17: "I worked hard and succeeded." (Standard)
+- <14: No lesson learned, or the lesson is a cliché.
+
+**3. Storytelling & Craft (Max 20)**
+- 18-20: vivid imagery, "Show don't tell," cinematic pacing.
+- 14-17: Readable but relies on adjectives ("it was difficult") rather than scenes.
+- <14: Confusing structure or boring list of events.
+
+**4. Originality & Risk (Max 20)**
+- 18-20: Topic or angle I have NEVER seen before.
+- 14-17: Common topic (sports/mission trip) but with a slight twist.
+- <14: The "Costco Rotisserie Chicken" of generic essays (Sports, Dead Pet, Divorce, Moving). **CAP THIS AT 12 POINTS IF GENERIC.**
+
+**5. Prompt Responsiveness (Max 20)**
+- 18-20: Answers the prompt deeply and directly.
+- <14: Ignores the prompt to tell a tangentially related story.
+
+### MANDATORY PENALTIES
+- If the essay is a "Sports Injury" or "Mission Trip" essay: **Max Total Score is 82** (unless it subverts the genre perfectly).
+- If cliches > 3 (the local analysis count plus any you add): **Deduct 5 points from total.**
+
+### GRADE CALIBRATION
+- **93+**: Top 1% of applicants. (Requires 19/20 in Originality).
+- **85-92**: Strong, admit-ready.
+- **75-84**: The "Safe Zone." Good grammar, boring content. **MOST ESSAYS ARE HERE.**
+- **< 75**: Weak.
+
+**DO NOT DEFAULT TO 93.** If it feels "fine," give it a 78.
+"""
+
+ESSAY_TEMPLATE = PromptTemplate(
+    "essay-v3",
+    system=(
+        ESSAY_RUBRIC
+        + "\nAnalyze and grade the essay in the user message based on the component system. \n"
+        "Calculate the 'letter_grade' by summing the 5 component scores.\n"
+        "The user message includes a local analysis of the essay (word count, structure, readability, "
+        "cliches and generic-topic signals). Its numbers are exact, so use them instead of counting yourself, "
+        "and don't repeat the cliches it already found.\n"
+        "Output valid JSON:\n"
+        + ESSAY_SCHEMA
+    ),
+    suffix=(
+        "Student Context: Grade {grade}, applying to {program}.\n\n"
+        "{analysis}\n\n"
+        "Prompt: {prompt}\n\n"
+        "Student Essay:\n"
+        "{essay}\n"
+    ),
+)
+
+
+def length_instruction(word_count, word_limit):
+    text = f"Current Word Count: {word_count} words."
+    if word_limit:
+        return text + f" / Limit: {word_limit} words."
+    return text + " (No specific limit provided)."
+
+
+def analysis_note(analysis):
+    """The local analysis (analysis.analyze_essay) as a few lines for the essay prompt"""
+    lines = ["Local analysis:", "- " + length_instruction(analysis["word_count"], analysis["word_limit"])]
+    sentences, readability = analysis["sentences"], analysis["readability"]
+    if sentences:
+        lines.append(
+            f"- Structure: {analysis['paragraph_count']} paragraphs, {sentences['count']} sentences "
+            f"averaging {sentences['mean_words']} words ({sentences['shortest']}-{sentences['longest']}), "
+            f"{sentences['starting_with_i']} starting with \"I\""
+        )
+        lines.append(
+            f"- Readability: Flesch reading ease {readability['flesch_reading_ease']}, "
+            f"grade level {readability['flesch_kincaid_grade']}"
+        )
+    cliches = ", ".join(
+        f'"{hit["phrase"]}"' + (f" x{hit['count']}" if hit["count"] > 1 else "") for hit in analysis["cliches"]
+    )
+    lines.append(f"- Cliches found ({analysis['cliche_count']}): {cliches or 'none'}")
+    topics = "; ".join(f"{t['topic']} ({', '.join(t['signals'])})" for t in analysis["generic_topics"])
+    lines.append(f"- Generic topic signals: {topics or 'none'}")
+    return "\n".join(lines)
+
+
+def build_essay_messages(data, analysis=None):
+    """Chat messages for grading one essay, with its local analysis (computed here if not passed)"""
+    essay = data.get("essay")
+    if analysis is None:
+        analysis = analyze_essay(essay, data.get("word_limit"))
+    return ESSAY_TEMPLATE.messages(
+        grade=data.get("grade"),
+        program=data.get("program"),
+        analysis=analysis_note(analysis),
+        prompt=data.get("prompt"),
+        essay=essay,
+    )
+
+
+# Re-grading a revised draft. The model gets its own scores for the previous
+# draft and the new one paragraph by paragraph: changed and new paragraphs in
+# full, unchanged ones as a one-line summary. It writes back the scores and only
+# the advice that changed (merged over the previous feedback by the caller).
+ESSAY_REVISION_TEMPLATE = PromptTemplate(
+    "essay-revision-v1",
+    system=(
+        ESSAY_RUBRIC
+        + "\nYou already graded an earlier draft of the essay in the user message, and the student has revised it. "
+        "The user message has your previous scores and the revised essay paragraph by paragraph: paragraphs "
+        "that changed or are new are given in full (with the sentences they replaced), unchanged ones as a "
+        "one-line summary. Re-grade the revised essay as a whole on the component system. Keep a component's "
+        "score and reason unless the changes affect it.\n"
+        "Calculate the 'letter_grade' by summing the 5 component scores.\n"
+        "The local analysis in the user message covers the whole revised essay. Its numbers are exact, so use "
+        "them instead of counting yourself, and don't repeat the cliches it already found.\n"
+        "Output valid JSON:\n"
+        + ESSAY_REVISION_SCHEMA
+    ),
+    suffix=(
+        "Student Context: Grade {grade}, applying to {program}.\n\n"
+        "{analysis}\n\n"
+        "Prompt: {prompt}\n\n"
+        "Your grading of the previous draft:\n{previous}\n\n"
+        "Revised essay ({changed} of {total} paragraphs changed):\n"
+        "{draft}\n"
+    ),
+)
+
+
+SUMMARY_OPENING_WORDS = 12
+
+
+def opening(text):
+    words = text.split()
+    return " ".join(words[:SUMMARY_OPENING_WORDS]) + ("…" if len(words) > SUMMARY_OPENING_WORDS else "")
+
+
+def draft_outline(diff):
+    """The revised draft for the prompt: full text where it changed, a summary line where it didn't"""
+    lines, number = [], 0
+    for entry in diff:
+        if entry["status"] == "removed":
+            lines.append(f'[paragraph removed] "{opening(entry["was"])}"')
+            continue
+        number += 1
+        if entry["status"] == "same":
+            stats = analyze_paragraph(entry["text"])
+            cliches = ", ".join(f'"{phrase}"' for phrase in stats["cliches"])
+            lines.append(
+                f"[{number}] unchanged: {stats['words']} words, {len(stats['sentence_lengths'])} sentences"
+                + (f", cliches {cliches}" if cliches else "")
+                + f'. Opens: "{opening(entry["text"])}"'
+            )
+        elif entry["status"] == "new":
+            lines.append(f"[{number}] NEW:\n{entry['text']}")
+        else:
+            kept = set(sentences(entry["text"]))
+            replaced = " ".join(f'"{s}"' for s in sentences(entry["was"]) if s not in kept)
+            lines.append(f"[{number}] REVISED:\n{entry['text']}" + (f"\n(replaced: {replaced})" if replaced else ""))
+    return "\n".join(lines)
+
+
+PREVIOUS_TEXT_MAX = 120
+
+
+def clip(text):
+    text = str(text)
+    return text[:PREVIOUS_TEXT_MAX] + "…" if len(text) > PREVIOUS_TEXT_MAX else text
+
+
+def previous_grading(feedback):
+    """The parts of the last feedback the model needs to re-grade (scores, reasons, what it
+    asked to fix), with the text cut short since only the gist is needed to stay consistent"""
+    return json.dumps({
+        "scoring_breakdown": {
+            name: {"score": part.get("score"), "reason": clip(part.get("reason"))}
+            for name, part in feedback["scoring_breakdown"].items()
+        },
+        "letter_grade": feedback.get("letter_grade"),
+        "areas_for_improvement": [clip(item) for item in feedback.get("areas_for_improvement") or []],
+    }, separators=(",", ":"), ensure_ascii=False)
+
+
+def build_revision_messages(data, analysis, previous_feedback, diff):
+    """Chat messages for re-grading a revised essay from a paragraph diff (revisions.paragraph_diff)"""
+    return ESSAY_REVISION_TEMPLATE.messages(
+        grade=data.get("grade"),
+        program=data.get("program"),
+        analysis=analysis_note(analysis),
+        prompt=data.get("prompt"),
+        previous=previous_grading(previous_feedback),
+        changed=sum(1 for entry in diff if entry["status"] in ("changed", "new")),
+        total=sum(1 for entry in diff if entry["status"] != "removed"),
+        draft=draft_outline(diff),
+    )
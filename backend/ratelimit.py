@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Per-user token buckets, charged by the estimated LLM tokens a request will
+# use rather than by request count. The sqlite backend keeps the buckets in a
+# local WAL file so every uvicorn worker on the box enforces the same limit.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite")  # sqlite | memory | off
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "ratelimit.db")
+# Interactive calls (/generate, /essay, jobs): ~3 roadmaps a minute, with a little burst
+RATE_LIMIT_TOKENS_PER_MINUTE = float(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "12000"))
+RATE_LIMIT_BURST_TOKENS = float(os.getenv("RATE_LIMIT_BURST_TOKENS", "15000"))
+# /essays/batch has its own, larger bucket so a counselor's class set doesn't eat their interactive budget
+RATE_LIMIT_BATCH_TOKENS_PER_HOUR = float(os.getenv("RATE_LIMIT_BATCH_TOKENS_PER_HOUR", "150000"))
+RATE_LIMIT_BATCH_BURST_TOKENS = float(os.getenv("RATE_LIMIT_BATCH_BURST_TOKENS", "150000"))
+
+# name -> (capacity, refill per second)
+BUCKETS = {
+    "interactive": (RATE_LIMIT_BURST_TOKENS, RATE_LIMIT_TOKENS_PER_MINUTE / 60),
+    "batch": (RATE_LIMIT_BATCH_BURST_TOKENS, RATE_LIMIT_BATCH_TOKENS_PER_HOUR / 3600),
+}
+
+
+def refill(tokens, updated, now, capacity, rate):
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryBuckets:
+    """Buckets in a dict; one process only"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def take(self, key, cost, capacity, rate, now):
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated, now, capacity, rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            return allowed, tokens
+
+    def give(self, key, amount, capacity, rate, now):
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            self.buckets[key] = (min(capacity, refill(tokens, updated, now, capacity, rate) + amount), now)
+
+
+class SQLiteBuckets:
+    """Buckets in a local SQLite file shared by every worker process on the host"""
+
+    def __init__(self, path=RATE_LIMIT_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # a lost bucket update after a power cut just means a slightly generous limit
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+
+    def _update(self, key, capacity, rate, now, change):
+        with self.lock:
+            # IMMEDIATE takes the write lock first, so read-modify-write is atomic across processes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens, result = change(refill(tokens, updated, now, capacity, rate))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def take(self, key, cost, capacity, rate, now):
+        def change(tokens):
+            if tokens >= cost:
+                return tokens - cost, (True, tokens - cost)
+            return tokens, (False, tokens)
+        return self._update(key, capacity, rate, now, change)
+
+    def give(self, key, amount, capacity, rate, now):
+        self._update(key, capacity, rate, now, lambda tokens: (min(capacity, tokens + amount), None))
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limited, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    def __init__(self, kind=RATE_LIMIT_BACKEND, buckets=BUCKETS):
+        self.kind = kind
+        self.store = None
+        self.buckets = buckets
+        self.enabled = kind != "off"
+        self.allowed = 0
+        self.limited = 0
+
+    def start(self):
+        """Open the bucket store. Called from the app's lifespan hook, so importing main
+        doesn't create ratelimit.db and each worker opens its own connection after the fork"""
+        if self.store is None and self.kind != "off":
+            self.store = MemoryBuckets() if self.kind == "memory" else SQLiteBuckets()
+
+    def charge(self, user_id, cost, bucket="interactive"):
+        """Take `cost` tokens from the user's bucket or raise RateLimited; returns what was charged"""
+        if not self.enabled or cost <= 0:
+            return 0
+        capacity, rate = self.buckets[bucket]
+        # a single request bigger than the whole bucket would never fit, so it just needs a full bucket
+        cost = min(cost, capacity)
+        allowed, tokens = self.store.take(f"{bucket}:{user_id}", cost, capacity, rate, time.time())
+        if not allowed:
+            self.limited += 1
+            raise RateLimited(max(1, int((cost - tokens) / rate) + 1))
+        self.allowed += 1
+        return cost
+
+    def refund(self, user_id, cost, bucket="interactive"):
+        """Give tokens back when the request never reached the model"""
+        if not self.enabled or cost <= 0:
+            return
+        capacity, rate = self.buckets[bucket]
+        self.store.give(f"{bucket}:{user_id}", cost, capacity, rate, time.time())
+
+    def stats(self):
+        return {"backend": self.kind if self.enabled else "off",
+                "allowed": self.allowed, "limited": self.limited}
+
+
+def make_limiter(kind=RATE_LIMIT_BACKEND):
+    """A limiter whose store is opened later, by start()"""
+    return RateLimiter(kind)
+
+
+def estimate_tokens(messages, expected_completion):
+    """Rough prompt tokens (~4 chars each) plus what we expect the model to write back"""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + expected_completion
@@ -0,0 +1,122 @@
+import difflib
+import json
+import os
+import re
+
+from analysis import paragraphs
+
+# Resubmitted drafts. A revision names its parent essay; we diff the two drafts
+# paragraph by paragraph so the grader only reads what changed (see
+# prompts.ESSAY_REVISION_TEMPLATE), and we save the revision as a delta against
+# the nearest row stored in full (its "base") instead of another full copy.
+#
+# Deltas are always against the base, never the parent, so reading any revision
+# is one extra row, not a walk up the chain. Once a delta grows past
+# REVISION_DELTA_MAX of the text, the revision is stored in full and becomes the
+# base for the revisions after it.
+
+# Above this share of the essay's words changed, a revision is graded from scratch
+REVISION_MAX_CHANGED = float(os.getenv("ESSAY_REVISION_MAX_CHANGED", "0.5"))
+REVISION_DELTA_MAX = float(os.getenv("ESSAY_REVISION_DELTA_MAX", "0.5"))
+
+# Sentence-sized pieces of the raw text, including the whitespace after each,
+# so "".join(pieces(text)) == text and a delta rebuilds the exact submission
+_PIECE = re.compile(r"[^\n.!?]*[.!?]*[\"')\]]*\s*")
+
+
+def paragraph_diff(old_text, new_text):
+    """The new draft's paragraphs in order, each {"status", "text", "was"}, with
+    removed paragraphs in place; status is same / changed / new / removed"""
+    old, new = paragraphs(old_text), paragraphs(new_text)
+    diff = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == "equal":
+            diff.extend({"status": "same", "text": text, "was": text} for text in new[j1:j2])
+            continue
+        # pair rewritten paragraphs up in order; any left over were added or cut
+        paired = min(i2 - i1, j2 - j1)
+        diff.extend({"status": "changed", "text": new[j1 + k], "was": old[i1 + k]} for k in range(paired))
+        diff.extend({"status": "new", "text": text, "was": None} for text in new[j1 + paired:j2])
+        diff.extend({"status": "removed", "text": None, "was": text} for text in old[i1 + paired:i2])
+    return diff
+
+
+def changed_share(diff):
+    """Fraction of the new draft's words in paragraphs that changed or are new"""
+    total = sum(len(entry["text"].split()) for entry in diff if entry["text"] is not None)
+    changed = sum(len(entry["text"].split()) for entry in diff if entry["status"] in ("changed", "new"))
+    return changed / total if total else 1.0
+
+
+def unchanged(diff):
+    return all(entry["status"] == "same" for entry in diff)
+
+
+def pieces(text):
+    return [piece for piece in _PIECE.findall(text) if piece]
+
+
+def text_delta(base, text):
+    """Ops that turn `base` into `text`: n > 0 keeps the next n pieces, n < 0 skips n, a string is inserted"""
+    old, new = pieces(base), pieces(text)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append("".join(new[j1:j2]))
+    return ops
+
+
+def apply_text_delta(base, ops):
+    old, out, position = pieces(base), [], 0
+    for op in ops:
+        if isinstance(op, str):
+            out.append(op)
+        elif op > 0:
+            out.extend(old[position:position + op])
+            position += op
+        else:
+            position -= op
+    return "".join(out)
+
+
+def feedback_patch(base, feedback):
+    """Top-level keys of `feedback` that differ from `base` (None for a key it doesn't have)"""
+    patch = {key: value for key, value in feedback.items() if base.get(key) != value}
+    patch.update({key: None for key in base if key not in feedback})
+    return patch
+
+
+def apply_feedback_patch(base, patch):
+    feedback = dict(base)
+    for key, value in patch.items():
+        if value is None:
+            feedback.pop(key, None)
+        else:
+            feedback[key] = value
+    return feedback
+
+
+def make_delta(base_text, base_feedback, text, feedback):
+    """What to store for a revision of `base`, or None if it's changed enough to store in full"""
+    delta = {"text": text_delta(base_text, text), "feedback": feedback_patch(base_feedback, feedback)}
+    size = len(json.dumps(delta, separators=(",", ":"), ensure_ascii=False))
+    full = len(text) + len(json.dumps(feedback, separators=(",", ":"), ensure_ascii=False))
+    if size > REVISION_DELTA_MAX * full:
+        return None
+    return delta
+
+
+def expand(row, base):
+    """A copy of an essays row without the delta column; a revision's essay_text and
+    feedback are rebuilt from its base"""
+    row = dict(row)
+    delta = row.pop("delta", None)
+    if delta is not None:
+        row["essay_text"] = apply_text_delta(base["essay_text"], delta["text"])
+        row["feedback"] = apply_feedback_patch(base["feedback"], delta["feedback"])
+    return row
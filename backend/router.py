@@ -0,0 +1,239 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from llm import LLMBusyError, create_completion, stream_completion
+
+# Each endpoint gets an ordered list of models to try. Errors fall through to
+# the next model, a model that keeps failing is skipped for a while (circuit
+# breaker), and (with ROUTER_HEDGE=true) a call still running past the
+# primary model's rolling p95 gets a second copy sent to the next model;
+# whichever answers first wins.
+ROADMAP_MODELS = os.getenv("ROADMAP_MODELS", "llama-3.3-70b-versatile,llama-3.1-8b-instant")
+ESSAY_MODELS = os.getenv("ESSAY_MODELS", "llama-3.3-70b-versatile,llama-3.1-8b-instant")
+# Hedging doubles upstream calls for the requests it fires on and may answer
+# with the weaker model, so it's off by default. When on, it waits for
+# ROUTER_HEDGE_MIN_SAMPLES successful primary calls, then fires at that
+# model's rolling percentile, never sooner than the endpoint's minimum.
+ROUTER_HEDGE = os.getenv("ROUTER_HEDGE", "false").lower() == "true"
+ROUTER_HEDGE_PERCENTILE = float(os.getenv("ROUTER_HEDGE_PERCENTILE", "95"))
+ROUTER_HEDGE_MIN_SAMPLES = int(os.getenv("ROUTER_HEDGE_MIN_SAMPLES", "50"))
+ROADMAP_HEDGE_MIN_AFTER = float(os.getenv("ROADMAP_HEDGE_MIN_AFTER", "20"))  # seconds
+ESSAY_HEDGE_MIN_AFTER = float(os.getenv("ESSAY_HEDGE_MIN_AFTER", "15"))
+# A model's circuit opens when at least half of its last 40 calls failed
+ROUTER_BREAKER_ERROR_RATE = float(os.getenv("ROUTER_BREAKER_ERROR_RATE", "0.5"))
+ROUTER_BREAKER_WINDOW = int(os.getenv("ROUTER_BREAKER_WINDOW", "40"))
+ROUTER_BREAKER_COOLDOWN = float(os.getenv("ROUTER_BREAKER_COOLDOWN", "30"))
+ROUTER_STATS_WINDOW = int(os.getenv("ROUTER_STATS_WINDOW", "200"))
+
+
+class ModelsUnavailableError(LLMBusyError):
+    """Every model for this endpoint has its circuit open"""
+
+
+class CircuitBreaker:
+    """closed -> open when too many recent calls failed -> half_open (one probe) after the cooldown"""
+
+    def __init__(self, error_rate=ROUTER_BREAKER_ERROR_RATE, window=ROUTER_BREAKER_WINDOW,
+                 cooldown=ROUTER_BREAKER_COOLDOWN):
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.recent = deque(maxlen=window)
+        self.state = "closed"
+        self.opened_at = 0.0
+
+    def allow(self):
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            return True
+        return self.state == "closed"
+
+    def record(self, ok):
+        if self.state == "half_open":
+            # the probe decides: back to normal with a clean slate, or another cooldown
+            self.recent.clear()
+            if ok:
+                self.state = "closed"
+            else:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            return
+        self.recent.append(ok)
+        failed = self.recent.count(False)
+        # need a handful of samples so two early errors don't trip it
+        if len(self.recent) >= self.recent.maxlen // 2 and failed / len(self.recent) >= self.error_rate:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """The call ended without a verdict (cancelled, local queue full); let the next request probe instead"""
+        if self.state == "half_open":
+            self.state = "open"
+            self.opened_at = time.monotonic() - self.cooldown
+
+
+class ModelStats:
+    """Rolling latency and error rate over the last ROUTER_STATS_WINDOW calls"""
+
+    def __init__(self, window=ROUTER_STATS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.calls = 0
+
+    def record(self, ok, latency=None):
+        self.calls += 1
+        self.outcomes.append(ok)
+        if ok and latency is not None:
+            self.latencies.append(latency)
+
+    def record_abandoned(self, latency):
+        """A call cancelled after `latency` seconds (it lost a hedge) was at least that slow;
+        leaving it out would pull the percentiles, and so the hedge delay, down"""
+        self.latencies.append(latency)
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ModelRouter:
+    """Completions for one endpoint, routed across an ordered list of models"""
+
+    def __init__(self, name, models, hedge_min_after=0, hedge_min_samples=ROUTER_HEDGE_MIN_SAMPLES,
+                 hedge_percentile=ROUTER_HEDGE_PERCENTILE):
+        self.name = name
+        self.models = [m.strip() for m in models.split(",") if m.strip()] if isinstance(models, str) else list(models)
+        self.primary = self.models[0]
+        self.hedge_min_after = hedge_min_after  # 0 = never hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_percentile = hedge_percentile
+        self.breakers = {m: CircuitBreaker() for m in self.models}
+        self.model_stats = {m: ModelStats() for m in self.models}
+        self.hedged = 0
+        self.fallbacks = 0
+
+    def hedge_after(self):
+        """Seconds before a call is raced against the next model, or None while hedging is
+        off or the primary hasn't answered often enough to know what slow means"""
+        stats = self.model_stats[self.primary]
+        if not self.hedge_min_after or len(stats.latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_after, stats.percentile(self.hedge_percentile))
+
+    async def _attempt(self, model, kwargs):
+        start = time.monotonic()
+        try:
+            result = await create_completion(model=model, **kwargs)
+        except (LLMBusyError, asyncio.CancelledError):
+            self.breakers[model].release()
+            raise
+        except Exception:
+            self.breakers[model].record(False)
+            self.model_stats[model].record(False)
+            raise
+        self.breakers[model].record(True)
+        self.model_stats[model].record(True, time.monotonic() - start)
+        return result
+
+    async def complete(self, **kwargs):
+        """Like llm.create_completion (minus `model`); the winning completion's .model says who answered"""
+        remaining = iter(self.models)
+        running = {}
+        last_error = None
+        hedged = False
+        budget = self.hedge_after()
+        started = time.monotonic()
+
+        def launch():
+            for model in remaining:
+                if self.breakers[model].allow():
+                    running[asyncio.create_task(self._attempt(model, kwargs))] = model
+                    return True
+            return False
+
+        if not launch():
+            raise ModelsUnavailableError(f"No healthy model for {self.name}")
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, timeout=None if hedged else budget,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # over budget: race the next model against the slow one
+                    hedged = True
+                    if launch():
+                        self.hedged += 1
+                        print(f"🐢 {self.name}: {running[next(iter(running))]} over {budget:.1f}s, hedging")
+                    continue
+                busy = False
+                for task in done:
+                    model = running.pop(task)
+                    try:
+                        return task.result()
+                    except LLMBusyError as e:
+                        # our own pool is full; another model would just wait in the same line
+                        busy = True
+                        last_error = e
+                    except Exception as e:
+                        print(f"Groq API Error ({model}): {e}")
+                        last_error = e
+                if not running and not busy and launch():
+                    self.fallbacks += 1
+            raise last_error or ModelsUnavailableError(f"No healthy model for {self.name}")
+        finally:
+            for task, model in running.items():
+                task.cancel()
+                if hedged and model == self.primary:
+                    self.model_stats[model].record_abandoned(time.monotonic() - started)
+
+    async def stream(self, **kwargs):
+        """Like llm.stream_completion; falls back only while opening the stream, never mid-stream"""
+        last_error = None
+        for model in self.models:
+            if not self.breakers[model].allow():
+                continue
+            try:
+                stream = await stream_completion(model=model, **kwargs)
+            except LLMBusyError:
+                self.breakers[model].release()
+                raise
+            except Exception as e:
+                print(f"Groq API Error ({model}): {e}")
+                self.breakers[model].record(False)
+                self.model_stats[model].record(False)
+                last_error = e
+                continue
+            self.breakers[model].record(True)
+            self.model_stats[model].record(True)
+            if model != self.primary:
+                self.fallbacks += 1
+            stream.model = model
+            return stream
+        raise last_error or ModelsUnavailableError(f"No healthy model for {self.name}")
+
+    def stats(self):
+        models = {}
+        for model in self.models:
+            stats = self.model_stats[model]
+            p50, p95 = stats.percentile(50), stats.percentile(95)
+            models[model] = {
+                "state": self.breakers[model].state,
+                "calls": stats.calls,
+                "error_rate": round(stats.error_rate(), 3),
+                "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            }
+        hedge_after = self.hedge_after()
+        return {"models": models, "hedge_after": round(hedge_after, 2) if hedge_after is not None else None,
+                "hedged": self.hedged, "fallbacks": self.fallbacks}
+
+
+roadmap_router = ModelRouter("roadmap", ROADMAP_MODELS, ROADMAP_HEDGE_MIN_AFTER if ROUTER_HEDGE else 0)
+essay_router = ModelRouter("essay", ESSAY_MODELS, ESSAY_HEDGE_MIN_AFTER if ROUTER_HEDGE else 0)
@@ -0,0 +1,297 @@
+import json
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from metrics import record_output, timed
+
+# What a roadmap / essay feedback document must look like before we return or
+# save it. Model output goes through three steps, cheapest first:
+#   1. json.loads (after stripping any ``` fence)
+#   2. a local repair: close a truncated document, drop trailing commas, and
+#      fix letter_grade from the component scores
+#   3. one follow-up completion that asks for only the fields still missing,
+#      sent after the original messages so the provider's prompt cache covers them
+# Each document is counted in llm_structured_output_total{kind,outcome}.
+
+
+class CollegeList(BaseModel):
+    reach: List[str]
+    target: List[str]
+    safety: List[str]
+
+
+class AcademicPlan(BaseModel):
+    course_suggestions: List[str]
+    testing_strategy: str
+
+
+class Extracurriculars(BaseModel):
+    current_optimization: str
+    new_opportunities: List[str]
+
+
+class TimelinePeriod(BaseModel):
+    period: str
+    focus: str
+    tasks: List[str]
+
+
+class Roadmap(BaseModel):
+    student_summary: str
+    college_list_suggestions: CollegeList
+    academic_plan: AcademicPlan
+    extracurriculars: Extracurriculars
+    timeline: List[TimelinePeriod] = Field(min_length=1)
+
+
+class Component(BaseModel):
+    score: float = Field(ge=0, le=20)
+    max: int = 20
+    reason: str
+
+
+class ScoringBreakdown(BaseModel):
+    voice_and_authenticity: Component
+    insight_and_growth: Component
+    storytelling_and_craft: Component
+    originality_and_risk: Component
+    prompt_responsiveness: Component
+
+
+class PreGradingAnalysis(BaseModel):
+    # the model only sends additional_cliches; analysis.merge_into_feedback turns
+    # that plus the local analysis into the count and list
+    model_config = ConfigDict(extra="allow")
+
+    cliche_count: int = 0
+    cliches_found: List[str] = []
+    is_generic_topic: bool = False
+    predicted_impact: str = ""
+
+
+class EssayFeedback(BaseModel):
+    pre_grading_analysis: PreGradingAnalysis
+    scoring_breakdown: ScoringBreakdown
+    letter_grade: int = Field(ge=0, le=100)
+    summary_badge: str
+    key_strengths: List[str]
+    areas_for_improvement: List[str]
+    final_summary: str
+    detailed_action_plan: str
+
+
+# A re-grade of a revised draft: new scores, plus whichever advice changed
+class EssayRevision(BaseModel):
+    pre_grading_analysis: PreGradingAnalysis
+    scoring_breakdown: ScoringBreakdown
+    letter_grade: int = Field(ge=0, le=100)
+    summary_badge: str
+    revision_notes: str
+    key_strengths: Optional[List[str]] = None
+    areas_for_improvement: Optional[List[str]] = None
+    final_summary: Optional[str] = None
+    detailed_action_plan: Optional[str] = None
+
+
+SCHEMAS = {"roadmap": Roadmap, "essay": EssayFeedback, "essay_revision": EssayRevision}
+REFILL_MAX_TOKENS = 2000
+# how many earlier cut points a truncated document is tried at before giving up
+REPAIR_MAX_CUTS = 20
+
+
+class InvalidOutputError(Exception):
+    """The model's answer still didn't fit the schema after repair and one refill"""
+
+    def __init__(self, kind, missing):
+        super().__init__(f"{kind} output missing or invalid: {', '.join(missing)}")
+        self.missing = missing
+
+
+# A whole string literal, a lone quote (a string the text ends inside), or a bracket/comma
+_TOKENS = re.compile(r'"(?:[^"\\]|\\.)*"|"|[{}\[\],]')
+_TRAILING_COMMA = re.compile(r'("(?:[^"\\]|\\.)*")|,(\s*[}\]])')
+_MAYBE_TRAILING_COMMA = re.compile(r",\s*[}\]]")
+
+
+def close_json(text):
+    """Candidate fixes for a sloppy or cut-off JSON object, best first, as
+    (text, whether the cut fell inside its last top-level value)
+
+    Trailing commas before a closing bracket are dropped. If the text ends
+    early, any open string and brackets are closed; since the last value may
+    itself be cut off, the same is also tried at each earlier comma or bracket.
+    A document that was only missing its final brackets isn't cut inside a value.
+    """
+    if _MAYBE_TRAILING_COMMA.search(text):
+        text = _TRAILING_COMMA.sub(r"\1\2", text)
+    stack, cuts, open_string = [], [], False
+    for match in _TOKENS.finditer(text):
+        token = match.group()
+        if token == '"':
+            open_string = True
+            break
+        if token[0] == '"':
+            continue
+        if token in "{[":
+            stack.append("}" if token == "{" else "]")
+            cuts.append((match.end(), list(stack)))
+        elif token in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return [(text[:match.end()], False)]
+        else:
+            cuts.append((match.start(), list(stack)))
+
+    tail = text
+    if open_string:
+        # don't leave a dangling backslash escaping the quote we add
+        if (len(tail) - len(tail.rstrip("\\"))) % 2:
+            tail = tail[:-1]
+        tail += '"'
+    tail = tail.rstrip()
+    # inside a nested value or a string, or right after a key or partway through
+    # a number/literal; ending on a comma or a closed string/bracket is a clean cut
+    inside = open_string or len(stack) > 1 or not tail.endswith((",", '"', "]", "}", "{"))
+    tail = tail.rstrip(",")
+    if tail.endswith(":"):
+        tail += "null"
+    candidates = [(tail + "".join(reversed(stack)), inside)]
+    for position, open_brackets in reversed(cuts[-REPAIR_MAX_CUTS:]):
+        candidates.append((text[:position] + "".join(reversed(open_brackets)), len(open_brackets) > 1))
+    return candidates
+
+
+def loads_lenient(text):
+    """(object, repaired, truncated) for the JSON object in `text`; object is None if it can't be
+    saved, and truncated means it was cut off partway through its last top-level value"""
+    text = text or ""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0:
+        return None, False, False
+    if start < end:
+        try:
+            obj = json.loads(text[start:end + 1])
+            if isinstance(obj, dict):
+                return obj, False, False
+        except json.JSONDecodeError:
+            pass
+    for candidate, truncated in close_json(text[start:]):
+        try:
+            obj = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(obj, dict):
+            return obj, True, truncated
+    return None, False, False
+
+
+def fix_letter_grade(feedback):
+    """letter_grade is the sum of the five components (less any penalties), so it can't be
+    missing or above that sum; returns True if it had to be changed"""
+    components = (feedback.get("scoring_breakdown") or {})
+    if not isinstance(components, dict):
+        return False
+    try:
+        total = sum(float(components[name]["score"]) for name in ScoringBreakdown.model_fields)
+    except (KeyError, TypeError, ValueError):
+        return False
+    grade = feedback.get("letter_grade")
+    try:
+        if float(grade) <= total:
+            return False
+    except (TypeError, ValueError):
+        pass
+    feedback["letter_grade"] = round(total)
+    return True
+
+
+FIXUPS = {"essay": fix_letter_grade, "essay_revision": fix_letter_grade}
+
+
+def check(kind, obj):
+    """(validated dict, []) or (None, names of the top-level fields that are missing or invalid)"""
+    schema = SCHEMAS[kind]
+    if not isinstance(obj, dict):
+        return None, list(schema.model_fields)
+    try:
+        return schema.model_validate(obj).model_dump(), []
+    except ValidationError as e:
+        bad = {error["loc"][0] for error in e.errors() if error["loc"]}
+        return None, [name for name in schema.model_fields if name in bad]
+
+
+def parse_document(kind, text):
+    """Steps 1 and 2: (document or None, partial document, missing fields, outcome)"""
+    obj, repaired, truncated = loads_lenient(text)
+    if obj is not None and kind in FIXUPS:
+        repaired = FIXUPS[kind](obj) or repaired
+    document, missing = check(kind, obj)
+    if truncated and obj:
+        # the field being written when the answer was cut off may close cleanly
+        # (a timeline with its last periods missing) but it isn't complete
+        last = list(obj)[-1]
+        if last in SCHEMAS[kind].model_fields and last not in missing:
+            document, missing = None, [name for name in SCHEMAS[kind].model_fields if name in missing or name == last]
+    if document is not None:
+        return document, obj, [], "repaired" if repaired else "valid"
+    partial = {key: value for key, value in (obj or {}).items()
+               if key in SCHEMAS[kind].model_fields and key not in missing}
+    return None, partial, missing, None
+
+
+def load_cached(kind, text):
+    """A cached answer, if it's still a valid document (older entries may predate the schemas)"""
+    if text is None:
+        return None
+    document, _, _, _ = parse_document(kind, text)
+    return document
+
+
+def refill_messages(messages, partial, missing):
+    """The original conversation, our partial answer, and a request for just the missing fields"""
+    return messages + [
+        {"role": "assistant", "content": json.dumps(partial, separators=(",", ":"), ensure_ascii=False)},
+        {"role": "user", "content": (
+            f"That JSON is missing or has malformed values for: {', '.join(missing)}. "
+            f"Reply with a JSON object containing only those keys, following the schema exactly."
+        )},
+    ]
+
+
+async def finish_document(kind, text, messages, router, temperature):
+    """The validated document for a completion's text, repairing it or asking the model
+    for the missing fields if needed; raises InvalidOutputError if that still fails"""
+    with timed(kind, "parse"):
+        document, partial, missing, outcome = parse_document(kind, text)
+    if document is not None:
+        record_output(kind, outcome)
+        return document
+
+    print(f"🩹 {kind} output incomplete, asking again for: {', '.join(missing)}")
+    try:
+        with timed(kind, "refill"):
+            completion = await router.complete(
+                messages=refill_messages(messages, partial, missing),
+                temperature=temperature,
+                max_tokens=REFILL_MAX_TOKENS,
+                response_format={"type": "json_object"}
+            )
+        reply, _, truncated = loads_lenient(completion.choices[0].message.content)
+        if truncated and reply:
+            reply.pop(list(reply)[-1])  # cut off while writing it, so it's incomplete
+    except Exception as e:
+        print(f"Refill failed: {e}")
+        reply = None
+    merged = dict(partial)
+    merged.update({key: value for key, value in (reply or {}).items() if key in missing})
+    if kind in FIXUPS:
+        FIXUPS[kind](merged)
+    document, still_missing = check(kind, merged)
+    if document is None:
+        record_output(kind, "failed")
+        raise InvalidOutputError(kind, still_missing)
+    record_output(kind, "refilled")
+    return document
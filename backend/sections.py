@@ -0,0 +1,101 @@
+import copy
+import json
+
+from prompts import ROADMAP_SCHEMA
+
+# Addressing one part of a roadmap document by a dotted path, e.g.
+# "college_list_suggestions", "academic_plan.testing_strategy" or "timeline.2"
+# (list entries by index), plus the bit of the schema that part has to match.
+ROADMAP_SHAPE = json.loads(ROADMAP_SCHEMA)
+
+
+class SectionPathError(ValueError):
+    pass
+
+
+def parse_path(path):
+    """Split "timeline.2" into ["timeline", 2], checking each step against the schema"""
+    if not isinstance(path, str) or not path.strip():
+        raise SectionPathError("Missing required field: section")
+    steps, shape = [], ROADMAP_SHAPE
+    for part in path.strip().split("."):
+        if isinstance(shape, dict) and part in shape:
+            steps.append(part)
+            shape = shape[part]
+        elif isinstance(shape, list) and part.isdigit():
+            steps.append(int(part))
+            shape = shape[0]
+        else:
+            raise SectionPathError(f"Unknown roadmap section: {path}")
+    return steps
+
+
+def shape_at(steps):
+    shape = ROADMAP_SHAPE
+    for step in steps:
+        shape = shape[0] if isinstance(step, int) else shape[step]
+    return shape
+
+
+def get_at(doc, steps):
+    """The value at `steps`, or raise KeyError if the document doesn't have it"""
+    value = doc
+    for step in steps:
+        if isinstance(step, int):
+            if not isinstance(value, list) or step >= len(value):
+                raise KeyError(step)
+        elif not isinstance(value, dict) or step not in value:
+            raise KeyError(step)
+        value = value[step]
+    return value
+
+
+def set_at(doc, steps, new_value):
+    """A copy of `doc` with the value at `steps` replaced"""
+    doc = copy.deepcopy(doc)
+    get_at(doc, steps[:-1])[steps[-1]] = new_value
+    return doc
+
+
+def matches_shape(value, shape):
+    """Same JSON types as the schema example, with every key the schema has and nothing left empty"""
+    if isinstance(shape, dict):
+        return isinstance(value, dict) and all(
+            key in value and matches_shape(value[key], sub) for key, sub in shape.items()
+        )
+    if isinstance(shape, list):
+        return isinstance(value, list) and len(value) > 0 and all(matches_shape(item, shape[0]) for item in value)
+    if isinstance(shape, str):
+        return isinstance(value, str) and value.strip() != ""
+    return not isinstance(value, (dict, list, str))
+
+
+def compact(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+# The context only has to keep the rewrite consistent with the rest (no repeated
+# schools, tasks that fit the timeline), so long text is cut short and other
+# timeline periods keep just their period and focus.
+CONTEXT_TEXT_MAX = 160
+
+
+def outline(value):
+    if isinstance(value, str) and len(value) > CONTEXT_TEXT_MAX:
+        return value[:CONTEXT_TEXT_MAX] + "…"
+    if isinstance(value, list):
+        return [outline(item) for item in value]
+    if isinstance(value, dict):
+        return {key: outline(item) for key, item in value.items()}
+    return value
+
+
+def context_without(doc, steps):
+    """An outline of the rest of the roadmap as compact JSON, with the part being rewritten blanked out"""
+    doc = outline(set_at(doc, steps, "(being rewritten)"))
+    if isinstance(doc.get("timeline"), list):
+        doc["timeline"] = [
+            {key: entry[key] for key in ("period", "focus") if key in entry} if isinstance(entry, dict) else entry
+            for entry in doc["timeline"]
+        ]
+    return compact(doc)
@@ -0,0 +1,116 @@
+import json
+
+
+class SectionStream:
+    """Incremental parser for a streamed JSON object.
+
+    Feed it text chunks as they arrive; it hands back each top-level
+    (key, value) pair as soon as that value is complete. Keys listed in
+    `item_keys` hold arrays whose elements are handed back one at a time as
+    (key, index, item) instead, so a long `timeline` doesn't have to finish
+    before the first period can be shown.
+
+    Anything before the opening brace (e.g. a stray ```json fence) is skipped.
+    """
+
+    def __init__(self, item_keys=()):
+        self.item_keys = set(item_keys)
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.done = False
+
+        self.expect = "key"       # at depth 1: reading a "key" or a "value"
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.item_start = None
+        self.item_index = 0
+        self.streaming_items = False
+
+    def feed(self, chunk):
+        """Consume a chunk and return the list of events it completed"""
+        self.buf += chunk
+        events = []
+        buf = self.buf
+        i = self.pos
+        while i < len(buf) and not self.done:
+            c = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    self._string_closed(i, events)
+            elif c == '"':
+                self.in_string = True
+                self._value_begins(i)
+                if self.depth == 1 and self.expect == "key":
+                    self.key_start = i
+            elif c in "{[":
+                if self.depth == 1 and self.value_start is None and self.expect == "value":
+                    self.streaming_items = c == "[" and self.key in self.item_keys
+                self._value_begins(i)
+                self.depth += 1
+            elif c in "}]":
+                self._scalar_ends(i, events)
+                self.depth -= 1
+                if self.depth == 2 and self.streaming_items and self.item_start is not None:
+                    self._emit_item(i + 1, events)
+                elif self.depth == 1 and self.value_start is not None:
+                    self._emit_value(i + 1, events)
+                elif self.depth == 0:
+                    self.done = True
+            elif c == ":" and self.depth == 1:
+                self.expect = "value"
+            elif c == ",":
+                self._scalar_ends(i, events)
+                if self.depth == 1:
+                    self.expect = "key"
+            elif not c.isspace():
+                self._value_begins(i)
+            i += 1
+        self.pos = i
+        return events
+
+    def _value_begins(self, i):
+        if self.depth == 1 and self.expect == "value" and self.value_start is None:
+            self.value_start = i
+        elif self.depth == 2 and self.streaming_items and self.item_start is None:
+            self.item_start = i
+
+    def _string_closed(self, i, events):
+        if self.depth == 1 and self.expect == "key" and self.key_start is not None:
+            self.key = json.loads(self.buf[self.key_start:i + 1])
+            self.key_start = None
+        elif self.depth == 1 and self.value_start is not None:
+            self._emit_value(i + 1, events)
+        elif self.depth == 2 and self.streaming_items and self.item_start is not None:
+            self._emit_item(i + 1, events)
+
+    def _scalar_ends(self, i, events):
+        # numbers / true / false / null have no closing character of their own
+        if self.depth == 1 and self.value_start is not None:
+            self._emit_value(i, events)
+        elif self.depth == 2 and self.streaming_items and self.item_start is not None:
+            self._emit_item(i, events)
+
+    def _emit_value(self, end, events):
+        raw = self.buf[self.value_start:end]
+        self.value_start = None
+        if self.streaming_items:
+            # items already went out one by one
+            self.streaming_items = False
+            self.item_index = 0
+            return
+        events.append((self.key, json.loads(raw)))
+
+    def _emit_item(self, end, events):
+        raw = self.buf[self.item_start:end]
+        self.item_start = None
+        events.append((self.key, self.item_index, json.loads(raw)))
+        self.item_index += 1
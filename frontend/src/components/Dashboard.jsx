@@ -4,6 +4,7 @@ import { useNavigate, Link } from 'react-router-dom';
 import Card from './ui/Card';
 import Button from './ui/Button';
 import ConfirmModal from './ui/ConfirmModal';
+import { fetchHistory } from '../utils/historyUtils';
 
 function Dashboard() {
   const { user, getToken } = useAuth();
@@ -25,18 +26,10 @@ function Dashboard() {
       const backendUrl = import.meta.env.VITE_BACKEND;
 
       // Fetch roadmaps
-      const roadmapsRes = await fetch(`${backendUrl}/roadmaps`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      const roadmapsData = await roadmapsRes.json();
-      setRoadmaps(roadmapsData.roadmaps || []);
+      setRoadmaps(await fetchHistory(backendUrl, token, 'roadmaps'));
 
       // Fetch essays
-      const essaysRes = await fetch(`${backendUrl}/essays`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      const essaysData = await essaysRes.json();
-      setEssays(essaysData.essays || []);
+      setEssays(await fetchHistory(backendUrl, token, 'essays'));
 
       setLoading(false);
     } catch (error) {
@@ -26,16 +26,16 @@ function EssayDetail() {
       const token = await getToken();
       const backendUrl = import.meta.env.VITE_BACKEND;
       
-      const response = await fetch(`${backendUrl}/essays`, {
+      const response = await fetch(`${backendUrl}/essays/${id}`, {
         headers: { Authorization: `Bearer ${token}` }
       });
       
-      if (!response.ok) {
-        throw new Error('Failed to fetch essays');
+      if (!response.ok && response.status !== 404) {
+        throw new Error('Failed to fetch essay');
       }
       
       const data = await response.json();
-      const foundEssay = data.essays?.find(e => e.id === id);
+      const foundEssay = data.essay;
       
       if (foundEssay) {
         // Parse the feedback string
@@ -2,6 +2,7 @@ import { Link, useNavigate, useLocation } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import { useState, useEffect, useRef } from 'react';
 import Button from './ui/Button';
+import { fetchHistory } from '../utils/historyUtils';
 
 function Header() {
   const { user, logout, getToken } = useAuth();
@@ -21,21 +22,14 @@ function Header() {
         const token = await getToken();
         const backendUrl = import.meta.env.VITE_BACKEND;
 
-        const [roadmapsRes, essaysRes] = await Promise.all([
-          fetch(`${backendUrl}/roadmaps`, {
-            headers: { Authorization: `Bearer ${token}` }
-          }),
-          fetch(`${backendUrl}/essays`, {
-            headers: { Authorization: `Bearer ${token}` }
-          })
+        const [roadmaps, essays] = await Promise.all([
+          fetchHistory(backendUrl, token, 'roadmaps'),
+          fetchHistory(backendUrl, token, 'essays')
         ]);
 
-        const roadmapsData = await roadmapsRes.json();
-        const essaysData = await essaysRes.json();
-
         setUserCounts({
-          roadmaps: roadmapsData.roadmaps?.length || 0,
-          essays: essaysData.essays?.length || 0
+          roadmaps: roadmaps.length,
+          essays: essays.length
         });
       } catch (error) {
         console.error('Error fetching counts:', error);
@@ -26,16 +26,16 @@ function RoadmapDetail() {
       const token = await getToken();
       const backendUrl = import.meta.env.VITE_BACKEND;
       
-      const response = await fetch(`${backendUrl}/roadmaps`, {
+      const response = await fetch(`${backendUrl}/roadmaps/${id}`, {
         headers: { Authorization: `Bearer ${token}` }
       });
       
-      if (!response.ok) {
-        throw new Error('Failed to fetch roadmaps');
+      if (!response.ok && response.status !== 404) {
+        throw new Error('Failed to fetch roadmap');
       }
       
       const data = await response.json();
-      const foundRoadmap = data.roadmaps?.find(r => r.id === id);
+      const foundRoadmap = data.roadmap;
       
       if (foundRoadmap) {
         // Parse the roadmap_content string
@@ -0,0 +1,16 @@
+// GET /roadmaps and /essays are paginated; walk every page of the summary list
+export const fetchHistory = async (backendUrl, token, kind) => {
+  const rows = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams({ summary: 'true', limit: '100' });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`${backendUrl}/${kind}?${params}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    });
+    const data = await response.json();
+    rows.push(...(data[kind] || []));
+    cursor = data.next_cursor;
+  } while (cursor);
+  return rows;
+};